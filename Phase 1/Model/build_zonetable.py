@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ingest import load_trips, peak_rss_mb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Phase 2', 'app'))
+from features import MODEL_FEATURES, featurize_frame
+from registry import load_model_file
+from zonetable import ZoneGrid, save_table
+
+logger = logging.getLogger(__name__)
+
+READ_COLUMNS = [
+    'pickup_datetime', 'passenger_count',
+    'pickup_longitude', 'pickup_latitude',
+    'dropoff_longitude', 'dropoff_latitude',
+]
+PROBE_ROWS = 16
+
+
+# Mean predicted log duration per (origin cell, destination cell, hour, day
+# of week) over the trips in `df`, keeping buckets with at least `min_trips`
+# trips. Also returns a few scored rows as the probe checked by matches().
+def bucket_predictions(df, model, features, grid, min_trips=5):
+    X = featurize_frame(df, features).astype(np.float64)
+    when = featurize_frame(df, ['pickup_hour', 'pickup_dayofweek'])
+    ok = np.isfinite(X).all(axis=1)
+    X, when, df = X[ok], when[ok], df[ok]
+    if getattr(model, 'feature_names_in_', None) is not None:
+        predictions = model.predict(pd.DataFrame(X, columns=features))
+    else:
+        predictions = model.predict(X)
+
+    keys = grid.keys_many(
+        df['pickup_latitude'], df['pickup_longitude'],
+        df['dropoff_latitude'], df['dropoff_longitude'],
+        when[:, 0], when[:, 1],
+    )
+    inside = keys != 0
+    unique, inverse, counts = np.unique(keys[inside], return_inverse=True, return_counts=True)
+    means = np.bincount(inverse, weights=predictions[inside]) / counts
+    popular = counts >= min_trips
+    logger.info(
+        f"{popular.sum():,} buckets cover {counts[popular].sum():,} of {inside.sum():,} "
+        f"in-grid trips ({counts[popular].sum() / max(inside.sum(), 1):.0%})"
+    )
+    probe = {'rows': X[:PROBE_ROWS].tolist(), 'log_predictions': predictions[:PROBE_ROWS].tolist()}
+    return unique[popular], means[popular].astype(np.float32), probe
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute the zone-pair ETA lookup table")
+    parser.add_argument('--input', default='nyc-taxi-trip-duration/train.csv')
+    parser.add_argument('--model', default='taxi_model.joblib')
+    parser.add_argument('--output', default='zone_table')
+    parser.add_argument('--cell-deg', type=float, default=ZoneGrid.cell_deg,
+                        help="grid cell size in degrees")
+    parser.add_argument('--min-trips', type=int, default=5,
+                        help="trips a bucket needs to be stored")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    base = ZoneGrid()
+    grid = ZoneGrid(
+        min_lat=base.min_lat, min_lon=base.min_lon, cell_deg=args.cell_deg,
+        rows=int(np.ceil(base.rows * base.cell_deg / args.cell_deg)),
+        cols=int(np.ceil(base.cols * base.cell_deg / args.cell_deg)),
+    )
+    start = time.perf_counter()
+    df = load_trips(args.input, columns=READ_COLUMNS)
+    model = load_model_file(args.model)
+    names = getattr(model, 'feature_names_in_', None)
+    features = [str(n) for n in names] if names is not None else list(MODEL_FEATURES)
+    keys, values, probe = bucket_predictions(df, model, features, grid, args.min_trips)
+    meta = save_table(args.output, grid, keys, values, {
+        'model': os.path.abspath(args.model),
+        'features': features,
+        'target': 'log_trip_duration',
+        'min_trips': args.min_trips,
+        'built_at': datetime.utcnow().isoformat(),
+        'probe': probe,
+    })
+    print(
+        f"{meta['slots'] * 12 / 1e6:.2f} MB index, max probe {meta['max_probe']} -> {args.output} "
+        f"in {time.perf_counter() - start:.1f}s (peak RSS {peak_rss_mb():.0f} MB)"
+    )
@@ -1,57 +1,73 @@
+import os
+import sys
+import logging
+import argparse
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error
+
+from ingest import load_trips
+
+# Share the serving featurizer so training and /predict compute identical features
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Phase 2', 'app'))
+from features import MODEL_FEATURES, featurize_frame
+
+# matplotlib and wandb are imported only by the steps that use them, so a
+# plain training run (--no-plot --no-wandb) never loads either
+parser = argparse.ArgumentParser(description="Train the trip duration model")
+parser.add_argument('--no-plot', action='store_true', help="skip the hour-of-day plot")
+parser.add_argument('--no-wandb', action='store_true', help="skip logging to Weights & Biases")
+args = parser.parse_args()
+logging.basicConfig(level=logging.INFO, format='%(message)s')
 
 # --- 1. Load Data (Adjusted for direct upload) ---
-# NOTE: Assuming the files 'train.csv' and 'test.csv' are uploaded to the root.
+# NOTE: Assuming 'train.csv' is uploaded under nyc-taxi-trip-duration/.
+# The first run reads it in chunks with compact dtypes (datetimes parsed during
+# the read) and writes a Parquet cache next to it; later runs load the cache.
 try:
-    df_train = pd.read_csv('nyc-taxi-trip-duration/train.csv')
+    df_train = load_trips(
+        'nyc-taxi-trip-duration/train.csv',
+        columns=[
+            'pickup_datetime', 'passenger_count',
+            'pickup_longitude', 'pickup_latitude',
+            'dropoff_longitude', 'dropoff_latitude',
+            'store_and_fwd_flag', 'trip_duration',
+        ],
+    )
     
 except FileNotFoundError:
-    print("Error: Files not found. Please upload 'train.csv' and 'test.csv'.")
+    print("Error: Files not found. Please upload 'train.csv'.")
     # Exiting the setup if files are missing
     raise
 
 # --- 2. Data Preparation & Feature Engineering ---
 
-# Convert datetime columns
-df_train['pickup_datetime'] = pd.to_datetime(df_train['pickup_datetime'])
-# df_train['dropoff_datetime'] = pd.to_datetime(df_train['dropoff_datetime']) # Not needed for simple features
-
 # Create Log of the target variable (standard practice for skewed data)
 df_train['log_trip_duration'] = np.log1p(df_train['trip_duration'])
 
-# Extract Simple Time Features
-df_train['pickup_hour'] = df_train['pickup_datetime'].dt.hour
-df_train['pickup_dayofweek'] = df_train['pickup_datetime'].dt.dayofweek # Monday=0, Sunday=6
+# Vectorized feature matrix: raw coordinates, pickup hour / day of week
+# (Monday=0) and trip geometry (haversine, Manhattan distance, bearing)
+features = list(MODEL_FEATURES)
+df_features = pd.DataFrame(featurize_frame(df_train, features), columns=features, index=df_train.index)
+df_train[features] = df_features
 
 # Convert store_and_fwd_flag to a numerical feature
 df_train['flag_is_Y'] = (df_train['store_and_fwd_flag'] == 'Y').astype(int)
 
 # --- 3. Simple Model Setup ---
 
-# Select features: latitude, longitude, passenger count, and new time features
-features = [
-    'passenger_count', 
-    'pickup_longitude', 
-    'pickup_latitude', 
-    'dropoff_longitude', 
-    'dropoff_latitude', 
-    'pickup_hour', 
-    'pickup_dayofweek', 
-]
+# Features come from features.MODEL_FEATURES (set above)
 target = 'log_trip_duration'
 
 # Handle potential NaNs (though rare in this dataset, it's good practice)
 df_train = df_train.dropna(subset=features + [target])
 
-X = df_train[features]
+X = df_train[features].astype(np.float64)
 y = df_train[target]
 
-
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_absolute_error, mean_squared_error
 
 # Train-test split (for internal validation, not the official test set)
 X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -68,21 +84,23 @@ print(f"Median duration: {median_log_duration:.3f}")
 print(f"Validation Root Mean Squared Error (RMSE) on Log-Transformed Target: {val_rmse:.4f}")
 
 # --- 5. Basic Relationship Visualization: Trip Duration vs. Hour of Day ---
-# Group the training data by hour and calculate the mean log duration
-hourly_mean = df_train.groupby('pickup_hour')[target].mean().reset_index()
-
-plt.figure(figsize=(10, 6))
-plt.plot(hourly_mean['pickup_hour'], hourly_mean[target], marker='o', linestyle='-', color='skyblue')
-plt.title('Relationship: Mean Log Trip Duration by Pickup Hour')
-plt.xlabel('Pickup Hour (0=Midnight, 23=11PM)')
-plt.ylabel('Mean Log Trip Duration ($\log(1+\text{seconds})$)')
-plt.grid(True, linestyle='--', alpha=0.7)
-plt.xticks(np.arange(0, 24, 2)) # Show every other hour
-plt.savefig('mean_log_duration_by_hour.png')
-plt.close()
+if not args.no_plot:
+    import matplotlib.pyplot as plt
+
+    # Group the training data by hour and calculate the mean log duration
+    hourly_mean = df_train.groupby('pickup_hour')[target].mean().reset_index()
+
+    plt.figure(figsize=(10, 6))
+    plt.plot(hourly_mean['pickup_hour'], hourly_mean[target], marker='o', linestyle='-', color='skyblue')
+    plt.title('Relationship: Mean Log Trip Duration by Pickup Hour')
+    plt.xlabel('Pickup Hour (0=Midnight, 23=11PM)')
+    plt.ylabel('Mean Log Trip Duration ($\log(1+\text{seconds})$)')
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.xticks(np.arange(0, 24, 2)) # Show every other hour
+    plt.savefig('mean_log_duration_by_hour.png')
+    plt.close()
 
 import joblib
-from sklearn.linear_model import LinearRegression 
 # Assuming 'model' is your trained LinearRegression instance
 
 # Define the filename for your saved model
@@ -92,10 +110,7 @@ filename = 'taxi_model.joblib'
 joblib.dump(model, filename)
 
 # Log the evaluation metrics
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-import numpy as np
-df_test = pd.read_csv('nyc-taxi-trip-duration/test.csv')
-X_test = df_train[features]
+X_test = X
 y_test = df_train[target]
 
 y_pred = model.predict(X_test)
@@ -106,50 +121,52 @@ rmse = np.sqrt(mse)
 
 print(f"Model successfully saved to {filename}")
 
-import wandb
+# --- 6. Experiment tracking ---
+if not args.no_wandb:
+    import wandb
 
-# Install wandb if not already installed (uncomment the line below if needed)
-# !pip install wandb
+    # Install wandb if not already installed (uncomment the line below if needed)
+    # !pip install wandb
 
-# Login to Weights & Biases (you will be prompted to enter your API key if not already logged in)
-wandb.login()
+    # Login to Weights & Biases (you will be prompted to enter your API key if not already logged in)
+    wandb.login()
 
-# Initialize a new W&B run
-# You can customize the project name and configuration parameters
-run = wandb.init(project="nyc-taxi-fare-prediction",
-                 config={
-                     "model_type": "Linear Regression",
-                     "test_size": 0.2,
-                     "random_state": 42,
-                     "features": X.columns.tolist() # Log the features used
-                 })
+    # Initialize a new W&B run
+    # You can customize the project name and configuration parameters
+    run = wandb.init(project="nyc-taxi-fare-prediction",
+                     config={
+                         "model_type": "Linear Regression",
+                         "test_size": 0.2,
+                         "random_state": 42,
+                         "features": X.columns.tolist() # Log the features used
+                     })
 
-# Log the evaluation metrics
-wandb.log({
-    "mean_absolute_error": mae,
-    "mean_squared_error": mse,
-    "root_mean_squared_error": rmse
-})
+    # Log the evaluation metrics
+    wandb.log({
+        "mean_absolute_error": mae,
+        "mean_squared_error": mse,
+        "root_mean_squared_error": rmse
+    })
 
-print("Weights & Biases run initialized and metrics logged successfully.")
+    print("Weights & Biases run initialized and metrics logged successfully.")
 
-# Initialize a new W&B run for tracking the model artifact
-# Use a different project name to distinguish from the metrics logging run
-run_artifact = wandb.init(project="nyc-taxi-model-predictions", job_type="model-logging")
+    # Initialize a new W&B run for tracking the model artifact
+    # Use a different project name to distinguish from the metrics logging run
+    run_artifact = wandb.init(project="nyc-taxi-model-predictions", job_type="model-logging")
 
-# Create a wandb.Artifact instance
-artifact = wandb.Artifact('linear-regression-model', type='model')
+    # Create a wandb.Artifact instance
+    artifact = wandb.Artifact('linear-regression-model', type='model')
 
-# Add the locally saved model file to the artifact
-# The model_filename variable was defined in the previous step where the model was saved.
-artifact.add_file(filename)
+    # Add the locally saved model file to the artifact
+    # The model_filename variable was defined in the previous step where the model was saved.
+    artifact.add_file(filename)
 
-# Log the created artifact to Weights & Biases
-wandb.log_artifact(artifact)
+    # Log the created artifact to Weights & Biases
+    wandb.log_artifact(artifact)
 
-print(f"Weights & Biases artifact '{artifact.name}' (type: {artifact.type}) logged successfully.")
+    print(f"Weights & Biases artifact '{artifact.name}' (type: {artifact.type}) logged successfully.")
 
-# Finish the W&B run for artifact logging
-run_artifact.finish()
+    # Finish the W&B run for artifact logging
+    run_artifact.finish()
 
-wandb.finish()
\ No newline at end of file
+    wandb.finish()
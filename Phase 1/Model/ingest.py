@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# TLC taxi zone IDs. The categories are fixed so every chunk (and Parquet
+# row group) shares one dictionary.
+ZONE_IDS = pd.CategoricalDtype(categories=range(1, 266))
+
+# Compact dtypes for the NYC taxi trip CSVs (train.csv / test.csv / TLC exports).
+# TLC files leave vendor and passenger counts empty on some trips and write
+# others as "1.0", so those use the nullable UInt8 (a plain uint8 read fails).
+DTYPES = {
+    "id": "string[pyarrow]",
+    "vendor_id": "UInt8",
+    "passenger_count": "UInt8",
+    "pickup_longitude": "float32",
+    "pickup_latitude": "float32",
+    "dropoff_longitude": "float32",
+    "dropoff_latitude": "float32",
+    "store_and_fwd_flag": "category",
+    "trip_duration": "uint32",
+    "PULocationID": ZONE_IDS,
+    "DOLocationID": ZONE_IDS,
+    "trip_distance": "float32",
+    "fare_amount": "float32",
+}
+DATETIME_COLUMNS = ["pickup_datetime", "dropoff_datetime", "tpep_pickup_datetime", "tpep_dropoff_datetime"]
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+CHUNK_ROWS = 500_000
+
+
+def peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def source_tag(csv_path):
+    st = os.stat(csv_path)
+    return f"{os.path.abspath(csv_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def default_cache_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+# Stream the CSV in chunks with explicit dtypes (datetimes parsed during the
+# read) and append each chunk as a row group of a Parquet cache file
+def ingest_csv(csv_path, parquet_path=None, chunk_rows=CHUNK_ROWS):
+    parquet_path = parquet_path or default_cache_path(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {c: t for c, t in DTYPES.items() if c in header}
+    dates = [c for c in DATETIME_COLUMNS if c in header]
+
+    start = time.perf_counter()
+    rows = 0
+    writer = None
+    tmp_path = parquet_path + ".tmp"
+    try:
+        for chunk in pd.read_csv(
+            csv_path,
+            dtype=dtypes,
+            parse_dates=dates,
+            date_format=DATETIME_FORMAT,
+            chunksize=chunk_rows,
+        ):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema.with_metadata(
+                    {**(table.schema.metadata or {}), b"source": source_tag(csv_path).encode()}
+                )
+                writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, parquet_path)
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Ingested {rows:,} rows from {csv_path} in {elapsed:.1f}s "
+        f"(peak RSS {peak_rss_mb():.0f} MB) -> {parquet_path}"
+    )
+    return parquet_path
+
+
+# The cache is valid while the CSV it was built from is unchanged
+def cache_is_fresh(csv_path, parquet_path):
+    if not os.path.exists(parquet_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True  # only the cache was shipped
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    return metadata.get(b"source") == source_tag(csv_path).encode()
+
+
+# Load trips from the Parquet cache, (re)building it from the CSV if needed
+def load_trips(csv_path, parquet_path=None, columns=None):
+    parquet_path = parquet_path or default_cache_path(csv_path)
+    if not cache_is_fresh(csv_path, parquet_path):
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(csv_path)
+        ingest_csv(csv_path, parquet_path)
+
+    start = time.perf_counter()
+    df = pd.read_parquet(parquet_path, columns=columns)
+    # Parquet round-trips string categories but not integer ones (zone IDs)
+    df = df.astype({c: t for c, t in DTYPES.items() if c in df and isinstance(t, pd.CategoricalDtype)})
+    logger.info(
+        f"Loaded {len(df):,} rows from {parquet_path} in {time.perf_counter() - start:.2f}s "
+        f"({df.memory_usage(deep=True).sum() / 1e6:.0f} MB, peak RSS {peak_rss_mb():.0f} MB)"
+    )
+    return df
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    csv = sys.argv[1] if len(sys.argv) > 1 else "nyc-taxi-trip-duration/train.csv"
+    out = sys.argv[2] if len(sys.argv) > 2 else None
+    ingest_csv(csv, out)
@@ -1,189 +1,244 @@
-import wandb
-print("wandb imported successfully.")
-
-wandb.login()
-
-print("Weights & Biases authentication complete. Ready to proceed with W&B logging.")
+import os
+import json
+import time
+import shutil
+import argparse
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
 
 WANDB_ENTITY = "jacobrbrooks-university-of-denver"
 WANDB_PROJECT = "nyc-taxi-fare-prediction"
-
-print(f"WANDB_ENTITY set to: {WANDB_ENTITY}")
-print(f"WANDB_PROJECT set to: {WANDB_PROJECT}")
-
-api = wandb.Api()
-print("Weights & Biases API client initialized.")
-
-runs = api.runs(f"{WANDB_ENTITY}/{WANDB_PROJECT}")
-print(f"Fetched {len(runs)} runs from project '{WANDB_PROJECT}'.")
-
-try:
-    runs = api.runs(f"{WANDB_ENTITY}/{WANDB_PROJECT}")
-    print(f"Fetched {len(runs)} runs from project '{WANDB_PROJECT}'.")
-except ValueError as e:
-    print(f"Error: {e}")
-    print(f"Could not find W&B project '{WANDB_PROJECT}' under entity '{WANDB_ENTITY}'.")
-    print("Please ensure that 'WANDB_PROJECT' variable contains the correct name of your Weights & Biases project.")
-    print("You can find your project name on the W&B website for your entity.")
-    runs = [] # Initialize 'runs' as an empty list to prevent further errors if the project is not found.
-
-runs_data = []
-for run in runs:
-    metrics = dict(run.summary)
-    artifact_names = [artifact.name for artifact in run.logged_artifacts()]
-    runs_data.append({
-        "run_id": run.id,
-        "run_name": run.name,
-        "metrics": metrics,
-        "artifact_names": artifact_names
-    })
-
-print(f"Extracted data for {len(runs_data)} runs.")
-if runs_data:
-    print("Sample of extracted data for the first run:")
-    print(runs_data[0])
-else:
-    print("No runs data extracted.")
-
-runs_data = []
-for run in runs:
-    metrics = dict(run.summary)
-    artifact_names = [artifact.name for artifact in run.logged_artifacts()]
-    runs_data.append({
-        "run_id": run.id,
-        "run_name": run.name,
-        "metrics": metrics,
-        "artifact_names": artifact_names
-    })
-
-print(f"Extracted data for {len(runs_data)} runs.")
-if runs_data:
-    print("Sample of extracted data for the first run:")
-    print(runs_data[0])
-else:
-    print("No runs data extracted.")
-
-metric_to_optimize = 'root_mean_squared_error'
-optimization_direction = 'minimize'
-
-# Initialize variables for tracking the best run
-best_run_id = None
-best_run_name = None
-best_metric_value = float('inf') if optimization_direction == 'minimize' else float('-inf')
-best_artifact_name = None
-
-print(f"Optimizing for '{metric_to_optimize}' by trying to {optimization_direction} it.\n")
-
-for run_data in runs_data:
-    run_id = run_data['run_id']
-    run_name = run_data['run_name']
-    metrics = run_data['metrics']
-    artifact_names = run_data['artifact_names']
-
-    if metric_to_optimize in metrics:
-        current_metric_value = metrics[metric_to_optimize]
-        print(f"Run '{run_name}' ({run_id}) has {metric_to_optimize}: {current_metric_value:.4f}")
-
-        if optimization_direction == 'minimize':
-            if current_metric_value < best_metric_value:
-                best_metric_value = current_metric_value
-                best_run_id = run_id
-                best_run_name = run_name
-                # Assuming the primary artifact is the one to track, or pick the first if multiple
-                best_artifact_name = artifact_names[0] if artifact_names else None
-                #print(f"  -> New best found: {best_metric_value:.4f}")
-        elif optimization_direction == 'maximize':
-            if current_metric_value > best_metric_value:
-                best_metric_value = current_metric_value
-                best_run_id = run_id
-                best_run_name = run_name
-                best_artifact_name = artifact_names[0] if artifact_names else None
-                #print(f"  -> New best found: {best_metric_value:.4f}")
-    else:
-        print(f"Run '{run_name}' ({run_id}) does not have metric '{metric_to_optimize}'. Skipping.")
-
-
-print("\n--- Optimization Complete ---")
-if best_run_id:
-    print(f"Best Run ID: {best_run_id}")
-    print(f"Best Run Name: {best_run_name}")
-    print(f"Best {metric_to_optimize}: {best_metric_value:.4f}")
-    print(f"Associated Best Artifact Name: {best_artifact_name}")
-else:
-    print("No runs found with the specified metric or no best run could be determined.")
-
-"""# Task
-Find and download the best performing model artifact from Weights & Biases, storing it in a new local directory named 'best_current_model'. The best model is defined as the one that minimizes 'root_mean_squared_error'. After downloading, confirm the model's presence in the 'best_current_model' directory and inform the user of its location.
-
-## Identify Best Model Artifact
-
-### Subtask:
-Search the runs data to find a run that achieved the same best metric value as previously identified, and logged an artifact containing 'model' in its name. This ensures we download an actual model.
-
-**Reasoning**:
-The subtask requires identifying a run that achieved the best metric value and has an artifact name containing 'model'. This code iterates through the runs, checks for the metric, and then searches for a relevant artifact name, storing the details of the first such run found.
-"""
-
-best_model_run_id = None
-best_model_run_name = None
-best_model_metric_value = None
-best_model_artifact_name = None
-
-for run_data in runs_data:
-    run_id = run_data['run_id']
-    run_name = run_data['run_name']
-    metrics = run_data['metrics']
-    artifact_names = run_data['artifact_names']
-
-    # Check if the metric exists and matches the best metric value
-    if metric_to_optimize in metrics and abs(metrics[metric_to_optimize] - best_metric_value) < 1e-6: # Using a small tolerance for float comparison
-        for artifact_name in artifact_names:
-            if 'model' in artifact_name.lower(): # Case-insensitive search for 'model'
-                best_model_run_id = run_id
-                best_model_run_name = run_name
-                best_model_metric_value = metrics[metric_to_optimize]
-                best_model_artifact_name = artifact_name
-                break # Found the model artifact for this run, move to the next run
-        if best_model_run_id: # If a model artifact was found for this run, we can stop searching
-            break
-
-print("\n--- Identified Best Model Artifact ---")
-if best_model_run_id:
-    print(f"Best Model Run ID: {best_model_run_id}")
-    print(f"Best Model Run Name: {best_model_run_name}")
-    print(f"Best {metric_to_optimize} Value: {best_model_metric_value:.4f}")
-    print(f"Best Model Artifact Name: {best_model_artifact_name}")
-else:
-    print("No best model artifact found matching the criteria.")
-
-import os
-
 DOWNLOAD_DIR = "best_current_model"
-
-# Create the download directory if it doesn't exist
-os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-
-print(f"Download directory '{DOWNLOAD_DIR}' ensured.")
-
-if best_model_artifact_name and best_model_run_id:
+INDEX_FILE = "runs_index.json"
+
+
+# A run as listed by the registry; `revision` changes whenever the run's
+# summary or artifacts may have changed (W&B: state + last heartbeat)
+@dataclass
+class RunRef:
+    run_id: str
+    run_name: str
+    revision: str
+
+
+@dataclass
+class RunRecord:
+    run_id: str
+    run_name: str
+    revision: str
+    metrics: Dict = field(default_factory=dict)
+    artifact_names: List[str] = field(default_factory=list)
+
+
+# Where runs and their artifacts come from. WandbRunSource talks to the W&B
+# API; LocalRunSource stands in for it with a plain directory.
+class RunSource(ABC):
+    @abstractmethod
+    def list_runs(self) -> Iterable[RunRef]:
+        """List every run in the project (cheap: no artifacts)."""
+
+    @abstractmethod
+    def fetch(self, ref: RunRef) -> RunRecord:
+        """Summary metrics and logged artifact names of one run."""
+
+    @abstractmethod
+    def download(self, artifact_name: str, dest: str) -> str:
+        """Download an artifact into `dest` and return the path."""
+
+
+class WandbRunSource(RunSource):
+    def __init__(self, entity: str, project: str, per_page: int = 500):
+        self.entity = entity
+        self.project = project
+        self.per_page = per_page
+        self._api = None
+        self._runs = {}
+
+    @property
+    def api(self):
+        if self._api is None:
+            import wandb
+
+            wandb.login()
+            self._api = wandb.Api()
+        return self._api
+
+    def list_runs(self) -> Iterable[RunRef]:
+        for run in self.api.runs(f"{self.entity}/{self.project}", per_page=self.per_page):
+            self._runs[run.id] = run
+            yield RunRef(run.id, run.name, f"{run.state}:{run.heartbeat_at}")
+
+    def fetch(self, ref: RunRef) -> RunRecord:
+        run = self._runs.get(ref.run_id) or self.api.run(f"{self.entity}/{self.project}/{ref.run_id}")
+        return RunRecord(
+            ref.run_id, ref.run_name, ref.revision,
+            metrics=_plain(dict(run.summary)),
+            artifact_names=[artifact.name for artifact in run.logged_artifacts()],
+        )
+
+    def download(self, artifact_name: str, dest: str) -> str:
+        # The artifact name already contains the version (e.g. 'linear-regression-model:v2')
+        artifact = self.api.artifact(f"{self.entity}/{self.project}/{artifact_name}")
+        return artifact.download(root=dest)
+
+
+# Directory layout: <root>/runs/<run_id>.json holding name, revision, summary
+# and artifacts; <root>/artifacts/<name>/<version>/ holds artifact files.
+class LocalRunSource(RunSource):
+    def __init__(self, root: str):
+        self.root = root
+
+    def _run_file(self, run_id):
+        return os.path.join(self.root, "runs", f"{run_id}.json")
+
+    def list_runs(self) -> Iterable[RunRef]:
+        runs_dir = os.path.join(self.root, "runs")
+        for fname in sorted(os.listdir(runs_dir)):
+            if fname.endswith(".json"):
+                with open(os.path.join(runs_dir, fname)) as f:
+                    run = json.load(f)
+                yield RunRef(fname[:-5], run.get("name", ""), str(run.get("revision", "")))
+
+    def fetch(self, ref: RunRef) -> RunRecord:
+        with open(self._run_file(ref.run_id)) as f:
+            run = json.load(f)
+        return RunRecord(
+            ref.run_id, ref.run_name, ref.revision,
+            metrics=run.get("summary", {}),
+            artifact_names=run.get("artifacts", []),
+        )
+
+    def download(self, artifact_name: str, dest: str) -> str:
+        name, _, version = artifact_name.partition(":")
+        src = os.path.join(self.root, "artifacts", name, version or "latest")
+        shutil.copytree(src, dest, dirs_exist_ok=True)
+        return dest
+
+
+# W&B summaries hold wrapper types; keep only what JSON can store
+def _plain(value):
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items() if not str(k).startswith("_wandb")}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
     try:
-        # Construct the artifact path using WANDB_ENTITY and WANDB_PROJECT
-        # The artifact name already contains the version (e.g., 'linear-regression-model:v2')
-        artifact_path = f"{WANDB_ENTITY}/{WANDB_PROJECT}/{best_model_artifact_name}"
-
-        print(f"Attempting to download artifact: {artifact_path}")
-
-        # Get the artifact object
-        artifact = api.artifact(artifact_path)
-
-        # Download the artifact
-        download_path = artifact.download(root=DOWNLOAD_DIR)
-
-        print(f"Successfully downloaded best model artifact to: {download_path}")
-        print(f"Contents of '{download_path}': {os.listdir(download_path)}")
-
-    except Exception as e:
-        print(f"Error downloading artifact '{best_model_artifact_name}' for run '{best_model_run_id}': {e}")
-        print("Please ensure the artifact path is correct and accessible.")
-else:
-    print("No best model artifact found to download. Please review previous steps.")
\ No newline at end of file
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+# On-disk index of runs already fetched, keyed by run id
+class RunIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self.runs: Dict[str, RunRecord] = {}
+        try:
+            with open(path) as f:
+                self.runs = {r["run_id"]: RunRecord(**r) for r in json.load(f)["runs"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"runs": [asdict(r) for r in self.runs.values()]}, f)
+        os.replace(tmp, self.path)
+
+
+# List runs, fetch only those that are new or whose revision changed
+# (concurrently, at most `workers` at a time), and drop deleted runs.
+# Returns the up-to-date records and the number fetched.
+def sync_runs(source: RunSource, index: RunIndex, workers: int = 16) -> Tuple[List[RunRecord], int]:
+    refs = list(source.list_runs())
+    stale = [
+        ref for ref in refs
+        if ref.run_id not in index.runs or index.runs[ref.run_id].revision != ref.revision
+    ]
+    if stale:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(stale)))) as pool:
+            for record in pool.map(source.fetch, stale):
+                index.runs[record.run_id] = record
+
+    listed = {ref.run_id for ref in refs}
+    for run_id in list(index.runs):
+        if run_id not in listed:
+            del index.runs[run_id]
+    index.save()
+    return [index.runs[ref.run_id] for ref in refs], len(stale)
+
+
+def model_artifact(record: RunRecord) -> Optional[str]:
+    for name in record.artifact_names:
+        if "model" in name.lower():
+            return name
+    return None
+
+
+# Single pass: best metric among runs that logged a model artifact
+def select_best(
+    records: Iterable[RunRecord],
+    metric: str = "root_mean_squared_error",
+    direction: str = "minimize",
+) -> Optional[Tuple[RunRecord, str]]:
+    sign = 1.0 if direction == "minimize" else -1.0
+    best, best_value, best_artifact = None, None, None
+    for record in records:
+        value = record.metrics.get(metric)
+        if not isinstance(value, (int, float)) or value != value:
+            continue
+        artifact = model_artifact(record)
+        if artifact is None:
+            continue
+        if best is None or sign * value < sign * best_value:
+            best, best_value, best_artifact = record, value, artifact
+    return (best, best_artifact) if best is not None else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find and download the best model artifact")
+    parser.add_argument("--entity", default=WANDB_ENTITY)
+    parser.add_argument("--project", default=WANDB_PROJECT)
+    parser.add_argument("--local-root", help="Use a local run directory instead of W&B")
+    parser.add_argument("--index", default=INDEX_FILE, help="Local index of runs already fetched")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--metric", default="root_mean_squared_error")
+    parser.add_argument("--direction", choices=["minimize", "maximize"], default="minimize")
+    parser.add_argument("--download-dir", default=DOWNLOAD_DIR)
+    args = parser.parse_args()
+
+    if args.local_root:
+        source = LocalRunSource(args.local_root)
+    else:
+        source = WandbRunSource(args.entity, args.project)
+
+    start = time.perf_counter()
+    records, fetched = sync_runs(source, RunIndex(args.index), args.workers)
+    print(
+        f"Synced {len(records)} runs ({fetched} new or updated) "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+    print(f"Optimizing for '{args.metric}' by trying to {args.direction} it.")
+    best = select_best(records, args.metric, args.direction)
+    if best is None:
+        print("No runs found with the specified metric and a model artifact.")
+        raise SystemExit(1)
+
+    record, artifact_name = best
+    print("\n--- Identified Best Model Artifact ---")
+    print(f"Best Model Run ID: {record.run_id}")
+    print(f"Best Model Run Name: {record.run_name}")
+    print(f"Best {args.metric} Value: {record.metrics[args.metric]:.4f}")
+    print(f"Best Model Artifact Name: {artifact_name}")
+
+    os.makedirs(args.download_dir, exist_ok=True)
+    download_path = source.download(artifact_name, args.download_dir)
+    print(f"Successfully downloaded best model artifact to: {download_path}")
+    print(f"Contents of '{download_path}': {os.listdir(download_path)}")
@@ -0,0 +1,333 @@
+import io
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ingest import DATETIME_FORMAT, DTYPES, peak_rss_mb, source_tag
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Phase 2', 'app'))
+from features import MODEL_FEATURES, featurize_frame
+from registry import ArtifactCache, LocalDirRegistry, WandbRegistry, fetch_model, load_model_file, sha256_file
+from scorer import compile_model
+
+logger = logging.getLogger(__name__)
+
+# Columns read from the input (those that exist); `id` is passed through
+READ_COLUMNS = [
+    'id', 'pickup_datetime', 'passenger_count',
+    'pickup_longitude', 'pickup_latitude',
+    'dropoff_longitude', 'dropoff_latitude',
+    'trip_distance',
+]
+CHUNK_MB = 32
+# Like /predict, trips without a pickup_datetime are scored as leaving now
+PICKUP_TIMEZONE = os.getenv('PICKUP_TIMEZONE', 'America/New_York')
+CHECKPOINT_FILE = '_checkpoint.json'
+
+# Set once per pool worker by init_worker
+_SCORER = None
+_JOB = None
+
+
+def init_worker(scorer, job):
+    global _SCORER, _JOB
+    _SCORER, _JOB = scorer, job
+
+
+# CSV chunks as (start, end) byte ranges ending on a line break, so workers
+# can parse them independently (fields must not contain newlines)
+def csv_chunks(path, offset, chunk_bytes):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        while offset < size:
+            end = offset + chunk_bytes
+            if end < size:
+                f.seek(end - 1)
+                f.readline()
+                end = f.tell()
+            end = min(end, size)
+            yield offset, end
+            offset = end
+
+
+def csv_header(path):
+    with open(path, 'rb') as f:
+        line = f.readline()
+    return [name.strip().strip('"') for name in line.decode().rstrip('\r\n').split(',')], len(line)
+
+
+def read_chunk(start, end):
+    path = _JOB['input']
+    if _JOB['kind'] == 'parquet':
+        pf = pq.ParquetFile(path)
+        columns = [c for c in READ_COLUMNS if c in pf.schema_arrow.names]
+        return pf.read_row_group(start, columns=columns).to_pandas()
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    header = _JOB['header']
+    columns = [c for c in READ_COLUMNS if c in header]
+    return pd.read_csv(
+        io.BytesIO(data),
+        header=None,
+        names=header,
+        usecols=columns,
+        dtype={c: t for c, t in DTYPES.items() if c in columns},
+        parse_dates=[c for c in ('pickup_datetime',) if c in columns],
+        date_format=DATETIME_FORMAT,
+    )
+
+
+def part_path(output, index):
+    return os.path.join(output, f'part-{index:05d}.parquet')
+
+
+def _fsync(path):
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+# Worker: read, featurize and score one chunk. Parquet output is written
+# here as its own part file; CSV output is returned as encoded bytes for
+# the parent to append in order. Rows with unusable inputs get NaN.
+def score_chunk(task):
+    index, start, end = task
+    df = read_chunk(start, end)
+    if 'pickup_datetime' not in df:
+        df['pickup_datetime'] = np.datetime64(_JOB['pickup_default'], 's')
+    X = featurize_frame(df, _JOB['features'])
+    ok = np.isfinite(X).all(axis=1)
+    predictions = np.full(len(df), np.nan)
+    if ok.any():
+        predictions[ok] = _SCORER.predict(X[ok])
+
+    out = pd.DataFrame({'id': df['id']} if 'id' in df else {})
+    out[_JOB['target']] = predictions
+    if _JOB['format'] == 'parquet':
+        path = part_path(_JOB['output'], index)
+        pq.write_table(pa.Table.from_pandas(out, preserve_index=False), path + '.tmp', compression='zstd')
+        _fsync(path + '.tmp')
+        os.replace(path + '.tmp', path)
+        return index, len(df), None
+    return index, len(df), out.to_csv(index=False, header=False, lineterminator='\n').encode()
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+# Score `input_path` (CSV or Parquet) chunk by chunk on `workers` processes
+# and write the predictions, in input order, to `output`: a directory of
+# Parquet part files (one per chunk) or a single CSV file.
+#
+# At most `max_in_flight` chunks are read, scored or waiting to be written
+# at any time, which bounds memory. After each chunk is written (in order)
+# a checkpoint records the next chunk, the input byte offset and the output
+# size; with resume=True a run continues from there, discarding anything
+# written after the checkpoint. The checkpoint also records the input,
+# model, format and chunking, and resuming with different ones is refused.
+def score_file(input_path, output, scorer, features, model_digest, fmt='parquet', workers=None,
+               chunk_mb=CHUNK_MB, max_in_flight=None, resume=False, target='trip_duration'):
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    kind = 'parquet' if input_path.endswith('.parquet') else 'csv'
+    chunk_bytes = int(chunk_mb * 1024 * 1024)
+    job = {
+        'input': os.path.abspath(input_path),
+        'kind': kind,
+        'header': None,
+        'features': list(features),
+        'target': target,
+        'format': fmt,
+        'output': output,
+        'pickup_default': datetime.now(ZoneInfo(PICKUP_TIMEZONE)).replace(tzinfo=None).isoformat(timespec='seconds'),
+    }
+    fresh = {
+        'source': source_tag(input_path),
+        'model': model_digest,
+        'format': fmt,
+        'target': target,
+        'chunking': f'{chunk_bytes} bytes' if kind == 'csv' else 'row groups',
+        'next_chunk': 0,
+        'next_offset': 0,
+        'rows': 0,
+        'output_bytes': 0,
+        'complete': False,
+    }
+
+    if kind == 'csv':
+        job['header'], header_bytes = csv_header(input_path)
+        fresh['next_offset'] = header_bytes
+        total = os.path.getsize(input_path)
+        has_id = 'id' in job['header']
+    else:
+        pf = pq.ParquetFile(input_path)
+        total = pf.metadata.num_row_groups
+        has_id = 'id' in pf.schema_arrow.names
+
+    if fmt == 'parquet':
+        os.makedirs(output, exist_ok=True)
+        checkpoint = os.path.join(output, CHECKPOINT_FILE)
+    else:
+        checkpoint = output + '.checkpoint.json'
+
+    state = load_checkpoint(checkpoint) if resume else None
+    if state is not None:
+        changed = [k for k in ('source', 'model', 'format', 'target', 'chunking') if state.get(k) != fresh[k]]
+        if changed:
+            raise SystemExit(
+                f"{checkpoint} was written for a different {', '.join(changed)}; "
+                f"run without --resume to start over"
+            )
+        if state['complete']:
+            logger.info(f"{output} is already complete ({state['rows']:,} rows)")
+            return state
+        logger.info(f"Resuming at chunk {state['next_chunk']} ({state['rows']:,} rows already scored)")
+    else:
+        state = fresh
+
+    # Drop anything written after the checkpoint (or all of it when starting over)
+    if fmt == 'parquet':
+        for path in glob.glob(os.path.join(output, 'part-*.parquet*')):
+            index = int(os.path.basename(path)[5:10])
+            if index >= state['next_chunk'] or path.endswith('.tmp'):
+                os.remove(path)
+    elif state is fresh:
+        with open(output, 'wb') as f:
+            f.write(f"{'id,' if has_id else ''}{target}\n".encode())
+        state['output_bytes'] = os.path.getsize(output)
+    else:
+        with open(output, 'r+b') as f:
+            f.truncate(state['output_bytes'])
+    save_checkpoint(checkpoint, state)
+
+    if kind == 'csv':
+        ranges = csv_chunks(input_path, state['next_offset'], chunk_bytes)
+    else:
+        ranges = ((rg, rg + 1) for rg in range(state['next_chunk'], total))
+    tasks = ((index, start, end) for index, (start, end) in enumerate(ranges, start=state['next_chunk']))
+
+    start_time = time.perf_counter()
+    start_rows = state['rows']
+    out = open(output, 'ab') if fmt == 'csv' else None
+
+    def finish(future, end):
+        index, rows, data = future.result()
+        if out is not None:
+            out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+            state['output_bytes'] = out.tell()
+        state['next_chunk'] = index + 1
+        state['next_offset'] = end if kind == 'csv' else 0
+        state['rows'] += rows
+        save_checkpoint(checkpoint, state)
+
+        done = end / total if kind == 'csv' else (index + 1) / total
+        elapsed = time.perf_counter() - start_time
+        rate = (state['rows'] - start_rows) / elapsed if elapsed else 0.0
+        logger.info(
+            f"chunk {index}: {state['rows']:,} rows ({done:.0%}), {rate:,.0f} rows/s, "
+            f"peak RSS {peak_rss_mb():.0f} MB"
+        )
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(scorer, job))
+    try:
+        pending = deque()
+        for task in tasks:
+            pending.append((pool.submit(score_chunk, task), task[2]))
+            while len(pending) >= max_in_flight:
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        if out is not None:
+            out.close()
+    pool.shutdown()
+
+    state['complete'] = True
+    save_checkpoint(checkpoint, state)
+    elapsed = time.perf_counter() - start_time
+    logger.info(
+        f"Scored {state['rows'] - start_rows:,} rows in {elapsed:.1f}s "
+        f"({(state['rows'] - start_rows) / max(elapsed, 1e-9):,.0f} rows/s) -> {output}"
+    )
+    return state
+
+
+# The production model through the same registry settings as the API, or a
+# local artifact file
+def load_model(args):
+    if args.alias:
+        if os.getenv('MODEL_REGISTRY_DIR'):
+            registry = LocalDirRegistry(os.environ['MODEL_REGISTRY_DIR'])
+        else:
+            registry = WandbRegistry(
+                os.getenv('WANDB_ENTITY'), os.getenv('WANDB_PROJECT', 'taxi-fare-eta'), os.getenv('WANDB_API_KEY')
+            )
+        cache = ArtifactCache(os.getenv('MODEL_CACHE_DIR', './model_cache'))
+        model, info = fetch_model(registry, cache, os.getenv('WAND_MODEL_NAME', 'taxi_model'), args.alias)
+        return model, info.digest
+    return load_model_file(args.model), sha256_file(args.model)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score a trip file with the model, in parallel")
+    parser.add_argument('input', nargs='?', default='nyc-taxi-trip-duration/test.csv',
+                        help="CSV or Parquet trips")
+    parser.add_argument('--output', default='predictions',
+                        help="Parquet directory (one part file per chunk) or a .csv file")
+    parser.add_argument('--format', choices=['parquet', 'csv'],
+                        help="output format (default: csv if --output ends in .csv)")
+    parser.add_argument('--model', default='taxi_model.joblib')
+    parser.add_argument('--alias', help="score with this registry alias (e.g. production) instead of --model")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-mb', type=float, default=CHUNK_MB,
+                        help="CSV bytes per chunk (Parquet inputs are chunked by row group)")
+    parser.add_argument('--max-in-flight', type=int,
+                        help="chunks being scored or waiting to be written (default 2 x workers)")
+    parser.add_argument('--log-target', action='store_true',
+                        help="write log1p(seconds) as predicted instead of seconds")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue from the last completed chunk")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    model, digest = load_model(args)
+    names = getattr(model, 'feature_names_in_', None)
+    features = [str(n) for n in names] if names is not None else list(MODEL_FEATURES)
+    scorer = compile_model(model, inverse_log=not args.log_target)
+    fmt = args.format or ('csv' if args.output.endswith('.csv') else 'parquet')
+    score_file(
+        args.input, args.output, scorer, features, digest, fmt=fmt, workers=args.workers,
+        chunk_mb=args.chunk_mb, max_in_flight=args.max_in_flight, resume=args.resume,
+        target='log_trip_duration' if args.log_target else 'trip_duration',
+    )
@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import zlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from ingest import cache_is_fresh, default_cache_path, ingest_csv, peak_rss_mb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Phase 2', 'app'))
+from features import MODEL_FEATURES, featurize_frame
+
+logger = logging.getLogger(__name__)
+
+# Same features/target as buildmodel.py
+FEATURES = list(MODEL_FEATURES)
+TARGET = 'log_trip_duration'
+READ_COLUMNS = [
+    'pickup_datetime', 'passenger_count',
+    'pickup_longitude', 'pickup_latitude',
+    'dropoff_longitude', 'dropoff_latitude',
+    'trip_duration',
+]
+
+
+# Sufficient statistics for OLS over a set of rows, kept in centered form
+# (means plus co-moment matrices) so that merging many chunks of raw
+# coordinates does not lose precision the way summing raw XᵀX would.
+class OLSStats:
+    def __init__(self, n_features):
+        self.n = 0
+        self.mean_x = np.zeros(n_features)
+        self.mean_y = 0.0
+        self.cxx = np.zeros((n_features, n_features))  # Σ (x - x̄)(x - x̄)ᵀ
+        self.cxy = np.zeros(n_features)                 # Σ (x - x̄)(y - ȳ)
+        self.cyy = 0.0                                  # Σ (y - ȳ)²
+
+    @classmethod
+    def from_arrays(cls, X, y):
+        stats = cls(X.shape[1])
+        stats.n = len(y)
+        if stats.n:
+            stats.mean_x = X.mean(axis=0)
+            stats.mean_y = float(y.mean())
+            Xc = X - stats.mean_x
+            yc = y - stats.mean_y
+            stats.cxx = Xc.T @ Xc
+            stats.cxy = Xc.T @ yc
+            stats.cyy = float(yc @ yc)
+        return stats
+
+    # Pairwise merge (Chan et al.)
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            return other
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        w = self.n * other.n / n
+        merged = OLSStats(len(dx))
+        merged.n = n
+        merged.mean_x = self.mean_x + dx * other.n / n
+        merged.mean_y = self.mean_y + dy * other.n / n
+        merged.cxx = self.cxx + other.cxx + np.outer(dx, dx) * w
+        merged.cxy = self.cxy + other.cxy + dx * dy * w
+        merged.cyy = self.cyy + other.cyy + dy * dy * w
+        return merged
+
+    def solve(self):
+        try:
+            coef = np.linalg.solve(self.cxx, self.cxy)
+        except np.linalg.LinAlgError:
+            coef = np.linalg.lstsq(self.cxx, self.cxy, rcond=None)[0]
+        intercept = self.mean_y - self.mean_x @ coef
+        return coef, float(intercept)
+
+    # Sum of squared errors of (coef, intercept) over these rows
+    def sse(self, coef, intercept):
+        offset = self.mean_y - self.mean_x @ coef - intercept
+        return float(self.cyy - 2 * coef @ self.cxy + coef @ self.cxx @ coef + self.n * offset ** 2)
+
+
+# Same preparation as buildmodel.py, on one chunk
+def prepare_chunk(df):
+    X = featurize_frame(df, FEATURES).astype(np.float64)
+    y = np.log1p(df['trip_duration'].to_numpy(dtype=np.float64))
+    keep = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    return X[keep], y[keep]
+
+
+# Worker: statistics for one Parquet row group, split into train/validation
+def partial_stats(task):
+    path, row_group, val_fraction, seed = task
+    table = pq.ParquetFile(path).read_row_group(row_group, columns=READ_COLUMNS)
+    X, y = prepare_chunk(table.to_pandas())
+    rng = np.random.default_rng([seed, row_group, zlib.crc32(os.path.basename(path).encode())])
+    val = rng.random(len(y)) < val_fraction
+    return OLSStats.from_arrays(X[~val], y[~val]), OLSStats.from_arrays(X[val], y[val])
+
+
+def parquet_inputs(inputs):
+    paths = []
+    for path in inputs:
+        if path.endswith('.csv'):
+            cache = default_cache_path(path)
+            if not cache_is_fresh(path, cache):
+                ingest_csv(path, cache)
+            path = cache
+        paths.append(path)
+    return paths
+
+
+def train(inputs, workers=None, val_fraction=0.2, seed=42):
+    tasks = [
+        (path, rg, val_fraction, seed)
+        for path in parquet_inputs(inputs)
+        for rg in range(pq.ParquetFile(path).num_row_groups)
+    ]
+    start = time.perf_counter()
+    train_stats = OLSStats(len(FEATURES))
+    val_stats = OLSStats(len(FEATURES))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for tr, va in pool.map(partial_stats, tasks):
+            train_stats = train_stats.merge(tr)
+            val_stats = val_stats.merge(va)
+
+    # Only the parent builds the estimator; pool workers never import sklearn
+    from sklearn.linear_model import LinearRegression
+
+    coef, intercept = train_stats.solve()
+    model = LinearRegression()
+    model.coef_ = coef
+    model.intercept_ = intercept
+    model.n_features_in_ = len(FEATURES)
+    model.feature_names_in_ = np.array(FEATURES, dtype=object)
+    model.rank_ = int(np.linalg.matrix_rank(train_stats.cxx))
+
+    val_mse = val_stats.sse(coef, intercept) / max(val_stats.n, 1)
+    metrics = {
+        'train_rows': train_stats.n,
+        'val_rows': val_stats.n,
+        'train_rmse': float(np.sqrt(train_stats.sse(coef, intercept) / max(train_stats.n, 1))),
+        'mean_squared_error': val_mse,
+        'root_mean_squared_error': float(np.sqrt(val_mse)),
+    }
+    logger.info(
+        f"Fitted on {train_stats.n:,} rows from {len(tasks)} chunks in "
+        f"{time.perf_counter() - start:.1f}s (peak RSS {peak_rss_mb():.0f} MB)"
+    )
+    return model, metrics
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Out-of-core LinearRegression training")
+    parser.add_argument('inputs', nargs='*', default=['nyc-taxi-trip-duration/train.csv'],
+                        help="CSV files (cached to Parquet) or Parquet files")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--val-fraction', type=float, default=0.2)
+    parser.add_argument('--output', default='taxi_model.joblib')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    model, metrics = train(args.inputs, args.workers, args.val_fraction)
+    print(f"Validation Root Mean Squared Error (RMSE) on Log-Transformed Target: "
+          f"{metrics['root_mean_squared_error']:.4f}")
+    import joblib
+
+    joblib.dump(model, args.output)
+    print(f"Model successfully saved to {args.output}")
@@ -0,0 +1,199 @@
+import json
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Any, Dict, Iterable, Optional
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int = 1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# Bounded concurrency with a queue-wait deadline and an AIMD-adapted limit.
+#
+# At most `limit` requests run at once; the rest wait in a FIFO queue. A
+# request is rejected up front when the queue is full or when the expected
+# wait (queue position x mean service time / limit) already exceeds
+# `queue_timeout`, and is dropped from the queue if it waits longer than
+# that. The limit itself adapts: when a request takes longer than
+# `target_latency` it shrinks multiplicatively (at most once per
+# target_latency), and every completion while the limit was fully used
+# grows it by 1/limit, i.e. by about one per round of requests.
+#
+# `shedding` is true while requests are queueing or the limit is nearly
+# used up; callers use it to skip work that is not needed for the response.
+# All methods run on the event loop thread, so no lock is needed.
+class AdmissionController:
+    def __init__(
+        self,
+        limit: int = 64,
+        min_limit: int = 4,
+        max_limit: int = 1024,
+        max_queue: int = 1024,
+        queue_timeout: float = 0.5,
+        target_latency: float = 0.25,
+        backoff: float = 0.9,
+        adaptive: bool = True,
+        shed_utilization: float = 0.9,
+    ):
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.adaptive = adaptive
+        self.shed_utilization = shed_utilization
+
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._last_decrease = 0.0
+        self.service_time = 0.0  # EWMA of admitted request latency (s)
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.shed: Dict[str, int] = {}  # items of optional work skipped, by kind
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def shedding(self) -> bool:
+        return bool(self._waiters) or self.in_flight >= self.shed_utilization * int(self.limit)
+
+    def _expected_wait(self, position: int) -> float:
+        return position * self.service_time / max(int(self.limit), 1)
+
+    def _reject(self, reason: str, wait: float):
+        self.rejected += 1
+        raise AdmissionRejected(reason, retry_after=max(1, math.ceil(wait)))
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        position = len(self._waiters) + 1
+        wait = self._expected_wait(position)
+        if position > self.max_queue:
+            self._reject("admission queue is full", wait)
+        if wait > self.queue_timeout:
+            self._reject(f"expected queue wait {wait * 1000:.0f} ms exceeds the deadline", wait)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._overloaded()
+            self._reject("timed out waiting for admission", self._expected_wait(len(self._waiters)))
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # handed a slot just as the client went away: pass it on
+                self.in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            if not future.done() or future.cancelled():
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+        self.admitted += 1  # the slot was handed over by _wake()
+
+    def release(self, latency: float):
+        self.in_flight -= 1
+        self.service_time = latency if not self.service_time else 0.9 * self.service_time + 0.1 * latency
+        if self.adaptive:
+            if latency > self.target_latency:
+                self._overloaded()
+            elif self.in_flight + 1 >= int(self.limit):
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def record_shed(self, work: str, items: int = 1):
+        self.shed[work] = self.shed.get(work, 0) + items
+
+    def _overloaded(self):
+        now = time.monotonic()
+        if self.adaptive and now - self._last_decrease >= self.target_latency:
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+            self._last_decrease = now
+
+    def load(self) -> Dict[str, Any]:
+        limit = int(self.limit)
+        return {
+            "in_flight": self.in_flight,
+            "limit": limit,
+            "queued": len(self._waiters),
+            "utilization": self.in_flight / limit if limit else 1.0,
+            "shedding": self.shedding,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.load(),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "target_latency": self.target_latency,
+            "adaptive": self.adaptive,
+            "service_time_ms": self.service_time * 1000,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "shed": dict(self.shed),
+        }
+
+
+# Pure ASGI middleware applying the controller to `paths`. Rejected requests
+# get 503 with Retry-After before their body is read.
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController, paths: Optional[Iterable[str]] = None):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths) if paths is not None else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.paths is not None and scope["path"] not in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire()
+        except AdmissionRejected as e:
+            body = json.dumps({"detail": f"Overloaded: {e.reason}"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(e.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - started)
@@ -0,0 +1,167 @@
+import time
+import asyncio
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class BatcherOverloaded(Exception):
+    pass
+
+
+# Dynamic micro-batching for single-row predictions.
+#
+# Callers put one feature row, with the model it was featurized for, on an
+# asyncio queue and await a future. A collector task takes the first waiting
+# row, keeps collecting until either `max_batch` rows are queued or
+# `window_ms` has passed since it started, runs one vectorized
+# `score_fn(model, X)` per model in the group (more than one only around a
+# model reload) and resolves every future.
+# A larger window trades p50 latency for throughput under concurrency.
+class MicroBatcher:
+    def __init__(
+        self,
+        score_fn: Callable[[Any, np.ndarray], Sequence[float]],
+        window_ms: float = 2.0,
+        max_batch: int = 256,
+        max_queue: int = 10000,
+    ):
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._more: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+        self.errors = 0
+        self.max_batch_seen = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.size_histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # Start the collector on the running event loop
+    async def start(self):
+        if self.running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._more = asyncio.Event()
+        self._task = self.loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # fail anything still waiting instead of leaving callers hanging
+        while self._queue is not None and not self._queue.empty():
+            _, _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(BatcherOverloaded("batcher stopped"))
+
+    # Score one row with `model` (call from the event loop)
+    async def submit(self, model: Any, row: Sequence[float]) -> float:
+        future = self.loop.create_future()
+        try:
+            self._queue.put_nowait((model, row, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatcherOverloaded(f"micro-batch queue is full ({self.max_queue} rows)")
+        self._more.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self.loop.time() + self.window
+            try:
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    except asyncio.QueueEmpty:
+                        pass
+                    remaining = deadline - self.loop.time()
+                    if remaining <= 0:
+                        break
+                    self._more.clear()
+                    try:
+                        await asyncio.wait_for(self._more.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # stopped mid-collection: these rows are off the queue, so
+                # stop() cannot fail them
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(BatcherOverloaded("batcher stopped"))
+                raise
+            groups = {}
+            for entry in batch:
+                groups.setdefault(id(entry[0]), []).append(entry)
+            for group in groups.values():
+                self._score(group)
+
+    # Score rows that all belong to the same model
+    def _score(self, batch):
+        started = time.perf_counter()
+        try:
+            X = np.array([row for _, row, _, _ in batch], dtype=np.float64)
+            predictions = self.score_fn(batch[0][0], X)
+        except Exception as e:
+            self.errors += 1
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future, enqueued), prediction in zip(batch, predictions):
+            wait = started - enqueued
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+            if not future.done():  # the caller may have been cancelled
+                future.set_result(float(prediction))
+
+        size = len(batch)
+        self.batches += 1
+        self.rows += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        bucket = next((i for i, b in enumerate(BATCH_SIZE_BUCKETS) if size <= b), len(BATCH_SIZE_BUCKETS))
+        self.size_histogram[bucket] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        labels = [f"<={b}" for b in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+        return {
+            "running": self.running,
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "batch_size_histogram": dict(zip(labels, self.size_histogram)),
+            "mean_wait_ms": self.wait_total / self.rows * 1000.0 if self.rows else 0.0,
+            "max_wait_ms": self.wait_max * 1000.0,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
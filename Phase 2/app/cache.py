@@ -0,0 +1,430 @@
+import os
+import sys
+import time
+import json
+import zlib
+import random
+import struct
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from decimal import Decimal
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from dynamo import DynamoWriteBehind, get_dynamodb
+
+
+# Fields that are snapped to the cache grid when one is configured
+COORDINATE_FIELDS = ("pickup_lat", "pickup_lon", "dropoff_lat", "dropoff_lon")
+
+# Rough per-entry bookkeeping cost (OrderedDict node + tuple) used for the
+# memory accounting; keys and values are measured with sys.getsizeof
+ENTRY_OVERHEAD = 160
+
+
+# Stable hash of a request dict (cache_key hashes the model inputs plus the
+# model namespace with it to make the fare_cache table key)
+def hash_request(req: Dict[str, Any]) -> str:
+    payload = json.dumps(req, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Snap a coordinate to a grid of `grid` degrees (0 disables snapping)
+def snap(value: float, grid: float) -> float:
+    if not grid:
+        return value
+    return round(round(value / grid) * grid, 6)
+
+
+# Cache key for the model inputs of a request. With a grid, nearby repeat
+# trips share a key; `namespace` keeps keys from different models apart.
+def cache_key(fields: Dict[str, Any], grid: float = 0.0, namespace: str = "") -> str:
+    keyed = {
+        name: snap(value, grid) if name in COORDINATE_FIELDS else value
+        for name, value in fields.items()
+    }
+    keyed["_ns"] = namespace
+    return hash_request(keyed)
+
+
+# Bounded in-process LRU with a per-entry TTL and approximate memory
+# accounting. Entries are evicted least-recently-used first whenever either
+# `max_entries` or `max_bytes` would be exceeded.
+class LRUTTLCache:
+    def __init__(self, max_entries: int = 100000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires, size = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: float):
+        size = sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._data[key] = (value, time.monotonic() + self.ttl, size)
+            self.bytes += size
+            while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# Slot layout of SharedMemoryCache: key fingerprint, value, expiry (wall
+# clock, so it means the same in every process) and a CRC of those 24 bytes
+_SLOT = struct.Struct("<QddI4x")
+_BODY = struct.Struct("<Qdd")
+
+
+# 64-bit fingerprint of a cache key (keys are normally sha256 hex digests)
+def fingerprint(key: str) -> int:
+    try:
+        return int(key[:16], 16)
+    except ValueError:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+# Cross-process local tier: a direct-mapped table of fixed 32-byte slots in
+# shared memory (same get/put interface as LRUTTLCache).
+#
+# serve.py creates it in the parent before forking, so every worker maps the
+# same pages and a prediction computed by one worker is a hit in all others,
+# with one copy in memory however many workers there are. A key lives in
+# slot fingerprint % slots and a put simply overwrites whatever was there.
+# There are no locks: each slot is read and written with a single copy and
+# carries a CRC, so a read racing a write in another process sees a
+# mismatch and counts as a miss. Counters are per process.
+class SharedMemoryCache:
+    def __init__(self, slots: int = 1 << 20, ttl: float = 300.0):
+        self.slots = slots
+        self.ttl = ttl
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * _SLOT.size)
+        self._buf = self._shm.buf
+        self._table = np.ndarray((slots, _SLOT.size // 8), dtype=np.uint64, buffer=self._buf)
+        self._table.fill(0)
+        self._owner = os.getpid()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def _read(self, offset):
+        data = bytes(self._buf[offset:offset + _SLOT.size])
+        fp, value, expires, crc = _SLOT.unpack(data)
+        if zlib.crc32(data[:_BODY.size]) != crc:
+            return None  # empty, or torn by a concurrent write
+        return fp, value, expires
+
+    def get(self, key: str) -> Optional[float]:
+        fp = fingerprint(key)
+        slot = self._read((fp % self.slots) * _SLOT.size)
+        if slot is None or slot[0] != fp:
+            self.misses += 1
+            return None
+        if slot[2] <= time.time():
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return slot[1]
+
+    def put(self, key: str, value: float):
+        fp = fingerprint(key)
+        offset = (fp % self.slots) * _SLOT.size
+        old = self._read(offset)
+        now = time.time()
+        if old is not None and old[0] != fp and old[2] > now:
+            self.evictions += 1
+        value, expires = float(value), now + self.ttl
+        crc = zlib.crc32(_BODY.pack(fp, value, expires))
+        self._buf[offset:offset + _SLOT.size] = _SLOT.pack(fp, value, expires, crc)
+
+    def clear(self):
+        self._table.fill(0)
+
+    # Occupied slots (a scan of the table; used for stats only)
+    def __len__(self):
+        return int(np.count_nonzero(self._table[:, 3]))
+
+    # Detach; the creating process also frees the segment
+    def close(self):
+        self._table = None
+        self._buf = None
+        self._shm.close()
+        if os.getpid() == self._owner:
+            self._shm.unlink()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "bytes": self.slots * _SLOT.size,
+            "max_entries": self.slots,
+            "max_bytes": self.slots * _SLOT.size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "shared_memory": self.name,
+        }
+
+
+# Second tier: the DynamoDB fare_cache table keyed by request_hash.
+# Reads only happen on a local miss. From async handlers they run on a
+# dedicated pool of `max_concurrency` threads sharing the pooled client, so
+# at most that many calls are in flight and the event loop never blocks.
+# Writes go through a write-behind queue. Any DynamoDB error is counted and
+# treated as a miss. _get/_get_many block and only run on that pool.
+class DynamoCacheTier:
+    def __init__(
+        self,
+        table_name: str,
+        resource_factory: Callable[[], Any] = get_dynamodb,
+        ttl: float = 86400.0,
+        max_concurrency: int = 50,
+        max_retries: int = 3,
+        base_backoff: float = 0.01,
+        max_backoff: float = 0.1,
+    ):
+        self.table_name = table_name
+        self.resource_factory = resource_factory
+        self.ttl = ttl
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.writer = DynamoWriteBehind(table_name, resource_factory)
+        self._executor = None
+        self._executor_pid = None
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.unprocessed = 0
+
+    def _get(self, key: str) -> Optional[float]:
+        try:
+            item = self.resource_factory().Table(self.table_name).get_item(
+                Key={"request_hash": key}
+            ).get("Item")
+        except Exception as e:
+            self.errors += 1
+            print(f"fare_cache lookup failed: {e}")
+            return None
+        return self._value(item)
+
+    def _get_many(self, keys: List[str]) -> Dict[str, float]:
+        found = {}
+        resource = self.resource_factory()
+        if not hasattr(resource, "batch_get_item"):
+            for key in keys:
+                value = self._get(key)
+                if value is not None:
+                    found[key] = value
+            return found
+
+        # UnprocessedKeys means the table is throttling: retry them with a
+        # short capped, jittered backoff (this is on the request path) and
+        # treat any still unprocessed after `max_retries` as misses
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 100):  # BatchGetItem limit
+            chunk = unique[start:start + 100]
+            request = {self.table_name: {"Keys": [{"request_hash": k} for k in chunk]}}
+            returned = 0
+            attempt = 0
+            try:
+                while request:
+                    response = resource.batch_get_item(RequestItems=request)
+                    for item in response.get("Responses", {}).get(self.table_name, []):
+                        returned += 1
+                        value = self._value(item)
+                        if value is not None:
+                            found[item["request_hash"]] = value
+                    request = response.get("UnprocessedKeys") or None
+                    if request:
+                        attempt += 1
+                        if attempt > self.max_retries:
+                            self.unprocessed += len(request.get(self.table_name, {}).get("Keys", []))
+                            break
+                        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+                        time.sleep(delay * random.uniform(0.5, 1.0))
+            except Exception as e:
+                self.errors += 1
+                print(f"fare_cache batch lookup failed: {e}")
+            self.misses += len(chunk) - returned
+        return found
+
+    # Created on first use in each process (threads do not survive a fork)
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="fare-cache")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    async def aget(self, key: str) -> Optional[float]:
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), self._get, key)
+
+    async def aget_many(self, keys: List[str]) -> Dict[str, float]:
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), self._get_many, keys)
+
+    def put(self, key: str, value: float):
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable):
+        expires_at = int(time.time() + self.ttl)
+        self.writer.submit_many(
+            {"request_hash": key, "prediction": value, "expires_at": expires_at}
+            for key, value in items
+        )
+
+    def close(self):
+        self.writer.close()
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "table": self.table_name,
+            "max_concurrency": self.max_concurrency,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "unprocessed": self.unprocessed,
+            "write_queue": self.writer.stats(),
+        }
+
+    def _value(self, item):
+        if not item or "prediction" not in item:
+            self.misses += 1
+            return None
+        expires_at = item.get("expires_at")
+        if expires_at is not None and int(expires_at) < time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        value = item["prediction"]
+        return float(value) if isinstance(value, (Decimal, int, float)) else None
+
+
+# Two-tier prediction cache: the local LRU is checked first, DynamoDB second.
+# Remote hits are promoted into the local tier.
+class PredictionCache:
+    def __init__(self, local: LRUTTLCache, remote: Optional[DynamoCacheTier] = None):
+        self.local = local
+        self.remote = remote
+
+    # Lookups await the remote tier, which runs on its own thread pool
+    async def aget(self, key: str) -> Optional[float]:
+        value = self.local.get(key)
+        if value is None:
+            value = await self.aget_remote(key)
+        return value
+
+    # Remote tier only (after a local miss); hits are promoted
+    async def aget_remote(self, key: str) -> Optional[float]:
+        if self.remote is None:
+            return None
+        value = await self.remote.aget(key)
+        if value is not None:
+            self.local.put(key, value)
+        return value
+
+    async def aget_many(self, keys: List[str]) -> Dict[str, float]:
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing and self.remote is not None:
+            remote = await self.remote.aget_many(missing)
+            for key, value in remote.items():
+                self.local.put(key, value)
+            found.update(remote)
+        return found
+
+    # remote=False only fills the local tier (writes shed under load)
+    def put(self, key: str, value: float, remote: bool = True):
+        self.local.put(key, value)
+        if remote and self.remote is not None:
+            self.remote.put(key, value)
+
+    def put_many(self, items: List, remote: bool = True):
+        for key, value in items:
+            self.local.put(key, value)
+        if remote and self.remote is not None:
+            self.remote.put_many(items)
+
+    def close(self):
+        if self.remote is not None:
+            self.remote.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "local": self.local.stats(),
+            "remote": self.remote.stats() if self.remote is not None else None,
+        }
@@ -0,0 +1,184 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+# Columnar request/response bodies for bulk callers. A request is a set of
+# equal-length columns, decoded straight into NumPy arrays (no per-row
+# Python objects); the response is a single float32 `prediction` column.
+#
+#   Arrow IPC stream: one or more record batches with the columns below.
+#     pickup_datetime may be a timestamp (naive = NYC local time, or
+#     tz-aware) or int64 epoch seconds.
+#   MessagePack: a map of column name -> bin (little-endian float32, or
+#     int64 epoch seconds for pickup_datetime) or a plain array of numbers.
+#     Needs the optional msgpack package.
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+MSGPACK = "application/msgpack"
+JSON = "application/json"
+
+_MEDIA_TYPES = {
+    ARROW_STREAM: ARROW_STREAM,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+REQUIRED_COLUMNS = ("pickup_lat", "pickup_lon", "dropoff_lat", "dropoff_lon", "passenger_count", "trip_distance")
+OPTIONAL_COLUMNS = ("pickup_datetime",)  # defaults to now
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+# Columnar format named by a Content-Type header, or None (JSON)
+def media_type(content_type: Optional[str]) -> Optional[str]:
+    if not content_type:
+        return None
+    return _MEDIA_TYPES.get(content_type.split(";")[0].strip().lower())
+
+
+# Response format for an Accept header: the first columnar or JSON type it
+# lists, otherwise `default` (the request's own format)
+def negotiate(accept: Optional[str], default: str) -> str:
+    for part in (accept or "").split(","):
+        name = part.split(";")[0].strip().lower()
+        if name in _MEDIA_TYPES:
+            return _MEDIA_TYPES[name]
+        if name == JSON:
+            return JSON
+    return default
+
+
+# Decode a request body into {column: ndarray}. pickup_datetime comes back
+# as naive datetime64[s] in `timezone`. Raises ValueError for malformed
+# bodies and UnsupportedFormat when the codec is not installed.
+def decode(fmt: str, body: bytes, timezone: str) -> Dict[str, np.ndarray]:
+    if fmt == ARROW_STREAM:
+        columns = _decode_arrow(body, timezone)
+    elif fmt == MSGPACK:
+        columns = _decode_msgpack(body, timezone)
+    else:
+        raise UnsupportedFormat(f"Unsupported format '{fmt}'")
+
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("Columns have different lengths")
+    return columns
+
+
+# Rows whose required columns are all finite (Arrow nulls decode to NaN) and
+# whose pickup_datetime, when given, is not NaT. Anything else is an invalid
+# row: it gets no prediction and is not logged.
+def valid_rows(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    ok = np.ones(len(columns[REQUIRED_COLUMNS[0]]), dtype=bool)
+    for name in REQUIRED_COLUMNS:
+        values = columns[name]
+        if values.dtype.kind == "f":
+            ok &= np.isfinite(values)
+    if "pickup_datetime" in columns:
+        ok &= ~np.isnat(columns["pickup_datetime"])
+    return ok
+
+
+# Encode the prediction column (and string metadata) as a response body
+def encode(fmt: str, predictions: np.ndarray, metadata: Dict[str, str]) -> bytes:
+    predictions = np.ascontiguousarray(predictions, dtype="<f4")
+    if fmt == ARROW_STREAM:
+        import pyarrow as pa
+
+        batch = pa.record_batch([pa.array(predictions)], names=["prediction"])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema.with_metadata(metadata)) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+    if fmt == MSGPACK:
+        msgpack = _msgpack()
+        return msgpack.packb({**metadata, "prediction": predictions.tobytes()})
+    raise UnsupportedFormat(f"Unsupported format '{fmt}'")
+
+
+def _decode_arrow(body: bytes, timezone: str) -> Dict[str, np.ndarray]:
+    import pyarrow as pa
+
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValueError(f"Invalid Arrow IPC stream: {e}")
+
+    columns = {}
+    for name in REQUIRED_COLUMNS + OPTIONAL_COLUMNS:
+        if name not in table.column_names:
+            continue
+        column = table.column(name)
+        if name == "pickup_datetime":
+            columns[name] = _arrow_datetimes(column, timezone)
+        elif pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+            # zero-copy for a single chunk without nulls; nulls become NaN
+            columns[name] = column.to_numpy()
+        else:
+            raise ValueError(f"Column '{name}' must be numeric, not {column.type}")
+    return columns
+
+
+def _arrow_datetimes(column, timezone: str) -> np.ndarray:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_timestamp(column.type):
+        if column.type.tz is not None:
+            column = pc.local_timestamp(column.cast(pa.timestamp(column.type.unit, timezone)))
+        return column.to_numpy().astype("datetime64[s]")
+    if pa.types.is_integer(column.type):
+        return _local_datetimes(column.to_numpy(), timezone)
+    raise ValueError(f"Column 'pickup_datetime' must be a timestamp or epoch seconds, not {column.type}")
+
+
+# Epoch seconds (UTC) -> naive local datetime64[s]
+def _local_datetimes(seconds: np.ndarray, timezone: str) -> np.ndarray:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    instants = pa.array(np.asarray(seconds, dtype=np.int64), type=pa.timestamp("s", tz=timezone))
+    return pc.local_timestamp(instants).to_numpy().astype("datetime64[s]")
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise UnsupportedFormat("MessagePack support needs the msgpack package")
+    return msgpack
+
+
+def _decode_msgpack(body: bytes, timezone: str) -> Dict[str, np.ndarray]:
+    msgpack = _msgpack()
+    try:
+        payload = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise ValueError(f"Invalid MessagePack body: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("MessagePack body must be a map of column name to values")
+
+    columns = {}
+    for name in REQUIRED_COLUMNS + OPTIONAL_COLUMNS:
+        if name not in payload:
+            continue
+        dtype = np.dtype("<i8") if name == "pickup_datetime" else np.dtype("<f4")
+        value = payload[name]
+        if isinstance(value, bytes):
+            if len(value) % dtype.itemsize:
+                raise ValueError(f"Column '{name}' is not a whole number of {dtype} values")
+            values = np.frombuffer(value, dtype=dtype)
+        elif isinstance(value, list):
+            try:
+                values = np.asarray(value, dtype=dtype if name == "pickup_datetime" else np.float64)
+            except (TypeError, ValueError):
+                raise ValueError(f"Column '{name}' must contain numbers")
+        else:
+            raise ValueError(f"Column '{name}' must be bin or an array")
+        columns[name] = _local_datetimes(values, timezone) if name == "pickup_datetime" else values
+    return columns
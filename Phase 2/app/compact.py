@@ -0,0 +1,320 @@
+import os
+import glob
+import json
+import time
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Flat, typed schema of compacted prediction logs. Files are partitioned by
+# UTC date as <root>/date=YYYY-MM-DD/part-<run>.parquet.
+SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("user_id", pa.string()),
+    ("pickup_lat", pa.float64()),
+    ("pickup_lon", pa.float64()),
+    ("dropoff_lat", pa.float64()),
+    ("dropoff_lon", pa.float64()),
+    ("passenger_count", pa.int16()),
+    ("trip_distance", pa.float32()),
+    ("prediction", pa.float64()),
+    ("model_alias", pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+STATE_FILE = "_compaction_state.json"
+CHUNK_BYTES = 16 * 1024 * 1024  # log bytes parsed and written at a time
+BATCH_ROWS = 50000  # DynamoDB items buffered before they are written
+# DynamoDB items reach the table up to a few seconds after their timestamp
+# (write-behind queue, batching, retries with backoff), so a run only takes
+# items at least this old; the rest wait for the next run
+DYNAMO_LAG = float(os.getenv("DYNAMO_COMPACT_LAG", "900"))
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _timestamp(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    ts = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)  # the API logs naive UTC times
+    return ts.astimezone(timezone.utc)
+
+
+# One flat record from either a JSON-lines log record or a DynamoDB item,
+# where the request fields are nested under `input` (values may be Decimal)
+def flatten(record: Dict[str, Any]) -> Dict[str, Any]:
+    source = record.get("input") or record
+    count = source.get("passenger_count")
+    return {
+        "timestamp": _timestamp(record.get("timestamp")),
+        "user_id": source.get("user_id"),
+        "pickup_lat": _float(source.get("pickup_lat")),
+        "pickup_lon": _float(source.get("pickup_lon")),
+        "dropoff_lat": _float(source.get("dropoff_lat")),
+        "dropoff_lon": _float(source.get("dropoff_lon")),
+        "passenger_count": None if count is None else int(count),
+        "trip_distance": _float(source.get("trip_distance")),
+        "prediction": _float(record.get("prediction")),
+        "model_alias": record.get("model_alias"),
+    }
+
+
+# The part files of one run, one per date, written batch by batch (one row
+# group each) so a run never holds more than one batch in memory. Files are
+# written as .tmp and only renamed into place by close().
+class PartWriter:
+    def __init__(self, root: str, run: int, compression: str):
+        self.root = root
+        self.run = run
+        self.compression = compression
+        self.rows = 0
+        self._writers: Dict[str, pq.ParquetWriter] = {}
+
+    def _path(self, day: str) -> str:
+        return os.path.join(self.root, f"date={day}", f"part-{self.run:06d}.parquet")
+
+    def write(self, records: List[Dict[str, Any]]):
+        by_date: Dict[str, List[Dict[str, Any]]] = {}
+        for r in records:
+            if r["timestamp"] is not None:
+                by_date.setdefault(r["timestamp"].date().isoformat(), []).append(r)
+        for day, rows in sorted(by_date.items()):
+            writer = self._writers.get(day)
+            if writer is None:
+                os.makedirs(os.path.dirname(self._path(day)), exist_ok=True)
+                writer = pq.ParquetWriter(f"{self._path(day)}.tmp", SCHEMA, compression=self.compression)
+                self._writers[day] = writer
+            writer.write_table(pa.Table.from_pylist(rows, schema=SCHEMA).sort_by("timestamp"))
+            self.rows += len(rows)
+
+    def close(self):
+        for day, writer in self._writers.items():
+            writer.close()
+            os.replace(f"{self._path(day)}.tmp", self._path(day))
+        self._writers = {}
+
+
+# Incremental compaction into date-partitioned, zstd-compressed Parquet.
+#
+# Every run only appends new part files (one per date it saw), so compacted
+# data is never rewritten. Progress lives in a state file under `root`: the
+# byte offset reached in each log file (keyed by inode, so it survives
+# rotation renames, together with a hash of the file's first line, so a new
+# file that reuses an inode is read from the start), the DynamoDB timestamp
+# compacted up to, and the last
+# committed run number. Parts left by a run that crashed before committing
+# its state are deleted at the start of the next run, which then re-reads
+# that input.
+class Compactor:
+    def __init__(self, root: str, compression: str = "zstd", chunk_bytes: int = CHUNK_BYTES):
+        self.root = root
+        self.compression = compression
+        self.chunk_bytes = chunk_bytes
+        self.state_path = os.path.join(root, STATE_FILE)
+        try:
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+        self.state.setdefault("run", 0)
+        self.state.setdefault("files", {})
+        self.state.setdefault("dynamo_since", None)
+
+    def _save_state(self):
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def _remove_uncommitted(self):
+        for path in glob.glob(os.path.join(self.root, "date=*", "part-*.parquet*")):
+            try:
+                run = int(os.path.basename(path)[5:].split(".")[0])
+            except ValueError:
+                continue
+            if run > self.state["run"]:
+                os.remove(path)
+
+    def _start_run(self) -> PartWriter:
+        os.makedirs(self.root, exist_ok=True)
+        self._remove_uncommitted()
+        return PartWriter(self.root, self.state["run"] + 1, self.compression)
+
+    def _commit(self, parts: PartWriter) -> int:
+        parts.close()
+        if parts.rows:
+            self.state["run"] = parts.run
+        self._save_state()
+        return parts.rows
+
+    # Compact new lines of `log_path` and its rotated siblings
+    # (<stem>.<date>.<n><ext>, as written by PredictionLogWriter), reading
+    # at most `chunk_bytes` at a time
+    def compact_logs(self, log_path: str) -> int:
+        parts = self._start_run()
+        stem, ext = os.path.splitext(log_path)
+        paths = sorted(
+            set(glob.glob(f"{stem}.*{ext}")) | set(glob.glob(log_path)),
+            key=os.path.getmtime,
+        )
+
+        offsets, bad = {}, 0
+        for path in paths:
+            with open(path, "rb") as f:
+                key = str(os.fstat(f.fileno()).st_ino)
+                size = os.fstat(f.fileno()).st_size
+                head = hashlib.sha1(f.readline(4096)).hexdigest()
+                saved = self.state["files"].get(key) or {}
+                if isinstance(saved, int):
+                    saved = {"offset": saved}  # state from before fingerprints
+                offset = saved.get("offset", 0)
+                if offset > size or saved.get("head", head) != head:
+                    offset = 0  # truncated, or a new file reusing the inode
+                f.seek(offset)
+                remaining, tail = size - offset, b""
+                while remaining > 0:
+                    block = f.read(min(self.chunk_bytes, remaining))
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    data = tail + block
+                    end = data.rfind(b"\n") + 1  # whole lines only
+                    tail = data[end:]
+                    records = []
+                    for line in data[:end].splitlines():
+                        try:
+                            records.append(flatten(json.loads(line)))
+                        except (ValueError, TypeError, AttributeError):
+                            bad += 1
+                    parts.write(records)
+                    offset += end
+            offsets[key] = {"offset": offset, "head": head}
+
+        self.state["files"] = offsets  # forget files that no longer exist
+        written = self._commit(parts)
+        if bad:
+            print(f"Skipped {bad} malformed log lines")
+        return written
+
+    # Compact DynamoDB items with timestamps in (previous cutoff, now - lag].
+    # Holding the cutoff back by `lag` (longer than the write-behind queue's
+    # worst flush and retry time) means an item is only skipped if it reaches
+    # the table more than `lag` after its timestamp. Items are deduplicated
+    # by request_id within a run.
+    #
+    # With `index` (a GSI keyed by log_date, sorted by timestamp) each run
+    # queries only the date buckets in its window, so its cost follows the
+    # new data; the first run, and any run without one, scans the whole
+    # table (the filter is applied after the read).
+    def compact_dynamo(
+        self,
+        table,
+        page_size: int = 1000,
+        lag: float = DYNAMO_LAG,
+        index: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> int:
+        from boto3.dynamodb.conditions import Attr, Key
+
+        parts = self._start_run()
+        since = self.state["dynamo_since"]
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)  # the API logs naive UTC
+        cutoff = (now - timedelta(seconds=lag)).isoformat()
+        if since is not None and cutoff <= since:
+            return self._commit(parts)
+
+        if index and since:
+            first = date.fromisoformat(since[:10])
+            days = (date.fromisoformat(cutoff[:10]) - first).days
+            requests = [
+                {"IndexName": index,
+                 "KeyConditionExpression": Key("log_date").eq((first + timedelta(d)).isoformat())
+                 & Key("timestamp").between(since, cutoff)}
+                for d in range(days + 1)
+            ]
+            read = table.query
+        else:
+            window = Attr("timestamp").lte(cutoff)
+            if since:
+                window = Attr("timestamp").gt(since) & window
+            requests = [{"FilterExpression": window}]
+            read = table.scan
+
+        seen, records = set(), []
+        for kwargs in requests:
+            kwargs["Limit"] = page_size
+            while True:
+                page = read(**kwargs)
+                for item in page.get("Items", []):
+                    request_id = item.get("request_id")
+                    # between() includes the previous cutoff itself
+                    if item["timestamp"] == since or request_id in seen:
+                        continue
+                    if request_id is not None:
+                        seen.add(request_id)
+                    records.append(flatten(item))
+                if len(records) >= BATCH_ROWS:
+                    parts.write(records)
+                    records = []
+                if "LastEvaluatedKey" not in page:
+                    break
+                kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+        parts.write(records)
+
+        self.state["dynamo_since"] = cutoff
+        return self._commit(parts)
+
+
+# Read compacted predictions; the date range and model alias filters are
+# pushed down, so only matching partitions and row groups are read
+def read_predictions(
+    root: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    model_alias: Optional[str] = None,
+    columns: Optional[Iterable[str]] = None,
+):
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING,
+                         exclude_invalid_files=True)
+    expr = None
+    for cond in (
+        ds.field("date") >= start if start else None,
+        ds.field("date") <= end if end else None,
+        ds.field("model_alias") == model_alias if model_alias else None,
+    ):
+        if cond is not None:
+            expr = cond if expr is None else expr & cond
+    table = dataset.to_table(columns=list(columns) if columns else None, filter=expr)
+    return table.to_pandas()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compact prediction logs into partitioned Parquet")
+    parser.add_argument("--source", choices=["logs", "dynamo"], default="logs")
+    parser.add_argument("--log-file", default=os.getenv("PREDICTION_LOG_FILE", "./logs/prediction_logs.jsonl"))
+    parser.add_argument("--table", default=os.getenv("DYNAMO_TABLE", "taxi-predictions"))
+    parser.add_argument("--output", default=os.getenv("PREDICTION_PARQUET_DIR", "./logs/parquet"))
+    parser.add_argument("--lag", type=float, default=DYNAMO_LAG,
+                        help="only compact DynamoDB items at least this many seconds old")
+    parser.add_argument("--index", default=os.getenv("DYNAMO_LOG_INDEX"),
+                        help="GSI on (log_date, timestamp) to query instead of scanning the table")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    compactor = Compactor(args.output)
+    if args.source == "logs":
+        count = compactor.compact_logs(args.log_file)
+    else:
+        from dynamo import get_dynamodb
+
+        count = compactor.compact_dynamo(get_dynamodb().Table(args.table), lag=args.lag, index=args.index)
+    print(f"Compacted {count} records into {args.output} in {time.perf_counter() - started:.2f}s")
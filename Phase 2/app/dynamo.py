@@ -0,0 +1,264 @@
+import os
+import time
+import queue
+import random
+import atexit
+import threading
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable
+
+
+# One long-lived DynamoDB resource per worker process. boto3 resources hold
+# an HTTP connection pool, so building one per request throws away every
+# kept-alive connection. The pid check rebuilds it after a fork, since
+# sockets must not be shared between processes. boto3 itself is imported
+# here rather than at module load, since it costs ~150 ms of worker start.
+_DYNAMODB = None
+_DYNAMODB_PID = None
+_DYNAMODB_LOCK = threading.Lock()
+
+
+def get_dynamodb():
+    global _DYNAMODB, _DYNAMODB_PID
+    if _DYNAMODB is not None and _DYNAMODB_PID in (None, os.getpid()):
+        return _DYNAMODB
+    with _DYNAMODB_LOCK:
+        if _DYNAMODB is None or _DYNAMODB_PID not in (None, os.getpid()):
+            import boto3
+            from botocore.config import Config
+
+            config = Config(
+                max_pool_connections=int(os.getenv("DYNAMO_MAX_POOL", "50")),
+                connect_timeout=float(os.getenv("DYNAMO_CONNECT_TIMEOUT", "2")),
+                read_timeout=float(os.getenv("DYNAMO_READ_TIMEOUT", "5")),
+                tcp_keepalive=True,
+                retries={"max_attempts": int(os.getenv("DYNAMO_MAX_ATTEMPTS", "5")), "mode": "adaptive"},
+            )
+            _DYNAMODB = boto3.resource(
+                "dynamodb",
+                region_name=os.getenv("AWS_REGION", "us-east-1"),
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
+                config=config,
+            )
+            _DYNAMODB_PID = os.getpid()
+    return _DYNAMODB
+
+
+# Swap in another resource (e.g. an in-memory stand-in for tests/benchmarks).
+# It is kept across forks, so serve.py workers inherit it.
+def set_dynamodb(resource):
+    global _DYNAMODB, _DYNAMODB_PID
+    with _DYNAMODB_LOCK:
+        _DYNAMODB = resource
+        _DYNAMODB_PID = None
+
+
+# The DynamoDB resource rejects Python floats; store them as Decimal
+def to_dynamo(value: Any) -> Any:
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    if isinstance(value, dict):
+        return {k: to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamo(v) for v in value]
+    return value
+
+
+# Errors worth retrying: throttling and server-side failures. Anything else
+# DynamoDB answers (ValidationException for a bad item, a missing table,
+# denied access) fails the same way on every attempt.
+RETRYABLE_ERRORS = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+    "ServiceUnavailable",
+}
+
+
+def is_retryable(error: Exception) -> bool:
+    from botocore.exceptions import BotoCoreError, ClientError, ParamValidationError
+
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code")
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return code in RETRYABLE_ERRORS or status >= 500
+    if isinstance(error, ParamValidationError):
+        return False
+    # no response at all: connection errors and timeouts
+    return isinstance(error, (BotoCoreError, ConnectionError, TimeoutError))
+
+
+# Write-behind queue for prediction items.
+#
+# `submit()` only puts the item on a bounded queue, so the request never waits
+# on DynamoDB. A background thread drains up to `batch_size` items at a time
+# through `table.batch_writer()` (which groups them into 25-item
+# BatchWriteItem calls and re-sends unprocessed items). If a batch fails with
+# a retryable error (throttling that outlasts botocore's own retries, 5xx,
+# network errors) the whole batch is retried with capped exponential backoff
+# and jitter; puts are keyed by request_id so re-sending is idempotent.
+# Any other error is taken to be a bad item, which fails every
+# BatchWriteItem it is part of: the batch is then written one item at a time
+# so only the items DynamoDB refuses are dropped (counted in `rejected`).
+class DynamoWriteBehind:
+    def __init__(
+        self,
+        table_name: str,
+        resource_factory: Callable[[], Any] = get_dynamodb,
+        max_queue: int = 50000,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_retries: int = 5,
+        base_backoff: float = 0.05,
+        max_backoff: float = 5.0,
+    ):
+        self.table_name = table_name
+        self.resource_factory = resource_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.rejected = 0
+        self.retries = 0
+        self.batches = 0
+
+    # Start the drain thread (called lazily on first submit)
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="dynamo-write-behind", daemon=True
+            )
+            self._thread.start()
+        atexit.register(self.close)
+
+    # Queue one item without blocking. Returns False if the queue is full.
+    def submit(self, item: Dict[str, Any]) -> bool:
+        return self.submit_many([item]) == 1
+
+    def submit_many(self, items: Iterable[Dict[str, Any]]) -> int:
+        if self._thread is None:
+            self.start()
+        accepted = 0
+        for item in items:
+            try:
+                self._queue.put_nowait(item)
+                accepted += 1
+            except queue.Full:
+                self.dropped += 1
+        self.submitted += accepted
+        return accepted
+
+    # Stop the drain thread after writing everything still queued
+    def close(self, timeout: float = 10.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        self._stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+        self._drain_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "table": self.table_name,
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "batches": self.batches,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write_batch([first] + self._take(self.batch_size - 1))
+
+    def _take(self, n):
+        items = []
+        while len(items) < n:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _drain_all(self):
+        while True:
+            items = self._take(self.batch_size)
+            if not items:
+                return
+            self._write_batch(items)
+
+    def _write_batch(self, items):
+        pending = [to_dynamo(item) for item in items]
+        error = self._with_retries(self._put_batch, pending)
+        if error is None:
+            self.written += len(pending)
+            self.batches += 1
+            return
+        if is_retryable(error):
+            self.failed += len(pending)
+            print(f"DynamoDB write-behind gave up on {len(pending)} items: {error}")
+            return
+
+        for item in pending:
+            error = self._with_retries(self._put_item, item)
+            if error is None:
+                self.written += 1
+            elif is_retryable(error):
+                self.failed += 1
+                print(f"DynamoDB write-behind gave up on item {item.get('request_id')}: {error}")
+            else:
+                self.rejected += 1
+                print(f"DynamoDB rejected item {item.get('request_id')}: {error}")
+
+    def _put_batch(self, items):
+        table = self.resource_factory().Table(self.table_name)
+        with table.batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=item)
+
+    def _put_item(self, item):
+        self.resource_factory().Table(self.table_name).put_item(Item=item)
+
+    # Call write(arg), retrying retryable errors with backoff. Returns None on
+    # success, otherwise the last error.
+    def _with_retries(self, write, arg):
+        attempt = 0
+        while True:
+            try:
+                write(arg)
+                return None
+            except Exception as e:
+                # Items handed to the writer before the error may or may not
+                # have been flushed; re-sending them is harmless.
+                attempt += 1
+                if attempt > self.max_retries or not is_retryable(e):
+                    return e
+                self.retries += 1
+                delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+                time.sleep(delay * random.uniform(0.5, 1.0))
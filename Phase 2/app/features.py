@@ -0,0 +1,175 @@
+import math
+from datetime import datetime
+from typing import Optional, Sequence
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Every feature the featurizer can produce, in a fixed order
+FEATURE_COLUMNS = [
+    "passenger_count",
+    "pickup_longitude",
+    "pickup_latitude",
+    "dropoff_longitude",
+    "dropoff_latitude",
+    "pickup_hour",
+    "pickup_dayofweek",
+    "haversine_km",
+    "manhattan_km",
+    "bearing",
+    "trip_distance",
+]
+
+# Features the model is trained on (buildmodel.py / train_ooc.py). Serving
+# uses the fitted model's feature_names_in_, so older 7-feature artifacts
+# keep working.
+MODEL_FEATURES = FEATURE_COLUMNS[:10]
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _bearing(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+# Parse datetimes once (ISO strings, datetime64 or pandas values) and return
+# hour and Monday=0 day-of-week from integer epoch seconds
+def hour_and_dayofweek(pickup_datetime):
+    seconds = np.asarray(pickup_datetime, dtype="datetime64[s]").astype(np.int64)
+    days = seconds // 86400
+    return (seconds // 3600) % 24, (days + 3) % 7  # 1970-01-01 was a Thursday
+
+
+# Vectorized featurizer: one array per input field, returns a C-contiguous
+# float32 matrix with one row per trip and one column per requested feature
+def featurize_columns(
+    pickup_datetime,
+    pickup_lat,
+    pickup_lon,
+    dropoff_lat,
+    dropoff_lon,
+    passenger_count,
+    trip_distance=None,
+    columns: Sequence[str] = MODEL_FEATURES,
+) -> np.ndarray:
+    plat = np.asarray(pickup_lat, dtype=np.float64)
+    plon = np.asarray(pickup_lon, dtype=np.float64)
+    dlat = np.asarray(dropoff_lat, dtype=np.float64)
+    dlon = np.asarray(dropoff_lon, dtype=np.float64)
+
+    computed = {}
+    def column(name):
+        if name in computed:
+            return computed[name]
+        if name == "passenger_count":
+            value = passenger_count
+        elif name == "pickup_longitude":
+            value = plon
+        elif name == "pickup_latitude":
+            value = plat
+        elif name == "dropoff_longitude":
+            value = dlon
+        elif name == "dropoff_latitude":
+            value = dlat
+        elif name in ("pickup_hour", "pickup_dayofweek"):
+            computed["pickup_hour"], computed["pickup_dayofweek"] = hour_and_dayofweek(pickup_datetime)
+            return computed[name]
+        elif name == "haversine_km":
+            value = _haversine(plat, plon, dlat, dlon)
+        elif name == "manhattan_km":
+            value = _haversine(plat, plon, dlat, plon) + _haversine(plat, plon, plat, dlon)
+        elif name == "bearing":
+            value = _bearing(plat, plon, dlat, dlon)
+        elif name == "trip_distance":
+            value = np.nan if trip_distance is None else trip_distance
+        else:
+            raise KeyError(f"Unknown feature '{name}'")
+        computed[name] = value
+        return value
+
+    out = np.empty((plat.shape[0], len(columns)), dtype=np.float32)
+    for j, name in enumerate(columns):
+        out[:, j] = column(name)
+    return out
+
+
+# Featurize a trips DataFrame using the training column names
+def featurize_frame(df, columns: Sequence[str] = MODEL_FEATURES) -> np.ndarray:
+    return featurize_columns(
+        df["pickup_datetime"].to_numpy(),
+        df["pickup_latitude"].to_numpy(),
+        df["pickup_longitude"].to_numpy(),
+        df["dropoff_latitude"].to_numpy(),
+        df["dropoff_longitude"].to_numpy(),
+        df["passenger_count"].to_numpy(dtype=np.float64, na_value=np.nan),  # nullable UInt8
+        df["trip_distance"].to_numpy() if "trip_distance" in df else None,
+        columns=columns,
+    )
+
+
+# Scalar featurizer for a single trip (pure Python, no array overhead)
+def featurize(
+    pickup_datetime,
+    pickup_lat: float,
+    pickup_lon: float,
+    dropoff_lat: float,
+    dropoff_lon: float,
+    passenger_count: int,
+    trip_distance: Optional[float] = None,
+    columns: Sequence[str] = MODEL_FEATURES,
+) -> np.ndarray:
+    if isinstance(pickup_datetime, str):
+        pickup_datetime = datetime.fromisoformat(pickup_datetime)
+    values = {}
+    for name in columns:
+        if name == "passenger_count":
+            values[name] = passenger_count
+        elif name == "pickup_longitude":
+            values[name] = pickup_lon
+        elif name == "pickup_latitude":
+            values[name] = pickup_lat
+        elif name == "dropoff_longitude":
+            values[name] = dropoff_lon
+        elif name == "dropoff_latitude":
+            values[name] = dropoff_lat
+        elif name == "pickup_hour":
+            values[name] = pickup_datetime.hour
+        elif name == "pickup_dayofweek":
+            values[name] = pickup_datetime.weekday()
+        elif name == "haversine_km":
+            values[name] = haversine_km(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
+        elif name == "manhattan_km":
+            values[name] = (
+                haversine_km(pickup_lat, pickup_lon, dropoff_lat, pickup_lon)
+                + haversine_km(pickup_lat, pickup_lon, pickup_lat, dropoff_lon)
+            )
+        elif name == "bearing":
+            values[name] = bearing(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
+        elif name == "trip_distance":
+            values[name] = math.nan if trip_distance is None else trip_distance
+        else:
+            raise KeyError(f"Unknown feature '{name}'")
+    return np.array([values[name] for name in columns], dtype=np.float32)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bearing(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    y = math.sin(dlon) * math.cos(lat2)
+    x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
+    return math.degrees(math.atan2(y, x)) % 360.0
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Append-only, line-delimited prediction log.
+#
+# Requests only append a dict to a bounded in-memory buffer; a background
+# thread serializes the buffer and appends it to the active file in a single
+# write, either when `flush_size` records are waiting or every
+# `flush_interval` seconds. When the buffer is full new records are dropped
+# (and counted) instead of blocking the request. The active file is rotated
+# when it grows past `max_bytes` or when the UTC date changes.
+class PredictionLogWriter:
+    def __init__(
+        self,
+        path: str = "./logs/prediction_logs.jsonl",
+        max_buffer: int = 10000,
+        flush_size: int = 500,
+        flush_interval: float = 1.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        rotate_daily: bool = True,
+    ):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._file_date = None
+
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rotations = 0
+        self.errors = 0
+
+    # Start the background flusher (called lazily on first write)
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._closed = False
+            self._thread = threading.Thread(
+                target=self._run, name="prediction-log-writer", daemon=True
+            )
+            self._thread.start()
+        atexit.register(self.close)
+
+    # Queue one record; never touches the disk. Returns False if dropped.
+    def write(self, record: Dict[str, Any]) -> bool:
+        return self.write_many([record]) == 1
+
+    # Queue several records; returns how many were accepted
+    def write_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        if self._thread is None:
+            self.start()
+        accepted = 0
+        with self._cond:
+            for record in records:
+                if len(self._buffer) >= self.max_buffer:
+                    self.dropped += 1
+                    continue
+                self._buffer.append(record)
+                accepted += 1
+            if len(self._buffer) >= self.flush_size:
+                self._cond.notify()
+        return accepted
+
+    # Write everything buffered so far (blocks the caller; used at shutdown)
+    def flush(self):
+        with self._cond:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        self._write_batch(batch)
+
+    # Flush-on-shutdown hook: stop the thread and drain the buffer
+    def close(self):
+        with self._cond:
+            thread = self._thread
+            self._closed = True
+            self._cond.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "queue_depth": len(self._buffer),
+            "max_buffer": self.max_buffer,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._buffer) < self.flush_size:
+                    self._cond.wait(timeout=self.flush_interval)
+                batch = list(self._buffer)
+                self._buffer.clear()
+                closed = self._closed
+            self._write_batch(batch)
+            if closed:
+                return
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        data = "".join(json.dumps(r, separators=(",", ":"), default=str) + "\n" for r in batch)
+        with self._io_lock:
+            self._append(data, len(batch))
+
+    def _append(self, data, count):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._maybe_rotate()
+            # Re-open per flush so every worker follows a rotation done by
+            # another process; O_APPEND keeps each write at the end of the file
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+            self.written += count
+            self.flushes += 1
+        except OSError as e:
+            self.errors += 1
+            logger.error("Prediction log flush failed (%d records lost): %s", count, e)
+
+    def _maybe_rotate(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._file_date = datetime.utcnow().date()
+            return
+
+        if self._file_date is None:
+            self._file_date = datetime.utcfromtimestamp(st.st_mtime).date()
+        today = datetime.utcnow().date()
+        if st.st_size < self.max_bytes and not (self.rotate_daily and self._file_date != today):
+            return
+
+        # Workers sharing the file (serve.py) may rotate at the same time.
+        # Claim the active file by renaming it to a name private to this
+        # process, then take the first free segment name with os.link, which
+        # fails instead of overwriting a segment another worker just took.
+        claimed = f"{self.path}.rotating-{os.getpid()}"
+        try:
+            os.rename(self.path, claimed)
+        except FileNotFoundError:
+            self._file_date = today  # another worker rotated it first
+            return
+        stem, ext = os.path.splitext(self.path)
+        n = 0
+        while True:
+            target = f"{stem}.{self._file_date.isoformat()}.{n}{ext}"
+            try:
+                os.link(claimed, target)
+                break
+            except FileExistsError:
+                n += 1
+        os.unlink(claimed)
+        self.rotations += 1
+        self._file_date = today
+
+
+# One-time migration of the legacy JSON array log into the line-delimited
+# format. The source is renamed first so only one worker migrates it.
+#
+# The old read-modify-write logger could leave the array truncated. Such a
+# file does not stop startup: the records that still parse are migrated and
+# the original is kept as `<src>.corrupt` for inspection. A `.migrating`
+# file left by an interrupted run is reported rather than silently skipped.
+def migrate_json_array(src: str, dst: str) -> int:
+    staging = f"{src}.migrating"
+    try:
+        os.rename(src, staging)
+    except FileNotFoundError:
+        if os.path.exists(staging):
+            logger.warning(
+                "%s was left by an interrupted migration; check %s and re-run `logsink.py migrate`",
+                staging, dst,
+            )
+        return 0
+
+    with open(staging, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        logs = json.loads(text)
+        corrupt = not isinstance(logs, list)
+    except json.JSONDecodeError:
+        corrupt = True
+    if corrupt:
+        logs = salvage_json_array(text)
+
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    with open(dst, "a", encoding="utf-8") as f:
+        for record in logs:
+            f.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+
+    if corrupt:
+        os.rename(staging, f"{src}.corrupt")
+        logger.warning("%s is not a valid JSON array; salvaged %d records into %s, original kept as %s.corrupt",
+                       src, len(logs), dst, src)
+    else:
+        os.rename(staging, f"{src}.migrated")
+        logger.info("Migrated %d records from %s to %s", len(logs), src, dst)
+    return len(logs)
+
+
+# Leading records of a damaged JSON array, up to the first one that does not
+# parse (e.g. where the file was cut off)
+def salvage_json_array(text: str) -> List[Any]:
+    decoder = json.JSONDecoder()
+    start = text.find("[")
+    if start < 0:
+        return []
+    records, pos = [], start + 1
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text) or text[pos] == "]":
+            return records
+        try:
+            record, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return records
+        records.append(record)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prediction log utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="convert a JSON array log to JSON lines")
+    migrate.add_argument("src", nargs="?", default="./logs/prediction_logs.json")
+    migrate.add_argument("dst", nargs="?", default="./logs/prediction_logs.jsonl")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "migrate":
+        start = time.perf_counter()
+        count = migrate_json_array(args.src, args.dst)
+        print(f"{count} records migrated in {time.perf_counter() - start:.2f}s")
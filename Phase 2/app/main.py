@@ -1,13 +1,34 @@
 import os
-import json
+import hmac
+import time
+import uuid
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import joblib
-import wandb
-import boto3
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, PlainTextResponse, Response
+from pydantic import TypeAdapter, ValidationError
+import numpy as np
 from dotenv import load_dotenv
 
+from admission import AdmissionController, AdmissionMiddleware
+from batcher import BatcherOverloaded, MicroBatcher
+import columnar
+from cache import DynamoCacheTier, LRUTTLCache, PredictionCache, SharedMemoryCache, cache_key
+from dynamo import DynamoWriteBehind
+from features import MODEL_FEATURES, featurize, featurize_columns, hour_and_dayofweek
+from logsink import PredictionLogWriter, migrate_json_array
+from metrics import MetricsRegistry, RequestMetrics
+from profiling import ProfileMiddleware, RequestProfiler
+from registry import ArtifactCache, LocalDirRegistry, WandbRegistry, fetch_model
+from reloader import ActiveModel, ModelWatcher, build_active
+from schema import PredictionRequest
+from singleflight import SingleFlight
+from zonetable import ZoneTable
+
 # Load environment variables
 load_dotenv()
 
@@ -16,123 +37,786 @@ WANDB_ENTITY = os.getenv("WANDB_ENTITY")
 WANDB_PROJECT = os.getenv("WANDB_PROJECT", "taxi-fare-eta")
 WAND_MODEL_NAME = os.getenv("WAND_MODEL_NAME", "taxi_model")
 WAND_MODEL_ALIAS = os.getenv("WAND_MODEL_ALIAS", "production")
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "./model_cache")
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR")  # local stand-in for W&B
+FALLBACK_MODEL_DIR = os.getenv("FALLBACK_MODEL_DIR")  # e.g. a best_current_model copy
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "60"))  # seconds; 0 disables
 DYNAMO_TABLE = os.getenv("DYNAMO_TABLE", "taxi-predictions")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_SESSION_TOKEN = os.getenv("AWS_SESSION_TOKEN")
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+# The request path is async. Batches with at least SCORING_OFFLOAD_ROWS rows
+# to score are featurized and scored on a pool of SCORING_THREADS threads;
+# smaller ones (microseconds of work) run inline on the event loop.
+SCORING_THREADS = int(os.getenv("SCORING_THREADS", str(os.cpu_count() or 1)))
+SCORING_OFFLOAD_ROWS = int(os.getenv("SCORING_OFFLOAD_ROWS", "256"))
+# Concurrent fare_cache reads per worker (matches the DynamoDB connection pool)
+CACHE_REMOTE_CONCURRENCY = int(os.getenv("CACHE_REMOTE_CONCURRENCY", os.getenv("DYNAMO_MAX_POOL", "50")))
+
+# Training timestamps are NYC local time
+PICKUP_TIMEZONE = ZoneInfo(os.getenv("PICKUP_TIMEZONE", "America/New_York"))
+
+LEGACY_LOG_FILE = "./logs/prediction_logs.json"
+PREDICTION_LOG_FILE = os.getenv("PREDICTION_LOG_FILE", "./logs/prediction_logs.jsonl")
+
+CACHE_TABLE = os.getenv("CACHE_TABLE", "fare_cache")
+CACHE_REMOTE = os.getenv("CACHE_REMOTE", "true").lower() == "true"
+CACHE_GRID = float(os.getenv("CACHE_GRID", "0"))  # degrees; 0 = exact coordinates
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+# >0: the local tier is a shared-memory table with this many slots, shared by
+# every worker forked from this process (set by serve.py)
+CACHE_SHARED_SLOTS = int(os.getenv("CACHE_SHARED_SLOTS", "0"))
+
+# The model is trained on log1p(trip_duration); return seconds by default
+INVERSE_LOG_TARGET = os.getenv("INVERSE_LOG_TARGET", "true").lower() == "true"
+CACHE_NAMESPACE = f"{WAND_MODEL_ALIAS}:{'seconds' if INVERSE_LOG_TARGET else 'log'}"
+
+# Admission control for /predict and /predict_batch: at most ADMISSION_LIMIT
+# requests in flight (adapted between the MIN and MAX by AIMD against
+# ADMISSION_TARGET_LATENCY), the rest queue for up to ADMISSION_QUEUE_TIMEOUT
+# seconds and are otherwise rejected with 503 + Retry-After. While under
+# pressure, prediction logging and fare_cache writes are skipped
+# (ADMISSION_SHED=false keeps them).
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_SHED = os.getenv("ADMISSION_SHED", "true").lower() == "true"
+
+# Precomputed zone-pair table (Phase 1/Model/build_zonetable.py); trips in a
+# stored bucket are answered from it instead of the model. Unset disables it.
+ZONE_TABLE_DIR = os.getenv("ZONE_TABLE_DIR")
+
+# Coalesce concurrent /predict calls into vectorized batches (opt-in)
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "false").lower() == "true"
+
+# Opt-in request profiling (X-Profile: 1 header or a sampling rate). When
+# disabled nothing is installed on the request path.
+PROFILER = RequestProfiler(
+    os.getenv("PROFILE_DIR", "./profiles"),
+    enabled=os.getenv("PROFILING_ENABLED", "false").lower() == "true",
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    max_files=int(os.getenv("PROFILE_MAX_FILES", "100")),
+)
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
 
 # Initialize FastAPI
 app = FastAPI(title="Taxi Fare / ETA Prediction API")
 
-# Pydantic schema
-class PredictionRequest(BaseModel):
-    pickup_lat: float
-    pickup_lon: float
-    dropoff_lat: float
-    dropoff_lon: float
-    passenger_count: int
-    trip_distance: float
-    user_id: str = "anonymous"
-
-MODEL = None  # global model variable
-
-# Initialize DynamoDB
-def init_dynamodb():
-    return boto3.resource(
-        "dynamodb",
-        region_name=AWS_REGION,
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        aws_session_token=AWS_SESSION_TOKEN
+if MODEL_REGISTRY_DIR:
+    REGISTRY = LocalDirRegistry(MODEL_REGISTRY_DIR)
+else:
+    REGISTRY = WandbRegistry(WANDB_ENTITY, WANDB_PROJECT, WANDB_API_KEY)
+ARTIFACT_CACHE = ArtifactCache(MODEL_CACHE_DIR)
+
+ACTIVE: Optional[ActiveModel] = None  # model, scorer and version serving requests
+
+ZONE_TABLE = ZoneTable(ZONE_TABLE_DIR) if ZONE_TABLE_DIR else None
+ZONE_MODEL: Optional[ActiveModel] = None  # the active model, if ZONE_TABLE was built from it
+
+# Micro-batcher; rows are scored with the model they were featurized for,
+# even if another one has been installed since they were queued
+BATCHER = MicroBatcher(
+    lambda active, X: active.scorer.predict(X),
+    window_ms=float(os.getenv("MICROBATCH_WINDOW_MS", "2")),
+    max_batch=int(os.getenv("MICROBATCH_MAX_SIZE", "256")),
+    max_queue=int(os.getenv("MICROBATCH_QUEUE_SIZE", "10000")),
+)
+
+# Two-tier prediction cache: local (in-process LRU/TTL, or shared memory
+# under serve.py) first, DynamoDB fare_cache second
+if CACHE_SHARED_SLOTS > 0:
+    LOCAL_CACHE = SharedMemoryCache(CACHE_SHARED_SLOTS, ttl=CACHE_TTL)
+else:
+    LOCAL_CACHE = LRUTTLCache(
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "100000")),
+        max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=CACHE_TTL,
     )
+CACHE = PredictionCache(
+    LOCAL_CACHE,
+    DynamoCacheTier(CACHE_TABLE, max_concurrency=CACHE_REMOTE_CONCURRENCY) if CACHE_REMOTE else None,
+)
+
+# Identical /predict requests that miss the local cache at the same time
+# share one remote lookup, model call and cache write
+FLIGHTS = SingleFlight()
+
+ADMISSION = AdmissionController(
+    limit=int(os.getenv("ADMISSION_LIMIT", "64")),
+    min_limit=int(os.getenv("ADMISSION_MIN_LIMIT", "4")),
+    max_limit=int(os.getenv("ADMISSION_MAX_LIMIT", "1024")),
+    max_queue=int(os.getenv("ADMISSION_QUEUE_SIZE", "1024")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "0.5")),
+    target_latency=float(os.getenv("ADMISSION_TARGET_LATENCY", "0.25")),
+    adaptive=os.getenv("ADMISSION_ADAPTIVE", "true").lower() == "true",
+)
+
+# Threads are only started on first use, so this is safe to create before
+# serve.py forks
+SCORING_EXECUTOR = ThreadPoolExecutor(SCORING_THREADS, thread_name_prefix="scoring")
+
+# Buffered, append-only local prediction log (flushed from a background thread)
+LOG_WRITER = PredictionLogWriter(
+    PREDICTION_LOG_FILE,
+    max_buffer=int(os.getenv("LOG_BUFFER_SIZE", "10000")),
+    flush_size=int(os.getenv("LOG_FLUSH_SIZE", "500")),
+    flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", "1.0")),
+    max_bytes=int(os.getenv("LOG_ROTATE_BYTES", str(64 * 1024 * 1024))),
+)
+
+# DynamoDB prediction log, written behind the request through the pooled client
+DYNAMO_WRITER = DynamoWriteBehind(
+    DYNAMO_TABLE,
+    max_queue=int(os.getenv("DYNAMO_QUEUE_SIZE", "50000")),
+    batch_size=int(os.getenv("DYNAMO_BATCH_SIZE", "100")),
+)
 
-# Load model from Weights & Biases
+# In-process metrics, exposed in Prometheus text format on /metrics. Stage
+# histograms are looked up once here so the request path only pays for two
+# perf_counter() calls and one observe() per stage.
+METRICS = MetricsRegistry()
+STAGE_SECONDS = METRICS.histogram(
+    "predict_stage_seconds", "Time spent in each stage of the prediction path", ("stage",)
+)
+STAGE_DECODE = STAGE_SECONDS.labels("decode")
+STAGE_VALIDATE = STAGE_SECONDS.labels("validate")
+STAGE_ZONE_LOOKUP = STAGE_SECONDS.labels("zone_lookup")
+STAGE_CACHE_LOOKUP = STAGE_SECONDS.labels("cache_lookup")
+STAGE_FEATURIZE = STAGE_SECONDS.labels("featurize")
+STAGE_PREDICT = STAGE_SECONDS.labels("predict")
+STAGE_CACHE_STORE = STAGE_SECONDS.labels("cache_store")
+STAGE_DYNAMO_ENQUEUE = STAGE_SECONDS.labels("dynamo_enqueue")
+STAGE_LOG_ENQUEUE = STAGE_SECONDS.labels("log_enqueue")
+STAGE_ENCODE = STAGE_SECONDS.labels("encode")
+MODEL_LOAD_SECONDS = METRICS.histogram(
+    "model_load_seconds", "Time to fetch, load and warm a model version",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+HTTP_SECONDS = METRICS.histogram(
+    "http_request_duration_seconds", "HTTP request latency (including validation)", ("method", "path")
+)
+HTTP_REQUESTS = METRICS.counter(
+    "http_requests_total", "HTTP requests by status code", ("method", "path", "status")
+)
+METRICS.callback(
+    "prediction_cache_hits_total", "Prediction cache hits",
+    lambda: {("local",): CACHE.local.hits, ("remote",): CACHE.remote.hits if CACHE.remote else None},
+    kind="counter", labelnames=("tier",),
+)
+METRICS.callback(
+    "prediction_cache_misses_total", "Prediction cache misses",
+    lambda: {("local",): CACHE.local.misses, ("remote",): CACHE.remote.misses if CACHE.remote else None},
+    kind="counter", labelnames=("tier",),
+)
+METRICS.callback(
+    "singleflight_collapsed_total", "Requests that waited on an identical in-flight request",
+    lambda: FLIGHTS.collapsed, kind="counter",
+)
+METRICS.callback(
+    "admission_in_flight", "Admitted requests in flight and their current limit",
+    lambda: {("in_flight",): ADMISSION.in_flight, ("limit",): int(ADMISSION.limit), ("queued",): ADMISSION.queued},
+    labelnames=("state",),
+)
+METRICS.callback(
+    "admission_rejected_total", "Requests rejected with 503 by admission control",
+    lambda: ADMISSION.rejected, kind="counter",
+)
+METRICS.callback(
+    "shed_total", "Optional work skipped under load",
+    lambda: {(work,): n for work, n in ADMISSION.shed.items()},
+    kind="counter", labelnames=("work",),
+)
+METRICS.callback(
+    "zone_table_lookups_total", "Zone table lookups by result",
+    lambda: {("hit",): ZONE_TABLE.hits, ("miss",): ZONE_TABLE.misses} if ZONE_TABLE else {},
+    kind="counter", labelnames=("result",),
+)
+METRICS.callback(
+    "queue_depth", "Items waiting in background queues",
+    lambda: {
+        ("prediction_log",): LOG_WRITER.stats()["queue_depth"],
+        ("dynamo_log",): DYNAMO_WRITER.stats()["queue_depth"],
+        ("cache_writes",): CACHE.remote.writer.stats()["queue_depth"] if CACHE.remote else None,
+        ("microbatch",): BATCHER.stats()["queue_depth"],
+    },
+    labelnames=("queue",),
+)
+METRICS.callback(
+    "dropped_total", "Items dropped because a background queue was full",
+    lambda: {("prediction_log",): LOG_WRITER.dropped, ("dynamo_log",): DYNAMO_WRITER.dropped},
+    kind="counter", labelnames=("queue",),
+)
+METRICS.callback(
+    "dynamo_rejected_total", "Prediction log items DynamoDB refused as invalid (dropped, not retried)",
+    lambda: DYNAMO_WRITER.rejected, kind="counter",
+)
+METRICS.callback(
+    "errors_total", "Errors in background work and model reloads",
+    lambda: {
+        ("prediction_log",): LOG_WRITER.errors,
+        ("dynamo_log",): DYNAMO_WRITER.failed,
+        ("cache_lookup",): CACHE.remote.errors if CACHE.remote else None,
+        ("microbatch",): BATCHER.errors,
+        ("model_reload",): WATCHER.failures,
+    },
+    kind="counter", labelnames=("component",),
+)
+
+# Load model from Weights & Biases (through the local artifact cache)
 def load_model_from_wandb():
-    global MODEL
-    wandb.login(key=WANDB_API_KEY)
-    api = wandb.Api()
-    artifact_ref = f"{WANDB_ENTITY}/{WANDB_PROJECT}/{WAND_MODEL_NAME}:{WAND_MODEL_ALIAS}"
-    artifact = api.artifact(artifact_ref)
-    model_dir = artifact.download()
-    MODEL = joblib.load(f"{model_dir}/model.joblib")
-    print(f"Model loaded from {model_dir}/model.joblib")
-
-# Log prediction to DynamoDB + JSON
-def log_prediction(req: PredictionRequest, prediction: float):
-    dynamo = init_dynamodb()
-    table = dynamo.Table(DYNAMO_TABLE)
-    
-    # Log to DynamoDB
-    item = {
-        "request_id": f"{req.user_id}-{datetime.utcnow().timestamp()}",
-        "timestamp": datetime.utcnow().isoformat(),
-        "input": json.loads(req.json()),
-        "prediction": prediction,
-        "model_alias": WAND_MODEL_ALIAS
-    }
-    table.put_item(Item=item)
+    started = time.perf_counter()
+    model, info = fetch_model(
+        REGISTRY, ARTIFACT_CACHE, WAND_MODEL_NAME, WAND_MODEL_ALIAS,
+        fallback_dir=FALLBACK_MODEL_DIR,
+    )
+    active = set_model(model, info, time.perf_counter() - started)
+    print(f"Model {info.name}:{info.version} loaded ({type(active.scorer).__name__})")
 
-    # Log to local JSON 
-    log_file = "./logs/prediction_logs.json"
-    os.makedirs("./logs", exist_ok=True)
-    
-    try:
-        with open(log_file, "r") as f:
-            logs = json.load(f)
-    except FileNotFoundError:
-        logs = []
-    
-    logs.append({
-        "timestamp": datetime.utcnow().isoformat(),
-        "user_id": req.user_id,
+# Compile, warm and atomically install a model for the request path
+def set_model(model, info=None, load_seconds: float = 0.0) -> ActiveModel:
+    active = build_active(
+        model, info,
+        inverse_log=INVERSE_LOG_TARGET,
+        feature_names=MODEL_FEATURES,
+        load_seconds=load_seconds,
+    )
+    install_model(active)
+    return active
+
+def install_model(active: ActiveModel):
+    global ACTIVE, ZONE_MODEL
+    if ZONE_TABLE is not None:
+        matches = ZONE_TABLE.matches(active.scorer, INVERSE_LOG_TARGET, active.feature_names)
+        ZONE_MODEL = active if matches else None
+        if not matches:
+            print(f"Zone table {ZONE_TABLE_DIR} was not built from model {active.version}; not using it")
+    ACTIVE = active
+    MODEL_LOAD_SECONDS.observe(active.load_seconds)
+
+# Background watcher that hot-swaps the model when the alias moves
+WATCHER = ModelWatcher(
+    REGISTRY, ARTIFACT_CACHE, WAND_MODEL_NAME, WAND_MODEL_ALIAS,
+    current=lambda: ACTIVE,
+    install=install_model,
+    interval=MODEL_POLL_INTERVAL,
+    inverse_log=INVERSE_LOG_TARGET,
+    feature_names=MODEL_FEATURES,
+)
+
+# Pickup time as naive NYC local time (the request's, or now)
+def pickup_time(req: PredictionRequest) -> datetime:
+    ts = req.pickup_datetime
+    if ts is None:
+        return datetime.now(PICKUP_TIMEZONE).replace(tzinfo=None)
+    if ts.tzinfo is not None:
+        return ts.astimezone(PICKUP_TIMEZONE).replace(tzinfo=None)
+    return ts
+
+# Feature row for one request, in the active model's column order
+def request_features(req: PredictionRequest, active: ActiveModel):
+    return featurize(
+        pickup_time(req), req.pickup_lat, req.pickup_lon,
+        req.dropoff_lat, req.dropoff_lon, req.passenger_count,
+        trip_distance=req.trip_distance, columns=active.feature_names,
+    )
+
+# Build one feature matrix (rows in request order) for a vectorized predict
+def build_feature_matrix(reqs: List[PredictionRequest], active: ActiveModel) -> np.ndarray:
+    return featurize_columns(
+        [pickup_time(req) for req in reqs],
+        [req.pickup_lat for req in reqs],
+        [req.pickup_lon for req in reqs],
+        [req.dropoff_lat for req in reqs],
+        [req.dropoff_lon for req in reqs],
+        [req.passenger_count for req in reqs],
+        [req.trip_distance for req in reqs],
+        columns=active.feature_names,
+    )
+
+# Features and predictions for a group of requests (runs on SCORING_EXECUTOR
+# for large batches)
+def score_requests(reqs: List[PredictionRequest], active: ActiveModel):
+    t0 = time.perf_counter()
+    X = build_feature_matrix(reqs, active)
+    t1 = time.perf_counter()
+    STAGE_FEATURIZE.observe(t1 - t0)
+    scored = active.scorer.predict(X)
+    STAGE_PREDICT.observe(time.perf_counter() - t1)
+    return scored
+
+# Predictions for a decoded columnar request, as float32 with NaN for rows
+# that have missing or non-finite inputs. Works on whole columns: zone table
+# where it applies, the model for the rest. The prediction cache is skipped,
+# since computing a key per row costs more than scoring it.
+def score_columns(columns: Dict[str, np.ndarray], active: ActiveModel) -> np.ndarray:
+    t0 = time.perf_counter()
+    n = len(columns["pickup_lat"])
+    when = columns.get("pickup_datetime")
+    if when is None:
+        now = datetime.now(PICKUP_TIMEZONE).replace(tzinfo=None)
+        when = np.full(n, np.datetime64(now, "s"))
+    X = featurize_columns(
+        when, columns["pickup_lat"], columns["pickup_lon"], columns["dropoff_lat"],
+        columns["dropoff_lon"], columns["passenger_count"], columns["trip_distance"],
+        columns=active.feature_names,
+    )
+    # also checks required inputs the model does not use (e.g. trip_distance)
+    rest = np.isfinite(X).all(axis=1) & columnar.valid_rows(columns)
+    t1 = time.perf_counter()
+    STAGE_FEATURIZE.observe(t1 - t0)
+
+    predictions = np.full(n, np.nan, dtype=np.float32)
+    if ZONE_MODEL is active:
+        hour, dow = hour_and_dayofweek(when)
+        zoned = ZONE_TABLE.lookup_many(
+            columns["pickup_lat"], columns["pickup_lon"], columns["dropoff_lat"], columns["dropoff_lon"], hour, dow
+        )
+        found = rest & ~np.isnan(zoned)
+        predictions[found] = np.expm1(zoned[found]) if INVERSE_LOG_TARGET else zoned[found]
+        rest &= ~found
+        t2 = time.perf_counter()
+        STAGE_ZONE_LOOKUP.observe(t2 - t1)
+        t1 = t2
+    if rest.any():
+        predictions[rest] = active.scorer.predict(X[rest])
+    STAGE_PREDICT.observe(time.perf_counter() - t1)
+    return predictions
+
+# Remote cache, otherwise the model, for a local cache miss. Runs once per
+# key however many identical requests are waiting on it (see FLIGHTS).
+async def lookup_or_score(req: PredictionRequest, key: str, active: ActiveModel) -> Tuple[float, str]:
+    t0 = time.perf_counter()
+    prediction = await CACHE.aget_remote(key)
+    t1 = time.perf_counter()
+    STAGE_CACHE_LOOKUP.observe(t1 - t0)
+    if prediction is not None:
+        return prediction, "cache"
+
+    row = request_features(req, active)
+    t2 = time.perf_counter()
+    STAGE_FEATURIZE.observe(t2 - t1)
+    if BATCHER.running:
+        prediction = await BATCHER.submit(active, row)
+    else:
+        prediction = active.scorer.predict_one(row)
+    t3 = time.perf_counter()
+    STAGE_PREDICT.observe(t3 - t2)
+    CACHE.put(key, prediction, remote=not shed_work("cache_write"))
+    STAGE_CACHE_STORE.observe(time.perf_counter() - t3)
+    return prediction, "model"
+
+# Cache key for the model inputs of a request (scoped to the model version).
+# Only the pickup hour and day of week matter to the model, not the exact time.
+def request_cache_key(req: PredictionRequest, active: ActiveModel) -> str:
+    ts = pickup_time(req)
+    fields = {
         "pickup_lat": req.pickup_lat,
         "pickup_lon": req.pickup_lon,
         "dropoff_lat": req.dropoff_lat,
         "dropoff_lon": req.dropoff_lon,
         "passenger_count": req.passenger_count,
-        "trip_distance": req.trip_distance,
-        "prediction": prediction,
-        "model_alias": WAND_MODEL_ALIAS
-    })
-    
-    with open(log_file, "w") as f:
-        json.dump(logs, f, indent=4)
+        "pickup_hour": ts.hour,
+        "pickup_dayofweek": ts.weekday(),
+    }
+    if "trip_distance" in active.feature_names:
+        fields["trip_distance"] = req.trip_distance
+    return cache_key(fields, grid=CACHE_GRID, namespace=f"{CACHE_NAMESPACE}:{active.digest}")
+
+# Table value for the request's zone pair, hour and day of week, or None
+def zone_prediction(req: PredictionRequest, active: ActiveModel) -> Optional[float]:
+    if ZONE_MODEL is not active:
+        return None
+    t0 = time.perf_counter()
+    ts = pickup_time(req)
+    value = ZONE_TABLE.lookup(
+        req.pickup_lat, req.pickup_lon, req.dropoff_lat, req.dropoff_lon, ts.hour, ts.weekday()
+    )
+    STAGE_ZONE_LOOKUP.observe(time.perf_counter() - t0)
+    if value is None:
+        return None
+    return float(np.expm1(value)) if INVERSE_LOG_TARGET else value
+
+# Vectorized zone_prediction (NaN where a bucket is missing), or None when
+# the table is not in use
+def zone_predictions(reqs: List[PredictionRequest], active: ActiveModel) -> Optional[np.ndarray]:
+    if ZONE_MODEL is not active:
+        return None
+    t0 = time.perf_counter()
+    times = [pickup_time(req) for req in reqs]
+    values = ZONE_TABLE.lookup_many(
+        [req.pickup_lat for req in reqs], [req.pickup_lon for req in reqs],
+        [req.dropoff_lat for req in reqs], [req.dropoff_lon for req in reqs],
+        [ts.hour for ts in times], [ts.weekday() for ts in times],
+    )
+    STAGE_ZONE_LOOKUP.observe(time.perf_counter() - t0)
+    return np.expm1(values) if INVERSE_LOG_TARGET else values
+
+# True (and counted) when optional work should be skipped because the
+# service is under pressure
+def shed_work(work: str, items: int = 1) -> bool:
+    if not (ADMISSION_SHED and ADMISSION.shedding):
+        return False
+    ADMISSION.record_shed(work, items)
+    return True
+
+# Log a single prediction to DynamoDB + JSON
+def log_prediction(req: PredictionRequest, prediction: float):
+    log_predictions([req], [prediction])
+
+# Log a group of predictions; both sinks only enqueue, nothing here waits on
+# I/O. Skipped entirely under pressure (see shed_work).
+def log_predictions(reqs: List[PredictionRequest], predictions: List[float]):
+    if shed_work("prediction_log", len(reqs)):
+        return
+    log_inputs([req.model_dump(mode="json") for req in reqs], predictions)
+
+# Log the rows of a columnar request that got a prediction (NaN = invalid row)
+def log_columns(columns: Dict[str, np.ndarray], predictions: np.ndarray):
+    ok = ~np.isnan(predictions) & columnar.valid_rows(columns)
+    if shed_work("prediction_log", int(ok.sum())):
+        return
+    fields = {name: columns[name][ok].tolist() for name in columnar.REQUIRED_COLUMNS}
+    fields["passenger_count"] = [int(n) for n in fields["passenger_count"]]
+    if "pickup_datetime" in columns:
+        fields["pickup_datetime"] = np.datetime_as_string(columns["pickup_datetime"][ok]).tolist()
+    names = list(fields)
+    inputs = [dict(zip(names, row), user_id="anonymous") for row in zip(*fields.values())]
+    log_inputs(inputs, predictions[ok].tolist())
+
+# Enqueue prediction log records for request inputs (PredictionRequest fields)
+def log_inputs(inputs: List[Dict[str, Any]], predictions: List[float]):
+    now = datetime.utcnow()
+    log_date = now.date().isoformat()
+    t0 = time.perf_counter()
+
+    # Log to DynamoDB (drained in batches by the write-behind thread)
+    DYNAMO_WRITER.submit_many(
+        {
+            "request_id": uuid.uuid4().hex,
+            "timestamp": now.isoformat(),
+            "log_date": log_date,  # GSI partition for incremental compaction (compact.py)
+            "input": fields,
+            "prediction": prediction,
+            "model_alias": WAND_MODEL_ALIAS
+        }
+        for fields, prediction in zip(inputs, predictions)
+    )
+    t1 = time.perf_counter()
+    STAGE_DYNAMO_ENQUEUE.observe(t1 - t0)
+
+    # Log to local JSON lines (buffered, written off the request path)
+    LOG_WRITER.write_many(
+        {
+            "timestamp": now.isoformat(),
+            "user_id": fields["user_id"],
+            "pickup_lat": fields["pickup_lat"],
+            "pickup_lon": fields["pickup_lon"],
+            "dropoff_lat": fields["dropoff_lat"],
+            "dropoff_lon": fields["dropoff_lon"],
+            "passenger_count": fields["passenger_count"],
+            "trip_distance": fields["trip_distance"],
+            "prediction": prediction,
+            "model_alias": WAND_MODEL_ALIAS
+        }
+        for fields, prediction in zip(inputs, predictions)
+    )
+    STAGE_LOG_ENQUEUE.observe(time.perf_counter() - t1)
+
+# Load and warm the model unless it already is: serve.py calls this in the
+# parent process, so workers forked from it start with the model in place
+def preload():
+    if ACTIVE is None:
+        load_model_from_wandb()
 
 # Startup
 @app.on_event("startup")
 def startup_event():
-    load_model_from_wandb()
+    migrate_json_array(LEGACY_LOG_FILE, PREDICTION_LOG_FILE)
+    LOG_WRITER.start()
+    DYNAMO_WRITER.start()
+    preload()
+    WATCHER.start()
     print("Model loaded and FastAPI ready")
 
+# Start the micro-batcher on the server's event loop
+@app.on_event("startup")
+async def start_batcher():
+    if MICROBATCH_ENABLED:
+        await BATCHER.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await BATCHER.stop()
+
+# Shutdown: flush buffered log records and queued DynamoDB items
+@app.on_event("shutdown")
+def shutdown_event():
+    WATCHER.stop()
+    LOG_WRITER.close()
+    DYNAMO_WRITER.close()
+    CACHE.close()
+    SCORING_EXECUTOR.shutdown(wait=False)
+
 # Health endpoint
 @app.get("/health")
 def health():
-    return {"status": "ok", "model_loaded": MODEL is not None}
+    active = ACTIVE
+    load = ADMISSION.load()
+    return {
+        "status": "overloaded" if load["shedding"] else "ok",
+        "load": load,
+        "model_loaded": active is not None,
+        "model_version": active.version if active else None,
+        "model_loaded_at": active.loaded_at if active else None,
+        "model_load_seconds": active.load_seconds if active else None,
+    }
+
+# Stats endpoint: internal queue depths and counters
+@app.get("/stats")
+def stats():
+    return {
+        "pid": os.getpid(),  # which worker answered (serve.py runs several)
+        "log_writer": LOG_WRITER.stats(),
+        "dynamo_writer": DYNAMO_WRITER.stats(),
+        "cache": CACHE.stats(),
+        "batcher": BATCHER.stats(),
+        "singleflight": FLIGHTS.stats(),
+        "admission": ADMISSION.stats(),
+        "model_watcher": WATCHER.stats(),
+        "zone_table": ZONE_TABLE.stats() if ZONE_TABLE else None,
+        "profiler": PROFILER.stats(),
+    }
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
 
 # Predict endpoint
 @app.post("/predict")
-def predict(req: PredictionRequest):
-    if MODEL is None:
+@PROFILER.wrap
+async def predict(req: PredictionRequest):
+    active = ACTIVE
+    if active is None:
         raise HTTPException(status_code=503, detail="Model not available")
     
-    features = [
-        req.pickup_lat,
-        req.pickup_lon,
-        req.dropoff_lat,
-        req.dropoff_lon,
-        req.passenger_count,
-        req.trip_distance
-    ]
-    
-    # Make prediction
-    prediction = MODEL.predict([features])[0]
-    
+    # Zone table first, then the cache, otherwise make prediction
+    prediction = zone_prediction(req, active)
+    source = "zone"
+    if prediction is None:
+        t0 = time.perf_counter()
+        key = request_cache_key(req, active)
+        prediction = CACHE.local.get(key)
+        STAGE_CACHE_LOOKUP.observe(time.perf_counter() - t0)
+        source = "cache"
+        if prediction is None:
+            try:
+                prediction, source = await FLIGHTS.do(key, lambda: lookup_or_score(req, key, active))
+            except BatcherOverloaded as e:
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
     # Log prediction
-    log_prediction(req, float(prediction))
+    log_prediction(req, prediction)
     
     return {
-        "prediction": float(prediction),
+        "prediction": prediction,
+        "cached": source == "cache",
+        "model_version": active.version,
         "timestamp": datetime.utcnow().isoformat()
     }
+
+# Batch predict endpoint: validates each record on its own, scores all valid
+# rows with a single vectorized predict and returns results in input order
+#
+# Columnar bodies (Content-Type: Arrow IPC stream or MessagePack, see
+# columnar.py) are scored column-wise and answered in the format named by
+# Accept, by default the request's own; JSON stays the default.
+BATCH_RECORDS = TypeAdapter(List[Dict[str, Any]])
+BATCH_BODY = {
+    "required": True,
+    "content": {
+        "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+        columnar.ARROW_STREAM: {"schema": {"type": "string", "format": "binary"}},
+        columnar.MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+    },
+}
+
+@app.post("/predict_batch", openapi_extra={"requestBody": BATCH_BODY})
+@PROFILER.wrap
+async def predict_batch(request: Request):
+    active = ACTIVE
+    if active is None:
+        raise HTTPException(status_code=503, detail="Model not available")
+
+    body = await request.body()
+    fmt = columnar.media_type(request.headers.get("content-type"))
+    if fmt is not None:
+        return await predict_columns(body, fmt, request.headers.get("accept"), active)
+    try:
+        records = BATCH_RECORDS.validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [dict(error, loc=("body", *error["loc"])) for error in e.errors(include_url=False)]
+        )
+    if len(records) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(records)} exceeds limit of {MAX_BATCH_SIZE}"
+        )
+
+    t0 = time.perf_counter()
+    results: List[Dict[str, Any]] = [None] * len(records)
+    valid_idx, valid_reqs = [], []
+    for i, record in enumerate(records):
+        try:
+            req = PredictionRequest.model_validate(record)
+        except ValidationError as e:
+            results[i] = {
+                "index": i,
+                "errors": e.errors(include_url=False, include_context=False)
+            }
+            continue
+        valid_idx.append(i)
+        valid_reqs.append(req)
+    t1 = time.perf_counter()
+    STAGE_VALIDATE.observe(t1 - t0)
+
+    if valid_reqs:
+        # Zone table for the whole batch, then one bulk cache lookup for the
+        # rest; only the cache misses go through the model
+        predictions: List[Optional[float]] = [None] * len(valid_reqs)
+        sources = ["zone"] * len(valid_reqs)
+        rest = list(range(len(valid_reqs)))
+        zoned = zone_predictions(valid_reqs, active)
+        if zoned is not None:
+            rest = [j for j in rest if np.isnan(zoned[j])]
+            for j in np.flatnonzero(~np.isnan(zoned)):
+                predictions[j] = float(zoned[j])
+        t1 = time.perf_counter()
+
+        keys = {j: request_cache_key(valid_reqs[j], active) for j in rest}
+        found = await CACHE.aget_many(list(keys.values()))
+        miss = [j for j in rest if keys[j] not in found]
+        STAGE_CACHE_LOOKUP.observe(time.perf_counter() - t1)
+        if miss:
+            # Rows repeated within the batch are scored once
+            first = {}
+            for j in miss:
+                first.setdefault(keys[j], j)
+            missed_reqs = [valid_reqs[j] for j in first.values()]
+            if len(missed_reqs) >= SCORING_OFFLOAD_ROWS:
+                scored = await asyncio.get_running_loop().run_in_executor(
+                    SCORING_EXECUTOR, score_requests, missed_reqs, active
+                )
+            else:
+                scored = score_requests(missed_reqs, active)
+            t4 = time.perf_counter()
+            computed = {key: float(p) for key, p in zip(first, scored)}
+            CACHE.put_many(list(computed.items()), remote=not shed_work("cache_write", len(computed)))
+            found.update(computed)
+            STAGE_CACHE_STORE.observe(time.perf_counter() - t4)
+
+        missed = set(miss)
+        for j in rest:
+            predictions[j] = found[keys[j]]
+            sources[j] = "model" if j in missed else "cache"
+        for j, i in enumerate(valid_idx):
+            results[i] = {"index": i, "prediction": predictions[j], "cached": sources[j] == "cache"}
+        log_predictions(valid_reqs, predictions)
+
+    return {
+        "results": results,
+        "count": len(records),
+        "errors": len(records) - len(valid_reqs),
+        "model_version": active.version,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+# /predict_batch for a columnar body: no per-row Python objects between the
+# request bytes and the response bytes
+async def predict_columns(body: bytes, fmt: str, accept: Optional[str], active: ActiveModel):
+    t0 = time.perf_counter()
+    try:
+        columns = columnar.decode(fmt, body, PICKUP_TIMEZONE.key)
+    except columnar.UnsupportedFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    STAGE_DECODE.observe(time.perf_counter() - t0)
+    rows = len(columns["pickup_lat"])
+    if rows > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {rows} exceeds limit of {MAX_BATCH_SIZE}"
+        )
+
+    if rows >= SCORING_OFFLOAD_ROWS:
+        predictions = await asyncio.get_running_loop().run_in_executor(
+            SCORING_EXECUTOR, score_columns, columns, active
+        )
+    else:
+        predictions = score_columns(columns, active)
+    log_columns(columns, predictions)
+
+    t1 = time.perf_counter()
+    errors = int(np.isnan(predictions).sum())
+    timestamp = datetime.utcnow().isoformat()
+    out = columnar.negotiate(accept, default=fmt)
+    if out == columnar.JSON:
+        return {
+            "predictions": [None if p != p else p for p in predictions.tolist()],
+            "count": rows,
+            "errors": errors,
+            "model_version": active.version,
+            "timestamp": timestamp,
+        }
+    try:
+        content = columnar.encode(out, predictions, {
+            "count": str(rows), "errors": str(errors),
+            "model_version": str(active.version), "timestamp": timestamp,
+        })
+    except columnar.UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    STAGE_ENCODE.observe(time.perf_counter() - t1)
+    return Response(content, media_type=out)
+
+# Admin endpoints for recent request profiles (only when profiling is enabled).
+# They fail closed: without PROFILE_ADMIN_TOKEN configured they answer 404,
+# and a missing or wrong X-Admin-Token gets 403.
+def check_admin_token(token: Optional[str]):
+    if not PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if token is None or not hmac.compare_digest(token, PROFILE_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+if PROFILER.enabled:
+    @app.get("/admin/profiles")
+    def list_profiles(x_admin_token: Optional[str] = Header(None)):
+        check_admin_token(x_admin_token)
+        return {"profiler": PROFILER.stats(), "profiles": PROFILER.recent()}
+
+    # Raw pstats file (open with `python -m pstats` or snakeviz), or
+    # ?format=text for the top functions by cumulative time
+    @app.get("/admin/profiles/{profile_id}")
+    def get_profile(profile_id: str, format: str = "pstats", x_admin_token: Optional[str] = Header(None)):
+        check_admin_token(x_admin_token)
+        path = PROFILER.path(profile_id)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        if format == "text":
+            return PlainTextResponse(PROFILER.summary(profile_id))
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+    app.add_middleware(ProfileMiddleware, profiler=PROFILER, paths=["/predict", "/predict_batch"])
+
+# Admission control runs inside the request metrics, so rejections are
+# counted and timed like any other response
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=ADMISSION, paths=["/predict", "/predict_batch"])
+
+# Time every request, by route (unknown paths are grouped as "other")
+app.add_middleware(
+    RequestMetrics,
+    duration=HTTP_SECONDS,
+    requests=HTTP_REQUESTS,
+    paths=[route.path for route in app.routes],
+)
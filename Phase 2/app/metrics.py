@@ -0,0 +1,213 @@
+import time
+from bisect import bisect_left
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) from 5 µs to 10 s
+LATENCY_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    # Child for one combination of label values; look it up once and keep it
+    # on the hot path instead of calling labels() per request
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}"
+
+
+# No lock on the hot path: an increment is a couple of bytecodes, so a lost
+# update needs a thread switch inside them, which is rare enough for
+# monitoring. The count is derived from the buckets when scraped.
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        counts = list(self.counts)
+        return counts, self.sum, sum(counts)
+
+
+# Fixed-bucket histogram; observe() is a bisect plus two additions
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for bound, n in zip(self.bounds + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {count}"
+
+
+# Value read at scrape time, e.g. a queue depth or a counter kept by another
+# component. `fn` returns a number, or {label values tuple: number}.
+class Callback(_Metric):
+    def __init__(self, name: str, help: str, fn: Callable, kind: str = "gauge", labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+        self.kind = kind
+
+    def _samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for values, v in items:
+            if v is not None:
+                yield f"{self.name}{_labels(self.labelnames, values)} {_number(v)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, fn, kind="gauge", labelnames=()) -> Callback:
+        return self.register(Callback(name, help, fn, kind, labelnames))
+
+    # Prometheus text exposition format 0.0.4
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Pure ASGI middleware timing every HTTP request (much cheaper than
+# BaseHTTPMiddleware). Paths outside `paths` are reported as "other" so
+# unknown URLs cannot blow up label cardinality.
+class RequestMetrics:
+    def __init__(self, app, duration: Histogram, requests: Counter, paths: Optional[Iterable[str]] = None):
+        self.app = app
+        self.duration = duration
+        self.requests = requests
+        self.paths = set(paths) if paths is not None else None
+        self._children = {}  # (method, path, status) -> (histogram child, counter child)
+
+    def _record(self, method, path, status, seconds):
+        key = (method, path, status)
+        children = self._children.get(key)
+        if children is None:
+            label = path if self.paths is None or path in self.paths else "other"
+            children = (self.duration.labels(method, label), self.requests.labels(method, label, status))
+            if label != "other":
+                self._children[key] = children
+        children[0].observe(seconds)
+        children[1].inc()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._record(scope["method"], scope["path"], status, time.perf_counter() - started)
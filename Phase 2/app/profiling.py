@@ -0,0 +1,189 @@
+import io
+import os
+import re
+import time
+import glob
+import pstats
+import inspect
+import random
+import cProfile
+import functools
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+PROFILE_HEADER = b"x-profile"
+_ID = re.compile(r"^[0-9]+-[A-Za-z0-9_]+-[0-9]+$")
+
+# Set by ProfileMiddleware for requests that should be profiled. Context
+# variables are copied into FastAPI's threadpool, so sync handlers see it
+# as well as async ones.
+_CURRENT: ContextVar[Optional[Dict[str, Any]]] = ContextVar("profile_request", default=None)
+
+
+# Opt-in per-request profiling.
+#
+# A request is profiled when it carries `X-Profile: 1` or is picked by the
+# sampling rate. The handler runs under cProfile (deterministic, so the
+# profile covers exactly that request's thread) and the stats are saved as a
+# pstats file in `directory`, keeping only the newest `max_files`. When
+# disabled, wrap() returns the handler unchanged and the middleware is not
+# installed, so there is no per-request cost at all.
+#
+# An async handler shares the event loop thread with other requests, so its
+# profile also contains whatever ran while it was awaiting. A thread can
+# only have one active profiler, so at most one async request is profiled
+# at a time; others arriving meanwhile run unprofiled.
+class RequestProfiler:
+    def __init__(
+        self,
+        directory: str = "./profiles",
+        enabled: bool = False,
+        sample_rate: float = 0.0,
+        max_files: int = 100,
+    ):
+        self.directory = directory
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._async_busy = threading.Lock()
+
+        self.profiled = 0
+        self.errors = 0
+
+    def wrap(self, fn: Callable) -> Callable:
+        if not self.enabled:
+            return fn
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                request = _CURRENT.get()
+                if request is None or not self._async_busy.acquire(blocking=False):
+                    return await fn(*args, **kwargs)
+                profile = cProfile.Profile()
+                started = time.perf_counter()
+                profile.enable()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    profile.disable()
+                    self._async_busy.release()
+                    request["id"] = self.save(profile, request["path"], time.perf_counter() - started)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            request = _CURRENT.get()
+            if request is None:
+                return fn(*args, **kwargs)
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                request["id"] = self.save(profile, request["path"], time.perf_counter() - started)
+
+        return wrapper
+
+    def wanted(self, headers) -> bool:
+        for name, value in headers:
+            if name == PROFILE_HEADER:
+                return value in (b"1", b"true")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def save(self, profile: cProfile.Profile, path: str, seconds: float) -> Optional[str]:
+        name = re.sub(r"[^A-Za-z0-9_]", "_", path.strip("/")) or "root"
+        profile_id = f"{time.time_ns()}-{name}-{int(seconds * 1e6)}"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+            with self._lock:
+                self.profiled += 1
+                for old in self._files()[self.max_files:]:
+                    os.remove(old)
+        except OSError as e:
+            self.errors += 1
+            print(f"Saving profile failed: {e}")
+            return None
+        return profile_id
+
+    # Newest first
+    def _files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "*.prof")), reverse=True)
+
+    def recent(self) -> List[Dict[str, Any]]:
+        profiles = []
+        for path in self._files():
+            profile_id = os.path.basename(path)[:-5]
+            created_ns, endpoint, micros = profile_id.split("-")
+            profiles.append({
+                "id": profile_id,
+                "endpoint": "/" + endpoint,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(int(created_ns) / 1e9)),
+                "duration_ms": int(micros) / 1000,
+                "bytes": os.path.getsize(path),
+            })
+        return profiles
+
+    def path(self, profile_id: str) -> Optional[str]:
+        if not _ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.prof")
+        return path if os.path.exists(path) else None
+
+    # Top functions by cumulative time, as text
+    def summary(self, profile_id: str, limit: int = 30) -> Optional[str]:
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "directory": self.directory,
+            "max_files": self.max_files,
+            "profiled": self.profiled,
+            "errors": self.errors,
+        }
+
+
+# Marks requests to profile (header or sampling) and reports the saved
+# profile id in an `X-Profile-Id` response header
+class ProfileMiddleware:
+    def __init__(self, app, profiler: RequestProfiler, paths=None):
+        self.app = app
+        self.profiler = profiler
+        self.paths = set(paths) if paths is not None else None
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or (self.paths is not None and scope["path"] not in self.paths)
+            or not self.profiler.wanted(scope["headers"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        request = {"path": scope["path"], "id": None}
+        token = _CURRENT.set(request)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and request["id"]:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", request["id"].encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _CURRENT.reset(token)
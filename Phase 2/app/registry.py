@@ -0,0 +1,251 @@
+import os
+import json
+import glob
+import shutil
+import hashlib
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass
+class ArtifactInfo:
+    name: str
+    alias: str
+    version: str
+    digest: str
+    source: str
+
+
+# Where model artifacts come from. WandbRegistry talks to the W&B model
+# registry; LocalDirRegistry stands in for it with a plain directory.
+class ModelRegistry(ABC):
+    @abstractmethod
+    def resolve(self, name: str, alias: str) -> ArtifactInfo:
+        """Return the version/digest the alias currently points to."""
+
+    @abstractmethod
+    def download(self, info: ArtifactInfo, dest: str) -> None:
+        """Copy the artifact's files into `dest`."""
+
+
+class WandbRegistry(ModelRegistry):
+    def __init__(self, entity: str, project: str, api_key: Optional[str] = None):
+        self.entity = entity
+        self.project = project
+        self.api_key = api_key
+        self._api = None
+        self._api_pid = None
+
+    # The Api (and its HTTP session) is rebuilt in each process: serve.py
+    # resolves the model in the parent before forking, and workers must not
+    # share its pooled sockets
+    def _artifact(self, name, alias):
+        import wandb
+
+        if self._api is None or self._api_pid != os.getpid():
+            if self.api_key:
+                wandb.login(key=self.api_key)
+            self._api = wandb.Api()
+            self._api_pid = os.getpid()
+        return self._api.artifact(f"{self.entity}/{self.project}/{name}:{alias}")
+
+    def resolve(self, name: str, alias: str) -> ArtifactInfo:
+        artifact = self._artifact(name, alias)
+        return ArtifactInfo(name, alias, artifact.version, artifact.digest, "wandb")
+
+    def download(self, info: ArtifactInfo, dest: str) -> None:
+        self._artifact(info.name, info.version).download(root=dest)
+
+
+# Directory layout: <root>/<name>/<alias or version>/*.joblib, where an alias
+# may be a symlink to a version directory. A root that directly holds a
+# .joblib file (like Phase 1/Model/best_current_model) serves every alias.
+class LocalDirRegistry(ModelRegistry):
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, name, alias):
+        if glob.glob(os.path.join(self.root, "*.joblib")):
+            return self.root
+        path = os.path.join(self.root, name, alias)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No artifact {name}:{alias} under {self.root}")
+        return os.path.realpath(path)
+
+    def resolve(self, name: str, alias: str) -> ArtifactInfo:
+        path = self._path(name, alias)
+        digest = hashlib.sha256(
+            "".join(f"{f}:{h}" for f, h in sorted(file_checksums(path).items())).encode()
+        ).hexdigest()
+        return ArtifactInfo(name, alias, os.path.basename(path), digest, path)
+
+    def download(self, info: ArtifactInfo, dest: str) -> None:
+        for fname in os.listdir(info.source):
+            src = os.path.join(info.source, fname)
+            if os.path.isfile(src):
+                shutil.copy2(src, os.path.join(dest, fname))
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_checksums(directory: str) -> Dict[str, str]:
+    return {
+        fname: sha256_file(os.path.join(directory, fname))
+        for fname in sorted(os.listdir(directory))
+        if os.path.isfile(os.path.join(directory, fname)) and fname != "manifest.json"
+    }
+
+
+# The serving artifact is `model.joblib`; older artifacts use other names
+def find_model_file(directory: str) -> str:
+    preferred = os.path.join(directory, "model.joblib")
+    if os.path.exists(preferred):
+        return preferred
+    candidates = sorted(glob.glob(os.path.join(directory, "*.joblib")))
+    if not candidates:
+        raise FileNotFoundError(f"No .joblib model file in {directory}")
+    return candidates[0]
+
+
+# Memory-map numpy arrays stored in the joblib file instead of copying them
+def load_model_file(path: str) -> Any:
+    import joblib
+
+    return joblib.load(path, mmap_mode="r")
+
+
+# Content-addressed local artifact cache.
+#
+# Each artifact lives in <cache_dir>/<digest>/ next to a manifest.json holding
+# the sha256 of every file; entries are re-verified before use, so a
+# truncated or tampered file is downloaded again. A per name/alias pointer
+# records the last artifact that loaded successfully.
+class ArtifactCache:
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _entry(self, digest):
+        return os.path.join(self.cache_dir, digest.replace("/", "_"))
+
+    def _pointer(self, name, alias):
+        return os.path.join(self.cache_dir, "last_good", f"{name}-{alias}.json")
+
+    def verify(self, path: str) -> bool:
+        try:
+            with open(os.path.join(path, "manifest.json")) as f:
+                manifest = json.load(f)
+            return manifest["files"] == file_checksums(path)
+        except (OSError, ValueError, KeyError):
+            return False
+
+    # Path of a verified cached artifact, or None
+    def get(self, digest: str) -> Optional[str]:
+        path = self._entry(digest)
+        if os.path.isdir(path) and self.verify(path):
+            return path
+        return None
+
+    # Download into a temp dir, checksum it, then move it into place atomically
+    def put(self, registry: ModelRegistry, info: ArtifactInfo) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry(info.digest)
+        staging = tempfile.mkdtemp(prefix=".download-", dir=self.cache_dir)
+        try:
+            registry.download(info, staging)
+            manifest = {"artifact": asdict(info), "files": file_checksums(staging)}
+            with open(os.path.join(staging, "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=4)
+            if os.path.isdir(path):
+                shutil.rmtree(path)  # failed verification earlier
+            os.rename(staging, path)
+        finally:
+            if os.path.isdir(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+        return path
+
+    # Remove a cached artifact (e.g. one that verifies but does not load)
+    def evict(self, digest: str):
+        shutil.rmtree(self._entry(digest), ignore_errors=True)
+
+    def mark_good(self, info: ArtifactInfo):
+        pointer = self._pointer(info.name, info.alias)
+        os.makedirs(os.path.dirname(pointer), exist_ok=True)
+        tmp = f"{pointer}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(asdict(info), f, indent=4)
+        os.replace(tmp, pointer)
+
+    # Last artifact that loaded for this alias, if it is still intact
+    def last_good(self, name: str, alias: str) -> Optional[Tuple[ArtifactInfo, str]]:
+        try:
+            with open(self._pointer(name, alias)) as f:
+                info = ArtifactInfo(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        path = self.get(info.digest)
+        return (info, path) if path else None
+
+
+# Load a resolved artifact through the cache, downloading it if unseen
+def load_artifact(registry: ModelRegistry, cache: ArtifactCache, info: ArtifactInfo) -> Any:
+    path = cache.get(info.digest)
+    if path is None:
+        path = cache.put(registry, info)
+        print(f"Downloaded {info.name}:{info.alias} ({info.version}) into {path}")
+    return load_model_file(find_model_file(path))
+
+
+# Resolve the alias, serve it from the local cache (downloading only unseen
+# digests) and load it. If the registry cannot be reached or the artifact
+# does not load (a corrupt or truncated file is evicted from the cache),
+# fall back to the last-known-good cached artifact, then to `fallback_dir`.
+def fetch_model(
+    registry: ModelRegistry,
+    cache: ArtifactCache,
+    name: str,
+    alias: str,
+    fallback_dir: Optional[str] = None,
+) -> Tuple[Any, ArtifactInfo]:
+    try:
+        info = registry.resolve(name, alias)
+    except Exception as e:
+        print(f"Model registry unavailable ({e}); trying last-known-good model")
+        return load_fallback(cache, name, alias, fallback_dir, e)
+    try:
+        model = load_artifact(registry, cache, info)
+    except Exception as e:
+        print(f"Could not load {name}:{alias} ({info.version}): {e}; trying last-known-good model")
+        cache.evict(info.digest)
+        return load_fallback(cache, name, alias, fallback_dir, e)
+    cache.mark_good(info)
+    return model, info
+
+
+# Last-known-good cached artifact, else `fallback_dir`, else re-raise `error`
+def load_fallback(
+    cache: ArtifactCache,
+    name: str,
+    alias: str,
+    fallback_dir: Optional[str],
+    error: Exception,
+) -> Tuple[Any, ArtifactInfo]:
+    last = cache.last_good(name, alias)
+    if last is not None:
+        info, path = last
+        try:
+            return load_model_file(find_model_file(path)), info
+        except Exception as e:
+            print(f"Last-known-good {name}:{alias} ({info.version}) does not load either: {e}")
+            cache.evict(info.digest)
+    if fallback_dir and os.path.isdir(fallback_dir):
+        info = LocalDirRegistry(fallback_dir).resolve(name, alias)
+        return load_model_file(find_model_file(fallback_dir)), info
+    raise error
@@ -0,0 +1,156 @@
+import time
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from features import MODEL_FEATURES
+from registry import ArtifactCache, ArtifactInfo, ModelRegistry, load_artifact
+from scorer import compile_model
+
+
+# Everything the request path needs from one model version. Handlers read
+# the active instance once, so swapping it is a single reference assignment
+# and in-flight requests finish on the model they started with.
+@dataclass(frozen=True)
+class ActiveModel:
+    model: Any
+    scorer: Any
+    feature_names: Tuple[str, ...]
+    version: str
+    digest: str
+    loaded_at: str
+    load_seconds: float
+
+
+# Compile the scorer and run it once so the first real request does not pay
+# for lazy initialisation (thread-local buffers, sklearn dispatch caches).
+# Models fitted on a DataFrame name their features; otherwise `feature_names`.
+def build_active(
+    model,
+    info: Optional[ArtifactInfo] = None,
+    inverse_log: bool = False,
+    feature_names: Sequence[str] = MODEL_FEATURES,
+    load_seconds: float = 0.0,
+) -> ActiveModel:
+    names = getattr(model, "feature_names_in_", None)
+    names = tuple(str(n) for n in names) if names is not None else tuple(feature_names)
+    scorer = compile_model(model, inverse_log=inverse_log)
+    n = getattr(scorer, "n_features", None) or len(names)
+    scorer.predict(np.zeros((2, n)))
+    scorer.predict_one([0.0] * n)
+    return ActiveModel(
+        model=model,
+        scorer=scorer,
+        feature_names=names,
+        version=info.version if info else "unknown",
+        digest=info.digest if info else "",
+        loaded_at=datetime.utcnow().isoformat(),
+        load_seconds=load_seconds,
+    )
+
+
+# Polls the registry alias in a background thread. When the alias points at
+# a new digest the artifact is fetched (through the local cache), loaded and
+# warmed on this thread, then handed to `install`; a failed load leaves the
+# current model in place. An artifact that downloads but does not load is
+# evicted from the cache and its digest skipped until the alias moves, so a
+# bad version is not fetched again on every poll (a failed download is
+# simply retried).
+class ModelWatcher:
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        cache: ArtifactCache,
+        name: str,
+        alias: str,
+        current: Callable[[], Optional[ActiveModel]],
+        install: Callable[[ActiveModel], None],
+        interval: float = 60.0,
+        inverse_log: bool = False,
+        feature_names: Sequence[str] = MODEL_FEATURES,
+    ):
+        self.registry = registry
+        self.cache = cache
+        self.name = name
+        self.alias = alias
+        self.current = current
+        self.install = install
+        self.interval = interval
+        self.inverse_log = inverse_log
+        self.feature_names = feature_names
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.polls = 0
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_poll = None
+        self.bad_digest = None
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    # One poll; returns True if a new model was installed
+    def check(self) -> bool:
+        self.polls += 1
+        self.last_poll = datetime.utcnow().isoformat()
+        info = None
+        try:
+            info = self.registry.resolve(self.name, self.alias)
+            active = self.current()
+            if info.digest == self.bad_digest or (active is not None and active.digest == info.digest):
+                return False
+
+            started = time.perf_counter()
+            model = load_artifact(self.registry, self.cache, info)
+            new = build_active(
+                model, info,
+                inverse_log=self.inverse_log,
+                feature_names=self.feature_names,
+                load_seconds=time.perf_counter() - started,
+            )
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"Model reload check failed: {e}")
+            if info is not None and self.cache.get(info.digest) is not None:
+                self.cache.evict(info.digest)
+                self.bad_digest = info.digest
+            return False
+
+        self.install(new)
+        self.cache.mark_good(info)
+        self.reloads += 1
+        print(f"Hot-swapped {self.name}:{self.alias} to {info.version} ({new.load_seconds:.2f}s)")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "running": self._thread is not None,
+            "polls": self.polls,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_poll": self.last_poll,
+            "bad_digest": self.bad_digest,
+        }
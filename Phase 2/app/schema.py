@@ -1,4 +1,7 @@
 # schema.py
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel
 
 class PredictionRequest(BaseModel):
@@ -8,4 +11,5 @@ class PredictionRequest(BaseModel):
     dropoff_lon: float
     passenger_count: int
     trip_distance: float
+    pickup_datetime: Optional[datetime] = None  # NYC local time; defaults to now
     user_id: str = "anonymous"
@@ -0,0 +1,103 @@
+import math
+import threading
+from typing import Sequence
+
+import numpy as np
+
+
+# Fast path for linear models.
+#
+# sklearn's `predict` validates and converts its input on every call, which
+# for a handful of coefficients costs far more than the dot product itself.
+# LinearScorer keeps `coef_`/`intercept_` as a contiguous float64 vector and
+# scores straight into a preallocated (per-thread) buffer, applying the
+# optional `expm1` inverse of the log1p training target in place.
+class LinearScorer:
+    def __init__(self, coef, intercept, inverse_log: bool = False, buffer_rows: int = 4096):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(np.ravel(intercept)[0])
+        self.inverse_log = inverse_log
+        self.n_features = self.coef.shape[0]
+        self.buffer_rows = buffer_rows
+        self._local = threading.local()
+
+    # Pickles without the per-thread buffers (e.g. to ship to a process pool)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _buffers(self):
+        local = self._local
+        if not hasattr(local, "row"):
+            local.row = np.empty(self.n_features, dtype=np.float64)
+            local.out = np.empty(self.buffer_rows, dtype=np.float64)
+        return local
+
+    # Score a matrix of shape (n_rows, n_features); returns a new float64 array
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features}")
+
+        n = X.shape[0]
+        out = self._buffers().out[:n] if n <= self.buffer_rows else np.empty(n, dtype=np.float64)
+        np.dot(X, self.coef, out=out)
+        out += self.intercept
+        if self.inverse_log:
+            np.expm1(out, out=out)
+        return out.copy()
+
+    # Score a single row given as a flat sequence of feature values
+    def predict_one(self, values: Sequence[float]) -> float:
+        row = self._buffers().row
+        row[:] = values
+        value = float(row.dot(self.coef)) + self.intercept
+        return math.expm1(value) if self.inverse_log else value
+
+
+# Fallback for any other estimator: the model's own predict plus the same
+# inverse-log transform
+class GenericScorer:
+    def __init__(self, model, inverse_log: bool = False):
+        self.model = model
+        self.inverse_log = inverse_log
+        self.n_features = getattr(model, "n_features_in_", None)
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        out = np.asarray(self.model.predict(X), dtype=np.float64).ravel()
+        if self.inverse_log:
+            out = np.expm1(out)
+        return out
+
+    def predict_one(self, values: Sequence[float]) -> float:
+        return float(self.predict(np.asarray(values, dtype=np.float64).reshape(1, -1))[0])
+
+
+# Pick the fastest scorer that reproduces `model.predict`. Only sklearn
+# LinearModel subclasses (LinearRegression, Ridge, Lasso, ...) predict exactly
+# X @ coef_ + intercept_; GLMs and everything else keep their own predict.
+def compile_model(model, inverse_log: bool = False):
+    try:
+        from sklearn.linear_model._base import LinearModel
+    except ImportError:
+        LinearModel = None
+
+    coef = getattr(model, "coef_", None)
+    if (
+        LinearModel is not None
+        and isinstance(model, LinearModel)
+        and coef is not None
+        and np.ndim(coef) == 1
+    ):
+        return LinearScorer(coef, model.intercept_, inverse_log=inverse_log)
+    return GenericScorer(model, inverse_log=inverse_log)
@@ -0,0 +1,140 @@
+# Pre-forking launcher for the prediction API.
+#
+# `uvicorn --workers N` starts N independent processes, each downloading,
+# loading and warming the model and holding its own caches. This launcher
+# does that once: it imports the app, loads and warms the model in the
+# parent, freezes the GC so the loaded objects stay untouched, binds the
+# socket and then forks N workers. Workers share the model pages
+# copy-on-write and the local prediction cache lives in shared memory, so
+# each extra worker costs neither a model load nor another cache. Workers
+# that die are re-forked from the parent, which starts them just as fast.
+#
+#   python serve.py --host 0.0.0.0 --port 8000 --workers 4
+#
+# Background work (log writers, DynamoDB queues, the model watcher) starts
+# in each worker, since threads do not survive a fork. The sharing only
+# covers the preloaded model: when the watcher picks up a new version,
+# every worker fetches and loads its own private copy, so memory grows to
+# one model per worker until the server is restarted. With large models,
+# run with MODEL_POLL_INTERVAL=0 and roll out new versions by restarting.
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+import traceback
+
+
+def bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+# Runs in the child; never returns
+def run_worker(app, sock: socket.socket, args):
+    import uvicorn
+
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    code = 0
+    try:
+        config = uvicorn.Config(
+            app, log_level=args.log_level, access_log=args.access_log,
+            timeout_keep_alive=args.timeout_keep_alive,
+        )
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def spawn(app, sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        run_worker(app, sock, args)
+    return pid
+
+
+def serve(args):
+    # Must be set before the app module creates its cache
+    if args.cache_slots:
+        os.environ["CACHE_SHARED_SLOTS"] = str(args.cache_slots)
+
+    from uvicorn.importer import import_from_string
+
+    app = import_from_string(args.app)
+    if args.factory:
+        app = app()
+    import main as service
+
+    started = time.perf_counter()
+    service.preload()
+    print(f"Model preloaded in {time.perf_counter() - started:.2f}s; forking {args.workers} workers")
+
+    # Objects that exist now are shared with every worker; keep the
+    # collector from touching (and so copying) their pages
+    gc.collect()
+    gc.freeze()
+
+    sock = bind(args.host, args.port)
+    workers = {}  # pid -> start time
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        workers[spawn(app, sock, args)] = time.monotonic()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started_at = workers.pop(pid, None)
+        if started_at is None or stopping:
+            continue  # not a worker (e.g. the shared memory tracker)
+        print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+        if time.monotonic() - started_at < 1.0:
+            time.sleep(1.0)  # crashing on start; do not spin
+        if not stopping:
+            workers[spawn(app, sock, args)] = time.monotonic()
+
+    sock.close()
+    if hasattr(service.LOCAL_CACHE, "close"):
+        service.LOCAL_CACHE.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the prediction API from pre-forked workers")
+    parser.add_argument("--app", default="main:app", help="module:attribute of the ASGI app")
+    parser.add_argument("--factory", action="store_true", help="--app is a factory to call")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--cache-slots", type=int, default=int(os.getenv("CACHE_SHARED_SLOTS", str(1 << 20))),
+                        help="shared prediction cache slots (32 bytes each); 0 keeps a per-worker LRU")
+    parser.add_argument("--timeout-keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--access-log", action=argparse.BooleanOptionalAction, default=True)
+    serve(parser.parse_args())
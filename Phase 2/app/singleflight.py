@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+# Collapses concurrent calls with the same key into one.
+#
+# The first caller for a key (the leader) starts `fn()` as a task; callers
+# arriving while it runs await the same task instead of starting their own,
+# and all of them get its result or exception. The key is forgotten as soon
+# as the task finishes, so later calls run again (caching is not this
+# class's job). Callers await the task through asyncio.shield, so a
+# cancelled caller (e.g. a client that disconnected) does not cancel the
+# work for the others. One instance per event loop / worker process.
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Any, asyncio.Task] = {}
+
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self.leaders += 1
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.collapsed
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "collapsed": self.collapsed,
+            "collapse_ratio": self.collapsed / calls if calls else 0.0,
+        }
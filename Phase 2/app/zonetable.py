@@ -0,0 +1,202 @@
+import os
+import json
+import math
+import shutil
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Fibonacci hashing: multiply by 2^64 / golden ratio, keep the top bits
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+META_FILE = "meta.json"
+KEYS_FILE = "keys.npy"
+VALUES_FILE = "values.npy"
+
+
+# Regular lat/lon grid over the service area. Cells are numbered row-major;
+# points outside the grid have no cell (-1).
+@dataclass(frozen=True)
+class ZoneGrid:
+    min_lat: float = 40.49
+    min_lon: float = -74.27
+    cell_deg: float = 0.005  # ~550 m north-south, ~420 m east-west
+    rows: int = 86
+    cols: int = 118
+
+    @property
+    def cells(self) -> int:
+        return self.rows * self.cols
+
+    def cell(self, lat: float, lon: float) -> int:
+        r = math.floor((lat - self.min_lat) / self.cell_deg)
+        c = math.floor((lon - self.min_lon) / self.cell_deg)
+        if 0 <= r < self.rows and 0 <= c < self.cols:
+            return r * self.cols + c
+        return -1
+
+    def cells_many(self, lat, lon) -> np.ndarray:
+        r = np.floor((np.asarray(lat, dtype=np.float64) - self.min_lat) / self.cell_deg)
+        c = np.floor((np.asarray(lon, dtype=np.float64) - self.min_lon) / self.cell_deg)
+        inside = (r >= 0) & (r < self.rows) & (c >= 0) & (c < self.cols)
+        return np.where(inside, r * self.cols + c, -1).astype(np.int64)
+
+    # Centre of a cell, as (lat, lon)
+    def center(self, cell: int) -> Tuple[float, float]:
+        r, c = divmod(cell, self.cols)
+        return self.min_lat + (r + 0.5) * self.cell_deg, self.min_lon + (c + 0.5) * self.cell_deg
+
+    # One key per (origin cell, destination cell, hour, day of week); 0 is
+    # reserved for empty slots and for trips outside the grid
+    def key(self, origin: int, dest: int, hour: int, dow: int) -> int:
+        if origin < 0 or dest < 0:
+            return 0
+        return ((origin * self.cells + dest) * 24 + hour) * 7 + dow + 1
+
+    def keys_many(self, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon, hour, dow) -> np.ndarray:
+        origin = self.cells_many(pickup_lat, pickup_lon)
+        dest = self.cells_many(dropoff_lat, dropoff_lon)
+        keys = ((origin * self.cells + dest) * 24 + np.asarray(hour, dtype=np.int64)) * 7
+        keys += np.asarray(dow, dtype=np.int64) + 1
+        return np.where((origin >= 0) & (dest >= 0), keys, 0).astype(np.uint64)
+
+
+def _home_slots(keys: np.ndarray, shift: int) -> np.ndarray:
+    return (keys.astype(np.uint64) * np.uint64(_GOLDEN)) >> np.uint64(shift)
+
+
+# Open-addressing hash index (linear probing, load factor <= `load_factor`)
+# over unique non-zero keys. Returns the slot arrays and the longest probe.
+def build_index(keys: np.ndarray, values: np.ndarray, load_factor: float = 0.5):
+    keys = np.asarray(keys, dtype=np.uint64)
+    bits = max(1, math.ceil(math.log2(max(len(keys), 1) / load_factor)))
+    size = 1 << bits
+    table_keys = np.zeros(size, dtype=np.uint64)
+    table_values = np.full(size, np.nan, dtype=np.float32)
+
+    # Insert everything at once, a probe step per round: the first key
+    # claiming a free slot takes it, the rest move one slot on. Slots never
+    # free up again, so every slot a key passed over stays occupied.
+    slots = _home_slots(keys, 64 - bits).astype(np.int64)
+    pending = np.arange(len(keys))
+    probes = 0
+    while pending.size:
+        s = slots[pending]
+        free = table_keys[s] == 0
+        claim, first = np.unique(s[free], return_index=True)
+        winners = pending[free][first]
+        table_keys[claim] = keys[winners]
+        table_values[claim] = values[winners]
+        placed = np.zeros(len(keys), dtype=bool)
+        placed[winners] = True
+        pending = pending[~placed[pending]]
+        slots[pending] = (slots[pending] + 1) & (size - 1)
+        probes += 1
+    return table_keys, table_values, probes
+
+
+# Write a table directory atomically (staged next to it, then renamed)
+def save_table(directory: str, grid: ZoneGrid, keys, values, meta: Dict[str, Any]) -> Dict[str, Any]:
+    table_keys, table_values, max_probe = build_index(keys, values)
+    meta = {**meta, "grid": asdict(grid), "buckets": int(len(keys)), "slots": int(len(table_keys)),
+            "max_probe": int(max_probe)}
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".zonetable-", dir=parent)
+    try:
+        np.save(os.path.join(staging, KEYS_FILE), table_keys)
+        np.save(os.path.join(staging, VALUES_FILE), table_values)
+        with open(os.path.join(staging, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.rename(staging, directory)
+    finally:
+        if os.path.isdir(staging):
+            shutil.rmtree(staging, ignore_errors=True)
+    return meta
+
+
+# Precomputed log trip duration per (origin cell, destination cell, hour,
+# day of week), built offline by Phase 1/Model/build_zonetable.py.
+#
+# The index is memory-mapped, so opening it is instant, and forked workers
+# share its pages. A lookup hashes the bucket key and probes at most
+# `max_probe` slots. `probe` in the metadata holds feature rows and the log
+# predictions of the model the table was built from; matches() checks a
+# scorer against them so a table is never used with a different model.
+class ZoneTable:
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.grid = ZoneGrid(**self.meta["grid"])
+        self.keys = np.load(os.path.join(directory, KEYS_FILE), mmap_mode="r")
+        self.values = np.load(os.path.join(directory, VALUES_FILE), mmap_mode="r")
+        self.mask = len(self.keys) - 1
+        self.shift = 64 - (len(self.keys).bit_length() - 1)
+        self.max_probe = self.meta["max_probe"]
+
+        self.hits = 0
+        self.misses = 0
+
+    def matches(self, scorer, inverse_log: bool, feature_names: Sequence[str]) -> bool:
+        probe = self.meta.get("probe")
+        if not probe or tuple(feature_names) != tuple(self.meta.get("features", ())):
+            return False
+        expected = np.asarray(probe["log_predictions"], dtype=np.float64)
+        if inverse_log:
+            expected = np.expm1(expected)
+        got = scorer.predict(np.asarray(probe["rows"], dtype=np.float64))
+        return bool(np.allclose(got, expected, rtol=1e-4, atol=1e-6))
+
+    # Log duration for one trip, or None when its bucket is not in the table
+    def lookup(self, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon, hour, dow) -> Optional[float]:
+        grid = self.grid
+        key = grid.key(grid.cell(pickup_lat, pickup_lon), grid.cell(dropoff_lat, dropoff_lon), hour, dow)
+        if key:
+            slot = ((key * _GOLDEN) & _MASK64) >> self.shift
+            for _ in range(self.max_probe):
+                found = int(self.keys[slot])
+                if found == key:
+                    self.hits += 1
+                    return float(self.values[slot])
+                if found == 0:
+                    break
+                slot = (slot + 1) & self.mask
+        self.misses += 1
+        return None
+
+    # Vectorized lookup; NaN where a bucket is missing
+    def lookup_many(self, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon, hour, dow) -> np.ndarray:
+        keys = self.grid.keys_many(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon, hour, dow)
+        out = np.full(len(keys), np.nan)
+        slots = _home_slots(keys, self.shift).astype(np.int64)
+        pending = np.flatnonzero(keys)
+        for _ in range(self.max_probe):
+            if not pending.size:
+                break
+            found = self.keys[slots[pending]]
+            hit = found == keys[pending]
+            out[pending[hit]] = self.values[slots[pending[hit]]]
+            pending = pending[~hit & (found != 0)]
+            slots[pending] = (slots[pending] + 1) & self.mask
+        hits = int(np.count_nonzero(~np.isnan(out)))
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "buckets": self.meta["buckets"],
+            "model": self.meta.get("model"),
+            "built_at": self.meta.get("built_at"),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
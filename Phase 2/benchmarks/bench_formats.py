@@ -0,0 +1,92 @@
+# CPU per 10k rows of /predict_batch by request/response format: JSON
+# (Pydantic per row), Arrow IPC and MessagePack float32 columns. Requests go
+# through the real app in-process (ASGI, no sockets) with the load test's
+# stub model; bodies are encoded up front, so only server-side work is
+# timed. Prediction logging is left out: it costs the same per row whatever
+# the format.
+#
+#   cd "Phase 2" && python benchmarks/bench_formats.py [--rows 10000] [--repeat 20]
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import numpy as np
+import pyarrow as pa
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+sys.path.insert(0, os.path.dirname(__file__))
+import columnar  # noqa: E402
+from loadtest import create_app, make_payloads  # noqa: E402
+
+
+def arrow_body(records):
+    batch = pa.record_batch(
+        [pa.array([r[name] for r in records], pa.float32()) for name in columnar.REQUIRED_COLUMNS],
+        names=list(columnar.REQUIRED_COLUMNS),
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def msgpack_body(records):
+    import msgpack
+
+    return msgpack.packb({
+        name: np.array([r[name] for r in records], "<f4").tobytes() for name in columnar.REQUIRED_COLUMNS
+    })
+
+
+async def measure(app, body, content_type, repeat):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"Content-Type": content_type}
+        res = await client.post("/predict_batch", content=body, headers=headers)  # warm up
+        assert res.status_code == 200, res.text
+        cpu, wall = time.process_time(), time.perf_counter()
+        for _ in range(repeat):
+            res = await client.post("/predict_batch", content=body, headers=headers)
+        return time.process_time() - cpu, time.perf_counter() - wall, len(res.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU per 10k rows by /predict_batch format")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    import main as service
+
+    app = create_app()
+    service.load_model_from_wandb()
+    service.log_predictions = lambda reqs, predictions: None
+    service.log_columns = lambda columns, predictions: None
+    service.CACHE.remote = None  # every run would otherwise be a cache hit after the warm-up
+    service.CACHE.local.put = lambda key, value: None
+
+    records = [dict(r, pickup_datetime="2024-05-06T08:30:00") for r in make_payloads(args.rows)]
+    formats = [("json", json.dumps(records).encode(), "application/json"),
+               ("arrow", arrow_body(records), columnar.ARROW_STREAM)]
+    try:
+        formats.append(("msgpack", msgpack_body(records), columnar.MSGPACK))
+    except ImportError:
+        print("msgpack not installed, skipping MessagePack")
+
+    scale = 10000 / args.rows
+    print(f"{'format':>8} {'request KB':>11} {'response KB':>12} {'CPU ms/10k rows':>16} {'wall ms/10k rows':>17}")
+    for name, body, content_type in formats:
+        cpu, wall, response_bytes = asyncio.run(measure(app, body, content_type, args.repeat))
+        print(
+            f"{name:>8} {len(body) / 1024:>11.0f} {response_bytes / 1024:>12.0f} "
+            f"{cpu / args.repeat * scale * 1000:>16.1f} {wall / args.repeat * scale * 1000:>17.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Cost of the request-path instrumentation: one stage timer (two
+# perf_counter() calls + observe) and the ASGI request middleware.
+#
+#   cd "Phase 2" && python benchmarks/bench_metrics.py
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+from metrics import MetricsRegistry, RequestMetrics  # noqa: E402
+
+STAGES_PER_REQUEST = 6  # /predict on a cache miss: lookup, featurize, predict, store, 2 enqueues
+
+
+def per_call(fn, n):
+    fn()
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    registry = MetricsRegistry()
+    stage = registry.histogram("stage_seconds", "Stage latency", ("stage",)).labels("predict")
+    perf_counter = time.perf_counter
+
+    def timed_stage():
+        t0 = perf_counter()
+        stage.observe(perf_counter() - t0)
+
+    n = 200_000
+    t_stage = per_call(timed_stage, n) - per_call(lambda: None, n)  # minus the loop's own call
+    print(f"stage timer:        {t_stage * 1e9:8.0f} ns")
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    wrapped = RequestMetrics(
+        app,
+        registry.histogram("http_seconds", "", ("method", "path")),
+        registry.counter("http_total", "", ("method", "path", "status")),
+        paths=["/predict"],
+    )
+    scope = {"type": "http", "path": "/predict", "method": "POST"}
+
+    async def run(target, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            await target(scope, None, send)
+        return (time.perf_counter() - start) / count
+
+    m = 100_000
+    t_bare = asyncio.run(run(app, m))
+    t_wrapped = asyncio.run(run(wrapped, m))
+    t_middleware = t_wrapped - t_bare
+    print(f"request middleware: {t_middleware * 1e9:8.0f} ns")
+    total = STAGES_PER_REQUEST * t_stage + t_middleware
+    print(f"per /predict:       {total * 1e6:8.2f} us ({STAGES_PER_REQUEST} stages + middleware)")
+
+
+if __name__ == "__main__":
+    main()
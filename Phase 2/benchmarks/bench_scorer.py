@@ -0,0 +1,60 @@
+# Per-row and per-batch latency of sklearn's predict vs the compiled scorer.
+#
+#   cd "Phase 2" && python benchmarks/bench_scorer.py [path/to/model.joblib]
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+from scorer import compile_model  # noqa: E402
+
+DEFAULT_MODEL = os.path.join(
+    os.path.dirname(__file__), "..", "..", "Phase 1", "Model", "taxi_model.joblib"
+)
+
+
+def time_call(fn, repeat):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODEL
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = joblib.load(path)
+    scorer = compile_model(model, inverse_log=True)
+    n_features = model.n_features_in_
+    columns = list(getattr(model, "feature_names_in_", range(n_features)))
+    print(f"model: {type(model).__name__} ({n_features} features) -> {type(scorer).__name__}")
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>8} {'sklearn us/call':>16} {'scorer us/call':>15} {'speedup':>8} {'scorer ns/row':>14}")
+    for rows in (1, 10, 100, 1000, 10000):
+        X = rng.normal(size=(rows, n_features))
+        df = pd.DataFrame(X, columns=columns)
+        repeat = max(20, 20000 // rows)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            t_sklearn = time_call(lambda: np.expm1(model.predict(df)), repeat)
+        if rows == 1:
+            row = X[0].tolist()
+            t_scorer = time_call(lambda: scorer.predict_one(row), repeat)
+        else:
+            t_scorer = time_call(lambda: scorer.predict(X), repeat)
+        print(
+            f"{rows:>8} {t_sklearn * 1e6:>16.1f} {t_scorer * 1e6:>15.1f} "
+            f"{t_sklearn / t_scorer:>7.1f}x {t_scorer / rows * 1e9:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
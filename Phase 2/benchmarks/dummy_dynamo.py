@@ -0,0 +1,99 @@
+import time
+from typing import Dict
+
+# In-memory stand-ins for the boto3 DynamoDB resource, shared by the load
+# test and the tests (Phase 2/tests, Phase 4/Tests). They live with the
+# benchmarks so they are not shipped in the service image. They cover what the app
+# uses: Table(), put_item/get_item, batch_writer() and batch_get_item().
+#
+# `latency` (seconds) is added to every call to mimic the network. On a
+# table, `fail_times` makes the next N batch writes fail with a throttling
+# error, put_item refuses items whose request_id is in `invalid` with a
+# ValidationException (as DynamoDB would for a malformed item) and `gets`
+# counts keys looked up.
+
+
+# botocore error as the resource raises it
+def client_error(code: str, status: int = 400, operation: str = "BatchWriteItem"):
+    from botocore.exceptions import ClientError
+
+    return ClientError(
+        {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        operation,
+    )
+
+
+class DummyBatchWriter:
+    def __init__(self, table: "DummyTable"):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.table._delay()
+        return False
+
+    def put_item(self, Item):
+        self.table._store(Item)
+
+
+class DummyTable:
+    def __init__(self, latency: float = 0.0):
+        self.store: Dict[str, dict] = {}
+        self.latency = latency
+        self.fail_times = 0
+        self.invalid = set()
+        self.gets = 0
+
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _key(self, item):
+        return item.get("request_hash") or item.get("request_id") or item.get("id") or str(len(self.store))
+
+    def _store(self, item):
+        if item.get("request_id") in self.invalid:
+            raise client_error("ValidationException", operation="PutItem")
+        self.store[self._key(item)] = item
+
+    def batch_writer(self, **kwargs):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise client_error("ProvisionedThroughputExceededException")
+        return DummyBatchWriter(self)
+
+    def put_item(self, Item):
+        self._delay()
+        self._store(Item)
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    def get_item(self, Key):
+        self._delay()
+        self.gets += 1
+        item = self.store.get(Key.get("request_hash"))
+        return {"Item": item} if item is not None else {}
+
+
+class DummyDynamo:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._tables: Dict[str, DummyTable] = {}
+
+    def Table(self, name: str) -> DummyTable:
+        if name not in self._tables:
+            self._tables[name] = DummyTable(self.latency)
+        return self._tables[name]
+
+    def batch_get_item(self, RequestItems):
+        if self.latency:
+            time.sleep(self.latency)
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            table.gets += len(request["Keys"])
+            responses[name] = [
+                table.store[k["request_hash"]] for k in request["Keys"] if k["request_hash"] in table.store
+            ]
+        return {"Responses": responses, "UnprocessedKeys": {}}
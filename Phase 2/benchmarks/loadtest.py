@@ -0,0 +1,386 @@
+# Load test for the prediction API: starts the app in a subprocess with a
+# stub model and an in-memory DynamoDB, drives /predict and /predict_batch at
+# a fixed concurrency and reports latency percentiles, throughput and server
+# CPU per worker process.
+#
+#   cd "Phase 2" && python benchmarks/loadtest.py --concurrency 64 --duration 10 --clients 4 \
+#       --output results.json [--baseline baseline.json --threshold 0.2]
+#
+# With --baseline the run fails (exit code 1) when p95/p99 latency grows or
+# throughput drops by more than --threshold (a fraction) in any scenario.
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+# (metric, direction): +1 when larger is worse
+COMPARED_METRICS = {"p95_ms": 1, "p99_ms": 1, "rps": -1}
+
+
+# ---- server side ---------------------------------------------------------
+
+def stub_model():
+    from sklearn.linear_model import LinearRegression
+    from features import MODEL_FEATURES
+
+    model = LinearRegression()
+    rng = np.random.default_rng(0)
+    model.coef_ = rng.normal(scale=0.01, size=len(MODEL_FEATURES))
+    model.intercept_ = 6.5
+    model.n_features_in_ = len(MODEL_FEATURES)
+    model.feature_names_in_ = np.array(MODEL_FEATURES, dtype=object)
+    return model
+
+
+# uvicorn app factory (runs in every worker process): the real app, with the
+# registry replaced by a stub model and DynamoDB by the in-memory stand-in
+def create_app():
+    import dynamo
+    import main
+    from dummy_dynamo import DummyDynamo
+
+    dynamo.set_dynamodb(DummyDynamo(float(os.getenv("LOADTEST_DYNAMO_LATENCY_MS", "0")) / 1000))
+    main.load_model_from_wandb = lambda: main.set_model(stub_model())
+    return main.app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# uvicorn --workers, or serve.py (model loaded once, workers forked from it)
+def start_server(port: int, workers: int, env: Dict[str, str], preload: bool = False) -> subprocess.Popen:
+    launcher = [os.path.join(APP_DIR, "serve.py"), "--app"] if preload else ["-m", "uvicorn"]
+    cmd = [
+        sys.executable, *launcher, "loadtest:create_app", "--factory",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+        "--log-level", "warning", "--no-access-log",
+    ]
+    path = os.pathsep.join([os.path.dirname(os.path.abspath(__file__)), APP_DIR])
+    env = {**os.environ, **env, "PYTHONPATH": path}
+    return subprocess.Popen(cmd, cwd=APP_DIR, env=env)
+
+
+async def wait_ready(client, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).json().get("model_loaded"):
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+# Processes serving requests: the server itself, or its workers under a supervisor
+def worker_pids(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(p) for p in f.read().split()]
+    except OSError:
+        return [pid]
+    # uvicorn --workers also spawns a multiprocessing helper; keep python workers
+    return [p for p in children if _cpu_seconds(p) is not None] or [pid]
+
+
+# Proportional set size: shared pages are split between the processes
+# mapping them, so summing it over workers gives the real memory use
+def _pss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None  # not Linux, or the process exited
+
+
+# ---- client side ---------------------------------------------------------
+
+def make_payloads(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "pickup_lat": round(rng.uniform(40.60, 40.90), 6),
+            "pickup_lon": round(rng.uniform(-74.05, -73.75), 6),
+            "dropoff_lat": round(rng.uniform(40.60, 40.90), 6),
+            "dropoff_lon": round(rng.uniform(-74.05, -73.75), 6),
+            "passenger_count": rng.randint(1, 6),
+            "trip_distance": round(rng.uniform(0.5, 20.0), 2),
+            "user_id": f"loadtest-{rng.randint(0, 99)}",
+        }
+        for _ in range(n)
+    ]
+
+
+# Minimal keep-alive HTTP/1.1 client on asyncio streams: one connection per
+# simulated client and request bodies encoded once up front. httpx spends
+# several milliseconds of CPU per request once hundreds of connections share
+# a pool, which made the load generator the bottleneck. Returns the status
+# and the Retry-After seconds (0 if absent).
+async def _post(reader, writer, head: bytes, body: bytes) -> Tuple[int, float]:
+    writer.write(head + body)
+    await writer.drain()
+    status_line, *lines = (await reader.readuntil(b"\r\n\r\n")).split(b"\r\n")
+    length, retry_after = 0, 0.0
+    for line in lines:
+        name = line[:15].lower()
+        if name == b"content-length:":
+            length = int(line[15:])
+        elif name[:12] == b"retry-after:":
+            retry_after = float(line[12:])
+    await reader.readexactly(length)
+    return int(status_line.split()[1]), retry_after
+
+
+async def run_scenario(base_url, path, bodies, concurrency, duration, offset=0):
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    payloads = []
+    for body in bodies:
+        data = json.dumps(body).encode()
+        head = (
+            f"POST {path} HTTP/1.1\r\nHost: {url.netloc}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n"
+        ).encode()
+        payloads.append((head, data))
+
+    latencies, errors = [], 0
+    stop = time.perf_counter() + duration
+
+    async def worker(i):
+        nonlocal errors
+        k = offset + i
+        connection = None
+        while time.perf_counter() < stop:
+            head, data = payloads[k % len(payloads)]
+            k += concurrency
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(host, port)
+                status, retry_after = await _post(*connection, head, data)
+                ok = status == 200
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                ok, retry_after = False, 0.0
+                if connection is not None:
+                    connection[1].close()
+                connection = None
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+                if retry_after:
+                    # back off (with jitter) like a well-behaved client
+                    # instead of hammering an overloaded server
+                    pause = retry_after * random.uniform(0.5, 1.5)
+                    await asyncio.sleep(min(pause, max(stop - time.perf_counter(), 0)))
+        if connection is not None:
+            connection[1].close()
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(task):
+    return asyncio.run(run_scenario(*task))
+
+
+# Split the concurrency over `clients` processes so the (Python) load
+# generator is not the bottleneck; returns merged latencies, errors, elapsed
+def run_clients(pool, clients, base_url, path, bodies, concurrency, duration):
+    per_client = [concurrency // clients + (i < concurrency % clients) for i in range(clients)]
+    tasks = [
+        (base_url, path, bodies, n, duration, i * len(bodies) // clients)
+        for i, n in enumerate(per_client) if n
+    ]
+    started = time.perf_counter()
+    latencies, errors = [], 0
+    for lat, err in pool.map(client_process, tasks):
+        latencies.extend(lat)
+        errors += err
+    return latencies, errors, time.perf_counter() - started
+
+
+# Throughput and latency count successful requests only, so 503s from
+# admission control show up as errors rather than as fast responses
+def summarize(latencies, errors, elapsed, rows_per_request, cpu) -> Dict[str, Any]:
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    total = len(latencies) + errors
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "rps": len(latencies) / elapsed,
+        "rows_per_s": len(latencies) * rows_per_request / elapsed,
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "cpu": cpu,
+    }
+
+
+def drive(base_url, server_pid, args) -> Dict[str, Any]:
+    import httpx
+
+    payloads = make_payloads(args.distinct)
+    scenarios = [("predict", "/predict", payloads, 1)]
+    if args.batch_size > 0:
+        batches = [
+            [payloads[(i * args.batch_size + j) % len(payloads)] for j in range(args.batch_size)]
+            for i in range(max(1, args.distinct // args.batch_size))
+        ]
+        scenarios.append((f"predict_batch_{args.batch_size}", "/predict_batch", batches, args.batch_size))
+
+    async def ready():
+        async with httpx.AsyncClient(base_url=base_url, timeout=5.0) as client:
+            await wait_ready(client)
+
+    asyncio.run(ready())
+    pids = worker_pids(server_pid) if server_pid else []
+    levels = args.concurrency
+    results = {}
+    with ProcessPoolExecutor(max_workers=max(1, args.clients)) as pool:
+        for (base_name, path, bodies, rows), concurrency in (
+            (scenario, c) for scenario in scenarios for c in levels
+        ):
+            # With several levels each scenario is reported per level
+            name = f"{base_name}@{concurrency}" if len(levels) > 1 else base_name
+            clients = max(1, min(args.clients, concurrency))
+            if args.warmup:
+                run_clients(pool, clients, base_url, path, bodies, concurrency, args.warmup)
+            before = {p: _cpu_seconds(p) for p in pids}
+            latencies, errors, elapsed = run_clients(
+                pool, clients, base_url, path, bodies, concurrency, args.duration
+            )
+            cpu = {}
+            for p in pids:
+                after = _cpu_seconds(p)
+                if after is not None and before[p] is not None:
+                    cpu[str(p)] = {"seconds": after - before[p], "percent": 100 * (after - before[p]) / elapsed}
+            results[name] = summarize(latencies, errors, elapsed, rows, cpu)
+            results[name]["pss_mb"] = {str(p): _pss_mb(p) for p in pids}
+            r = results[name]
+            print(
+                f"{name:>25}: {r['rps']:8.0f} req/s  p50 {r['p50_ms']:7.2f} ms  "
+                f"p95 {r['p95_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms  errors {r['error_rate']:.0%}  "
+                f"cpu {sum(c['percent'] for c in cpu.values()):.0f}%  "
+                f"pss {sum(m or 0 for m in results[name]['pss_mb'].values()):.0f} MB"
+            )
+    return results
+
+
+# Regressions of `current` against `baseline` beyond `threshold` (a fraction)
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    failures = []
+    for name, base in baseline.get("scenarios", {}).items():
+        cur = current.get("scenarios", {}).get(name)
+        if cur is None:
+            failures.append(f"{name}: missing from this run")
+            continue
+        for metric, worse in COMPARED_METRICS.items():
+            if not base.get(metric):
+                continue
+            change = (cur[metric] - base[metric]) / base[metric]
+            if change * worse > threshold:
+                failures.append(
+                    f"{name}: {metric} {base[metric]:.2f} -> {cur[metric]:.2f} ({change:+.0%})"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prediction API load test")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[32],
+                        help="concurrent connections; a comma-separated list runs each level")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--preload", action="store_true",
+                        help="start through serve.py (preloaded model, shared cache) instead of uvicorn")
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="load generator processes")
+    parser.add_argument("--batch-size", type=int, default=100, help="rows per /predict_batch call (0 skips)")
+    parser.add_argument("--distinct", type=int, default=10000, help="distinct trips (repeats hit the cache)")
+    parser.add_argument("--dynamo-latency-ms", type=float, default=0.0)
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = None
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    if args.url:
+        base_url = args.url
+    else:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(port, args.workers, {
+            "MODEL_POLL_INTERVAL": "0",
+            "MODEL_CACHE_DIR": os.path.join(workdir, "model_cache"),
+            "PREDICTION_LOG_FILE": os.path.join(workdir, "prediction_logs.jsonl"),
+            "LOADTEST_DYNAMO_LATENCY_MS": str(args.dynamo_latency_ms),
+        }, preload=args.preload)
+    try:
+        scenarios = drive(base_url, server.pid if server else None, args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "scenarios": scenarios,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = compare(results, baseline, args.threshold)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
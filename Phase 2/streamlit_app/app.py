@@ -1,27 +1,79 @@
+import os
+import sys
+from datetime import date, timedelta
+
 import streamlit as st
 import pandas as pd
-import json
 
-# Path to shared logs directory
-log_file = "/home/ubuntu/logs/prediction_logs.json"
+from logtail import LogTail
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from compact import read_predictions
+
+# Path to shared logs directory (JSON lines, one prediction per line)
+log_file = os.getenv("PREDICTION_LOG_FILE", "/home/ubuntu/logs/prediction_logs.jsonl")
+# Compacted, date-partitioned history (written by `python compact.py`)
+parquet_dir = os.getenv("PREDICTION_PARQUET_DIR", "/home/ubuntu/logs/parquet")
+PAGE_SIZE = 100
 
 st.title("Taxi Fare / ETA Prediction Logs")
 
-try:
-    with open(log_file, "r") as f:
-        logs = json.load(f)
-    df = pd.json_normalize(logs)
-    
-    st.subheader("All Predictions")
-    st.dataframe(df)
 
-    st.subheader("Prediction Statistics")
-    st.write(df['prediction'].describe())
+# Only the partitions in the date range (and row groups for the alias) are read
+@st.cache_data(ttl=300)
+def load_history(start, end, model_alias):
+    return read_predictions(
+        parquet_dir, start=start.isoformat(), end=end.isoformat(),
+        model_alias=model_alias or None, columns=["timestamp", "prediction", "model_alias"],
+    )
+
+
+if os.path.isdir(parquet_dir):
+    st.subheader("Prediction History")
+    start = st.date_input("From", value=date.today() - timedelta(days=7))
+    end = st.date_input("To", value=date.today())
+    alias = st.text_input("Model alias (blank for all)")
+    history = load_history(start, end, alias)
+    if len(history):
+        daily = history.set_index("timestamp")["prediction"].resample("1D").agg(["count", "mean"])
+        st.line_chart(daily)
+    st.caption(f"{len(history):,} predictions")
+
+
+# One tail per log file, shared by every session and rerun; each rerun only
+# reads the lines appended since the previous one
+@st.cache_resource
+def get_tail(path):
+    return LogTail(path)
 
-    # filter by user_id
-    user_ids = df['user_id'].unique()
-    selected_user = st.selectbox("Filter by User ID", options=user_ids)
-    st.dataframe(df[df['user_id'] == selected_user])
 
-except FileNotFoundError:
+tail = get_tail(log_file)
+tail.poll()
+
+if not tail.count:
     st.warning("No prediction logs found yet.")
+    st.stop()
+
+st.subheader("Prediction Statistics")
+stats = tail.stats()
+st.write(pd.Series(stats, name="prediction"))
+
+
+def show_page(user=None, key="all"):
+    total = tail.num_rows(user)
+    pages = max((total + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+    page = st.number_input(
+        f"Page (1-{pages}, newest first)", min_value=1, max_value=pages, value=1, key=f"page-{key}"
+    )
+    st.dataframe(tail.page(page - 1, PAGE_SIZE, user=user))
+    st.caption(f"{total:,} rows")
+
+
+st.subheader("All Predictions")
+show_page()
+
+# filter by user_id
+st.subheader("Predictions by User")
+st.bar_chart(pd.Series(dict(tail.top_users(20)), name="predictions"))
+selected_user = st.selectbox("Filter by User ID", options=tail.users())
+show_page(selected_user, key="user")
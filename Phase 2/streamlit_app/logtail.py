@@ -0,0 +1,188 @@
+import io
+import os
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+# np.quantile's default (linear) interpolation, read straight from an
+# already sorted array instead of sorting it again
+def sorted_quantile(values: np.ndarray, q: float) -> float:
+    pos = q * (len(values) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return float(values[lo] + (values[hi] - values[lo]) * (pos - lo))
+
+
+# Incrementally loads a JSON-lines prediction log.
+#
+# Each poll() reads only the bytes appended since the previous poll (whole
+# lines only) and parses them into one DataFrame chunk; chunks are kept as-is
+# rather than re-concatenated. Running statistics are updated from each new
+# chunk: count/sum for the mean, a sorted copy of the predictions for exact
+# quantiles, per-user counts, and per-user row positions for filtering.
+# The file handle stays open across polls, so when the writer rotates the log
+# the rest of the old file is still read before switching to the new one.
+class LogTail:
+    def __init__(self, path: str, max_read_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_read_bytes = max_read_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._inode = None
+        self._partial = b""
+
+        self.chunks: List[pd.DataFrame] = []
+        self._starts: List[int] = []  # row position of each chunk's first row
+        self.count = 0
+        self._sum = 0.0
+        self._sorted = np.empty(0)
+        self.user_counts: Counter = Counter()
+        self._user_rows: Dict[str, List[np.ndarray]] = {}
+        self.bad_lines = 0
+        self.rotations = 0
+
+    def _open(self) -> bool:
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = b""
+        return True
+
+    # The log was rotated (renamed) or truncated since we opened it
+    def _replaced(self) -> bool:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return st.st_ino != self._inode or st.st_size < self._file.tell()
+
+    def _read_new(self) -> bytes:
+        data = self._file.read(self.max_read_bytes)
+        if not data:
+            return b""
+        data = self._partial + data
+        end = data.rfind(b"\n") + 1
+        self._partial = data[end:]
+        return data[:end]
+
+    # Read and index everything appended since the last poll; returns rows added
+    def poll(self) -> int:
+        with self._lock:
+            if self._file is None and not self._open():
+                return 0
+            added = 0
+            while True:
+                data = self._read_new()
+                if data:
+                    added += self._ingest(data)
+                    continue
+                if not self._replaced():
+                    break
+                self._file.close()
+                self.rotations += 1
+                if not self._open():
+                    self._file = None
+                    break
+            return added
+
+    def _parse(self, data: bytes) -> pd.DataFrame:
+        try:
+            return pd.read_json(io.BytesIO(data), lines=True, dtype=False)
+        except ValueError:
+            # a corrupt line (e.g. a torn write): parse line by line, skip it
+            frames = []
+            for line in data.splitlines():
+                try:
+                    frames.append(pd.read_json(io.BytesIO(line), lines=True, dtype=False))
+                except ValueError:
+                    self.bad_lines += 1
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _ingest(self, data: bytes) -> int:
+        chunk = self._parse(data)
+        n = len(chunk)
+        if n == 0:
+            return 0
+        start = self.count
+        chunk.index = pd.RangeIndex(start, start + n)
+        self.chunks.append(chunk)
+        self._starts.append(start)
+        self.count += n
+
+        if "prediction" in chunk:
+            values = pd.to_numeric(chunk["prediction"], errors="coerce").to_numpy(dtype=np.float64)
+            values = np.sort(values[np.isfinite(values)])
+            self._sum += float(values.sum())
+            self._sorted = np.insert(self._sorted, np.searchsorted(self._sorted, values), values)
+        if "user_id" in chunk:
+            for user, rows in chunk.groupby("user_id", sort=False).indices.items():
+                self.user_counts[user] += len(rows)
+                self._user_rows.setdefault(user, []).append(rows + start)
+        return n
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            values = self._sorted
+            n = len(values)
+            out = {"count": self.count, "predictions": n}
+            if n:
+                out["mean"] = self._sum / n
+                out["min"] = float(values[0])
+                out["max"] = float(values[-1])
+                for q in QUANTILES:
+                    out[f"p{int(q * 100)}"] = sorted_quantile(values, q)
+            return out
+
+    # (user, count) pairs, most active first
+    def top_users(self, n: Optional[int] = None) -> List[tuple]:
+        with self._lock:
+            return self.user_counts.most_common(n)
+
+    def users(self) -> List[str]:
+        return [user for user, _ in self.top_users()]
+
+    # Row positions, optionally restricted to one user
+    def _positions(self, user: Optional[str]) -> Optional[np.ndarray]:
+        if user is None:
+            return None
+        parts = self._user_rows.get(user, [])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def num_rows(self, user: Optional[str] = None) -> int:
+        with self._lock:
+            return self.count if user is None else self.user_counts.get(user, 0)
+
+    # One page of rows (newest first), without materialising the whole log
+    def page(self, page: int, page_size: int = 100, user: Optional[str] = None) -> pd.DataFrame:
+        with self._lock:
+            positions = self._positions(user)
+            total = self.count if positions is None else len(positions)
+            stop = max(total - page * page_size, 0)
+            start = max(stop - page_size, 0)
+            if positions is None:
+                wanted = np.arange(start, stop)
+            else:
+                wanted = positions[start:stop]
+            if len(wanted) == 0:
+                return pd.DataFrame()
+
+            which = np.searchsorted(self._starts, wanted, side="right") - 1
+            parts = [
+                self.chunks[c].loc[wanted[which == c]]
+                for c in np.unique(which)
+            ]
+            return pd.concat(parts).iloc[::-1]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
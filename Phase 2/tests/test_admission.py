@@ -0,0 +1,140 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected
+
+
+def test_waiters_get_slots_in_order():
+    controller = AdmissionController(limit=2, adaptive=False)
+    order = []
+
+    async def request(name):
+        await controller.acquire()
+        order.append(name)
+        await asyncio.sleep(0.01)
+        controller.release(0.01)
+
+    async def run():
+        await asyncio.gather(*(request(i) for i in range(5)))
+
+    asyncio.run(run())
+    assert order == [0, 1, 2, 3, 4]
+    assert controller.in_flight == 0 and controller.admitted == 5 and controller.rejected == 0
+
+
+def test_rejects_early_when_the_wait_would_miss_the_deadline():
+    controller = AdmissionController(limit=1, queue_timeout=0.5, adaptive=False)
+    controller.service_time = 2.0
+
+    async def run():
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected) as e:
+            await controller.acquire()
+        return e.value
+
+    rejected = asyncio.run(run())
+    assert rejected.retry_after == 2
+    assert controller.queued == 0 and controller.rejected == 1 and controller.timed_out == 0
+
+
+def test_queue_timeout_rejects_and_backs_off():
+    controller = AdmissionController(limit=10, queue_timeout=0.02, target_latency=0.01)
+
+    async def run():
+        for _ in range(10):
+            await controller.acquire()
+        assert controller.shedding
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire()
+
+    asyncio.run(run())
+    assert controller.timed_out == 1 and controller.queued == 0
+    assert controller.limit == 9.0
+
+
+def test_limit_grows_while_saturated_and_fast():
+    controller = AdmissionController(limit=4, max_limit=5, target_latency=1.0)
+
+    async def run():
+        for _ in range(40):
+            for _ in range(int(controller.limit)):
+                await controller.acquire()
+            for _ in range(int(controller.limit)):
+                controller.release(0.001)
+
+    asyncio.run(run())
+    assert controller.limit == 5.0
+    controller.release(2.0)  # one slow request
+    assert controller.limit == 4.5
+
+
+def test_middleware_answers_503_with_retry_after():
+    controller = AdmissionController(limit=1, queue_timeout=0.01, adaptive=False)
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def run():
+        transport = httpx.ASGITransport(app=AdmissionMiddleware(app, controller, paths=["/predict"]))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.ensure_future(client.post("/predict"))
+            await asyncio.sleep(0.01)
+            second = await client.post("/predict")
+            release.set()
+            return await first, second
+
+    first, second = asyncio.run(run())
+    assert first.status_code == 200
+    assert second.status_code == 503 and second.headers["retry-after"] == "1"
+    assert controller.in_flight == 0
+
+
+def test_sheds_logging_and_cache_writes_under_pressure(monkeypatch):
+    import main
+    from cache import LRUTTLCache, PredictionCache
+
+    class FakeModel:
+        def predict(self, X):
+            return X[:, 0] * 2.0  # passenger_count
+
+    class Remote:
+        writes = 0
+
+        async def aget(self, key):
+            return None
+
+        def put(self, key, value):
+            Remote.writes += 1
+
+    logged = []
+    controller = AdmissionController(limit=10)
+    monkeypatch.setattr(main, "ACTIVE", None)
+    monkeypatch.setattr(main, "INVERSE_LOG_TARGET", False)
+    monkeypatch.setattr(main, "ADMISSION", controller)
+    monkeypatch.setattr(main, "CACHE", PredictionCache(LRUTTLCache(), Remote()))
+    monkeypatch.setattr(main.LOG_WRITER, "write_many", lambda rows: logged.extend(rows))
+    monkeypatch.setattr(main.DYNAMO_WRITER, "submit_many", lambda items: logged.extend(items))
+    main.set_model(FakeModel())
+
+    client = TestClient(main.app)
+    payload = {
+        "pickup_lat": 40.7, "pickup_lon": -73.9, "dropoff_lat": 40.8, "dropoff_lon": -73.95,
+        "passenger_count": 3, "trip_distance": 2.5,
+    }
+    assert client.get("/health").json()["status"] == "ok"
+
+    controller.in_flight = 9  # 9 requests held elsewhere, this one makes 10
+    res = client.post("/predict", json=payload)
+    assert res.status_code == 200 and res.json()["prediction"] == 6.0
+    assert logged == [] and Remote.writes == 0
+    assert controller.stats()["shed"] == {"cache_write": 1, "prediction_log": 1}
+
+    health = client.get("/health").json()
+    assert health["status"] == "overloaded"
+    assert health["load"]["in_flight"] == 9 and health["load"]["shedding"]
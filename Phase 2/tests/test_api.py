@@ -1,14 +1,38 @@
+import pytest
 from fastapi.testclient import TestClient
 from main import app
+from cache import LRUTTLCache, PredictionCache
 
 client = TestClient(app)
 
+# Stub model (prediction = 2 x passenger_count), an in-process cache and a
+# capture of the logged predictions instead of the real sinks
+@pytest.fixture
+def logged(monkeypatch):
+    import main
+
+    class FakeModel:
+        def predict(self, X):
+            return X[:, 0] * 2.0  # passenger_count
+
+    logged = {}
+    def fake_log_predictions(reqs, predictions):
+        logged["reqs"] = reqs
+        logged["predictions"] = predictions
+
+    monkeypatch.setattr(main, "ACTIVE", None)
+    monkeypatch.setattr(main, "INVERSE_LOG_TARGET", False)
+    main.set_model(FakeModel())
+    monkeypatch.setattr(main, "log_predictions", fake_log_predictions)
+    monkeypatch.setattr(main, "CACHE", PredictionCache(LRUTTLCache()))
+    return logged
+
 def test_health():
     res = client.get("/health")
     assert res.status_code == 200
     assert "status" in res.json()
 
-def test_predict():
+def test_predict(logged):
     payload = {
         "pickup_lat": 40.7,
         "pickup_lon": -73.9,
@@ -20,4 +44,33 @@ def test_predict():
     }
     res = client.post("/predict", json=payload)
     assert res.status_code == 200
-    assert "prediction" in res.json()
+    assert res.json()["prediction"] == 2.0
+    assert logged["predictions"] == [2.0]
+
+def test_predict_batch(logged):
+    good = {
+        "pickup_lat": 40.7,
+        "pickup_lon": -73.9,
+        "dropoff_lat": 40.8,
+        "dropoff_lon": -73.95,
+        "passenger_count": 1,
+        "trip_distance": 2.5
+    }
+    bad = dict(good, passenger_count="many")
+    res = client.post("/predict_batch", json=[good, bad, dict(good, passenger_count=4)])
+    assert res.status_code == 200
+    body = res.json()
+    assert body["count"] == 3
+    assert body["errors"] == 1
+    results = body["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["prediction"] == 2.0
+    assert "errors" in results[1]
+    assert results[2]["prediction"] == 8.0
+    # one bulk log call for the valid rows only
+    assert logged["predictions"] == [2.0, 8.0]
+    assert not results[0]["cached"]
+
+    # the same trips are now served from the cache
+    res = client.post("/predict_batch", json=[good])
+    assert res.json()["results"][0] == {"index": 0, "prediction": 2.0, "cached": True}
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from batcher import BatcherOverloaded, MicroBatcher
+
+
+class RecordingScorer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, model, X):
+        self.calls.append(X.shape[0])
+        return X.sum(axis=1)
+
+
+def test_concurrent_rows_share_one_predict():
+    scorer = RecordingScorer()
+
+    async def run():
+        batcher = MicroBatcher(scorer, window_ms=20, max_batch=64)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit(None, [i, 1.0]) for i in range(10)))
+        await batcher.stop()
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert results == [i + 1.0 for i in range(10)]
+    assert scorer.calls == [10]
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["rows"] == 10
+    assert stats["batch_size_histogram"]["<=16"] == 1
+
+
+def test_max_batch_splits_groups():
+    scorer = RecordingScorer()
+
+    async def run():
+        batcher = MicroBatcher(scorer, window_ms=50, max_batch=4)
+        await batcher.start()
+        await asyncio.gather(*(batcher.submit(None, [1.0]) for i in range(10)))
+        await batcher.stop()
+
+    asyncio.run(run())
+    assert scorer.calls == [4, 4, 2]
+
+
+def test_queue_full_is_rejected():
+    async def run():
+        batcher = MicroBatcher(RecordingScorer(), window_ms=50, max_queue=2)
+        await batcher.start()
+        tasks = [asyncio.ensure_future(batcher.submit(None, [1.0])) for _ in range(3)]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        await batcher.stop()
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert sum(isinstance(r, BatcherOverloaded) for r in results) == 1
+    assert batcher.stats()["rejected"] == 1
+
+
+# Rows the collector has already taken off the queue fail at shutdown too
+def test_stop_fails_rows_being_collected():
+    scorer = RecordingScorer()
+
+    async def run():
+        batcher = MicroBatcher(scorer, window_ms=10_000, max_batch=64)
+        await batcher.start()
+        tasks = [asyncio.ensure_future(batcher.submit(None, [1.0])) for _ in range(3)]
+        await asyncio.sleep(0.05)  # collector is waiting out its window
+        assert batcher.stats()["queue_depth"] == 0
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 1.0)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, BatcherOverloaded) for r in results)
+    assert scorer.calls == []
+
+
+def test_errors_propagate_to_every_caller():
+    def broken(model, X):
+        raise ValueError("bad model")
+
+    async def run():
+        batcher = MicroBatcher(broken, window_ms=5)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit(None, [1.0]) for _ in range(3)), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(run()))
+
+
+def test_rows_are_scored_with_their_own_model():
+    calls = []
+
+    def score(model, X):
+        calls.append((model, X.shape[0]))
+        return X.sum(axis=1) * model
+
+    async def run():
+        batcher = MicroBatcher(score, window_ms=20)
+        await batcher.start()
+        # a reload between rows of the same window: each keeps its model
+        results = await asyncio.gather(*(batcher.submit(10 if i % 2 else 1, [i]) for i in range(6)))
+        await batcher.stop()
+        return results
+
+    assert asyncio.run(run()) == [0, 10, 2, 30, 4, 50]
+    assert calls == [(1, 3), (10, 3)]
+
+
+@pytest.mark.parametrize("window_ms", [0, 1])
+def test_single_row_latency_bounded_by_window(window_ms):
+    async def run():
+        batcher = MicroBatcher(RecordingScorer(), window_ms=window_ms)
+        await batcher.start()
+        value = await asyncio.wait_for(batcher.submit(None, [2.0, 3.0]), timeout=1)
+        await batcher.stop()
+        return value
+
+    assert asyncio.run(run()) == 5.0
@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+import asyncio
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from cache import DynamoCacheTier, LRUTTLCache, PredictionCache, SharedMemoryCache, cache_key, hash_request
+from dummy_dynamo import DummyDynamo
+
+
+def test_hash_request_consistent():
+    req = {"a": 1, "list": [1, 2, 3], "nested": {"b": "c"}}
+    assert hash_request(req) == hash_request(dict(reversed(list(req.items()))))
+
+
+def test_cache_key_grid_snapping():
+    a = {"pickup_lat": 40.75012, "pickup_lon": -73.99004, "passenger_count": 1}
+    b = {"pickup_lat": 40.75039, "pickup_lon": -73.98981, "passenger_count": 1}
+    assert cache_key(a) != cache_key(b)
+    assert cache_key(a, grid=0.001) == cache_key(b, grid=0.001)
+    # passenger_count is never snapped and the namespace separates models
+    assert cache_key(a, grid=0.001) != cache_key(dict(b, passenger_count=2), grid=0.001)
+    assert cache_key(a, namespace="v1") != cache_key(a, namespace="v2")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache(max_entries=2)
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    assert cache.get("a") == 1.0
+    cache.put("c", 3.0)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1.0
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_lru_memory_bound_and_ttl():
+    cache = LRUTTLCache(max_bytes=1000, ttl=0.05)
+    for i in range(50):
+        cache.put(f"key-{i}", float(i))
+    assert cache.bytes <= 1000
+    assert 0 < len(cache) < 50
+    time.sleep(0.06)
+    assert cache.get("key-49") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_two_tier_cache_promotes_remote_hits():
+    dummy = DummyDynamo()
+    table = dummy.Table("fare_cache")
+    remote = DynamoCacheTier("fare_cache", lambda: dummy)
+    cache = PredictionCache(LRUTTLCache(), remote)
+
+    assert asyncio.run(cache.aget("k")) is None
+    cache.put("k", 9.99)
+    remote.close()  # drain the write-behind queue
+    assert table.store["k"]["prediction"] == Decimal("9.99")
+
+    # a fresh local tier (e.g. another worker) finds it in DynamoDB once
+    cache = PredictionCache(LRUTTLCache(), remote)
+    assert asyncio.run(cache.aget_many(["k", "other"])) == {"k": 9.99}
+    gets = table.gets
+    assert asyncio.run(cache.aget("k")) == 9.99
+    assert table.gets == gets
+    assert remote.stats()["hits"] == 1
+
+
+# A throttled table leaves keys unprocessed: they are retried with capped
+# backoff, then reported as misses instead of spinning
+def test_unprocessed_keys_back_off_then_miss(monkeypatch):
+    class ThrottledDynamo(DummyDynamo):
+        calls = 0
+
+        def batch_get_item(self, RequestItems):
+            self.calls += 1
+            keys = RequestItems["fare_cache"]["Keys"]
+            if self.calls == 1:  # first key served, the rest throttled
+                response = super().batch_get_item({"fare_cache": {"Keys": keys[:1]}})
+                return {**response, "UnprocessedKeys": {"fare_cache": {"Keys": keys[1:]}}}
+            return {"Responses": {"fare_cache": []}, "UnprocessedKeys": RequestItems}
+
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    dummy = ThrottledDynamo()
+    dummy.Table("fare_cache").store["a"] = {"request_hash": "a", "prediction": Decimal("1.5")}
+    remote = DynamoCacheTier("fare_cache", lambda: dummy, max_retries=3, base_backoff=0.01, max_backoff=0.02)
+
+    assert remote._get_many(["a", "b", "c"]) == {"a": 1.5}
+    assert dummy.calls == 4
+    assert len(sleeps) == 3 and all(0 < d <= 0.02 for d in sleeps)
+    assert remote.stats()["unprocessed"] == 2 and remote.stats()["misses"] == 2
+    remote.close()
+
+
+def test_async_lookups_run_off_the_event_loop():
+    dummy = DummyDynamo()
+    table = dummy.Table("fare_cache")
+    table.store["k"] = {"request_hash": "k", "prediction": Decimal("3.5")}
+    remote = DynamoCacheTier("fare_cache", lambda: dummy, max_concurrency=2)
+    cache = PredictionCache(LRUTTLCache(), remote)
+
+    async def lookups():
+        return await cache.aget("k"), await cache.aget_many(["k", "other"])
+
+    assert asyncio.run(lookups()) == (3.5, {"k": 3.5})
+    assert table.gets == 2  # "k" was promoted, only "other" went remote again
+    remote.close()
+
+
+def test_shared_memory_cache_get_put_and_ttl():
+    cache = SharedMemoryCache(slots=64, ttl=0.05)
+    try:
+        key = cache_key({"a": 1})
+        assert cache.get(key) is None
+        cache.put(key, 12.5)
+        assert cache.get(key) == 12.5
+        assert len(cache) == 1
+        time.sleep(0.06)
+        assert cache.get(key) is None
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 2 and stats["expirations"] == 1
+        assert set(LRUTTLCache().stats()) <= set(stats)
+    finally:
+        cache.close()
+
+
+def test_shared_memory_cache_overwrites_colliding_slot():
+    cache = SharedMemoryCache(slots=1)
+    try:
+        a, b = cache_key({"a": 1}), cache_key({"a": 2})
+        cache.put(a, 1.0)
+        cache.put(b, 2.0)
+        assert cache.get(a) is None
+        assert cache.get(b) == 2.0
+        assert cache.evictions == 1
+    finally:
+        cache.close()
+
+
+def test_shared_memory_cache_rejects_torn_slot():
+    cache = SharedMemoryCache(slots=1)
+    try:
+        key = cache_key({"a": 1})
+        cache.put(key, 1.0)
+        cache._buf[8] ^= 0xFF  # value bytes changed without the CRC
+        assert cache.get(key) is None
+    finally:
+        cache.close()
+
+
+def test_shared_memory_cache_is_shared_with_forked_workers():
+    cache = SharedMemoryCache(slots=1024)
+    try:
+        key = cache_key({"a": 1})
+        pid = os.fork()
+        if pid == 0:
+            cache.put(key, 7.0)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert cache.get(key) == 7.0
+    finally:
+        cache.close()
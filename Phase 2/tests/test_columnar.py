@@ -0,0 +1,143 @@
+import numpy as np
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+import columnar
+
+TZ = "America/New_York"
+
+
+def arrow_body(**columns):
+    batch = pa.record_batch(list(columns.values()), names=list(columns))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def trips(n=3):
+    return {
+        "pickup_lat": pa.array([40.7] * n, pa.float32()),
+        "pickup_lon": pa.array([-73.9] * n, pa.float32()),
+        "dropoff_lat": pa.array([40.8] * n, pa.float32()),
+        "dropoff_lon": pa.array([-73.95] * n, pa.float32()),
+        "passenger_count": pa.array(range(1, n + 1), pa.int8()),
+        "trip_distance": pa.array([2.5] * n, pa.float32()),
+    }
+
+
+def test_negotiation():
+    assert columnar.media_type("application/vnd.apache.arrow.stream") == columnar.ARROW_STREAM
+    assert columnar.media_type("application/x-msgpack; charset=binary") == columnar.MSGPACK
+    assert columnar.media_type("application/json") is None
+    assert columnar.negotiate(None, columnar.MSGPACK) == columnar.MSGPACK
+    assert columnar.negotiate("*/*", columnar.ARROW_STREAM) == columnar.ARROW_STREAM
+    assert columnar.negotiate("text/html, application/json;q=0.9", columnar.ARROW_STREAM) == columnar.JSON
+    assert columnar.negotiate("application/vnd.msgpack", columnar.ARROW_STREAM) == columnar.MSGPACK
+
+
+def test_arrow_datetimes_are_nyc_local_time():
+    instant = np.datetime64("2024-05-06T12:30:00", "s")  # UTC, 08:30 in New York
+    body = arrow_body(**trips(1), pickup_datetime=pa.array(np.array([instant]), pa.timestamp("s", tz="UTC")))
+    assert columnar.decode(columnar.ARROW_STREAM, body, TZ)["pickup_datetime"][0] == np.datetime64("2024-05-06T08:30")
+
+    body = arrow_body(**trips(1), pickup_datetime=pa.array(np.array([instant]), pa.timestamp("ms")))  # naive = local
+    assert columnar.decode(columnar.ARROW_STREAM, body, TZ)["pickup_datetime"][0] == instant
+
+    body = arrow_body(**trips(1), pickup_datetime=pa.array([instant.astype(np.int64)], pa.int64()))
+    assert columnar.decode(columnar.ARROW_STREAM, body, TZ)["pickup_datetime"][0] == np.datetime64("2024-05-06T08:30")
+
+
+def test_decode_errors():
+    columns = trips(2)
+    del columns["trip_distance"]
+    with pytest.raises(ValueError, match="trip_distance"):
+        columnar.decode(columnar.ARROW_STREAM, arrow_body(**columns), TZ)
+    with pytest.raises(ValueError, match="numeric"):
+        columnar.decode(columnar.ARROW_STREAM, arrow_body(**dict(trips(2), pickup_lat=pa.array(["a", "b"]))), TZ)
+    with pytest.raises(ValueError):
+        columnar.decode(columnar.ARROW_STREAM, b"not arrow", TZ)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import main
+
+    class FakeModel:
+        def predict(self, X):
+            return X[:, 0] * 2.0  # passenger_count
+
+    logged = []
+    monkeypatch.setattr(main, "ACTIVE", None)
+    monkeypatch.setattr(main, "INVERSE_LOG_TARGET", False)
+    monkeypatch.setattr(main, "log_inputs", lambda inputs, predictions: logged.extend(zip(inputs, predictions)))
+    main.set_model(FakeModel())
+    client = TestClient(main.app)
+    client.logged = logged
+    return client
+
+
+def test_predict_batch_arrow(client):
+    columns = trips(3)
+    columns["pickup_lat"] = pa.array([40.7, None, 40.7], pa.float32())
+    res = client.post("/predict_batch", content=arrow_body(**columns),
+                      headers={"Content-Type": columnar.ARROW_STREAM})
+    assert res.status_code == 200
+    assert res.headers["content-type"] == columnar.ARROW_STREAM
+
+    table = pa.ipc.open_stream(res.content).read_all()
+    assert table.schema.field("prediction").type == pa.float32()
+    assert table.schema.metadata[b"count"] == b"3" and table.schema.metadata[b"errors"] == b"1"
+    prediction = table.column("prediction").to_numpy()
+    assert prediction[0] == 2.0 and np.isnan(prediction[1]) and prediction[2] == 6.0
+
+    # only rows with a prediction are logged, with the JSON path's fields
+    assert [(fields["passenger_count"], p) for fields, p in client.logged] == [(1, 2.0), (3, 6.0)]
+    assert client.logged[0][0]["user_id"] == "anonymous"
+
+    res = client.post("/predict_batch", content=arrow_body(**trips(2)),
+                      headers={"Content-Type": columnar.ARROW_STREAM, "Accept": "application/json"})
+    assert res.json()["predictions"] == [2.0, 4.0]
+
+    res = client.post("/predict_batch", content=b"nope", headers={"Content-Type": columnar.ARROW_STREAM})
+    assert res.status_code == 422
+
+
+# A null in a required column the model does not use still makes the row
+# invalid: no prediction, counted as an error and not logged
+def test_predict_batch_null_trip_distance(client):
+    columns = trips(3)
+    columns["trip_distance"] = pa.array([2.5, None, 2.5], pa.float32())
+    columns["passenger_count"] = pa.array([1, 2, None], pa.int8())
+    res = client.post("/predict_batch", content=arrow_body(**columns),
+                      headers={"Content-Type": columnar.ARROW_STREAM, "Accept": "application/json"})
+    assert res.status_code == 200
+    assert res.json()["predictions"] == [2.0, None, None]
+    assert res.json()["errors"] == 2
+    assert [(fields["passenger_count"], p) for fields, p in client.logged] == [(1, 2.0)]
+    assert client.logged[0][0]["trip_distance"] == 2.5
+
+
+def test_predict_batch_msgpack(client):
+    msgpack = pytest.importorskip("msgpack")
+    n = 4
+    body = msgpack.packb({
+        "pickup_lat": np.full(n, 40.7, "<f4").tobytes(),
+        "pickup_lon": np.full(n, -73.9, "<f4").tobytes(),
+        "dropoff_lat": np.full(n, 40.8, "<f4").tobytes(),
+        "dropoff_lon": np.full(n, -73.95, "<f4").tobytes(),
+        "passenger_count": np.arange(1, n + 1, dtype="<f4").tobytes(),
+        "trip_distance": [2.5] * n,
+        "pickup_datetime": np.full(n, 1714998600, "<i8").tobytes(),
+    })
+    res = client.post("/predict_batch", content=body, headers={"Content-Type": columnar.MSGPACK})
+    assert res.status_code == 200 and res.headers["content-type"] == columnar.MSGPACK
+    payload = msgpack.unpackb(res.content)
+    assert np.frombuffer(payload["prediction"], "<f4").tolist() == [2.0, 4.0, 6.0, 8.0]
+    assert payload["count"] == "4" and payload["errors"] == "0"
+    assert client.logged[0][0]["pickup_datetime"] == "2024-05-06T08:30:00"
+
+    res = client.post("/predict_batch", content=msgpack.packb({"pickup_lat": b"abc"}),
+                      headers={"Content-Type": columnar.MSGPACK})
+    assert res.status_code == 422
@@ -0,0 +1,199 @@
+import os
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pyarrow.parquet as pq
+
+from compact import Compactor, flatten, read_predictions
+
+
+def log_record(ts, prediction, alias="production", user="u1"):
+    return {
+        "timestamp": ts, "user_id": user,
+        "pickup_lat": 40.7, "pickup_lon": -73.9, "dropoff_lat": 40.8, "dropoff_lon": -73.95,
+        "passenger_count": 1, "trip_distance": 2.5,
+        "prediction": prediction, "model_alias": alias,
+    }
+
+
+def append(path, records):
+    with open(path, "a") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+
+
+def parts(root):
+    return sorted(
+        os.path.relpath(os.path.join(d, f), root)
+        for d, _, files in os.walk(root) for f in files if f.endswith(".parquet")
+    )
+
+
+def test_flatten_dynamo_item():
+    item = {
+        "request_id": "u1-1",
+        "timestamp": "2024-05-01T12:00:00",
+        "input": {"pickup_lat": Decimal("40.7"), "pickup_lon": Decimal("-73.9"),
+                  "dropoff_lat": Decimal("40.8"), "dropoff_lon": Decimal("-73.95"),
+                  "passenger_count": Decimal("2"), "trip_distance": Decimal("2.5"),
+                  "user_id": "u1"},
+        "prediction": Decimal("612.5"),
+        "model_alias": "production",
+    }
+    row = flatten(item)
+    assert row["pickup_lat"] == 40.7 and row["passenger_count"] == 2
+    assert row["prediction"] == 612.5 and row["user_id"] == "u1"
+    assert row["timestamp"].isoformat() == "2024-05-01T12:00:00+00:00"
+
+
+def test_incremental_compaction_and_pushdown(tmp_path):
+    log = str(tmp_path / "prediction_logs.jsonl")
+    root = str(tmp_path / "parquet")
+    append(log, [log_record("2024-05-01T23:59:00", 1.0), log_record("2024-05-02T00:01:00", 2.0)])
+
+    assert Compactor(root).compact_logs(log) == 2
+    first = parts(root)
+    assert first == ["date=2024-05-01/part-000001.parquet", "date=2024-05-02/part-000001.parquet"]
+    assert Compactor(root).compact_logs(log) == 0  # nothing new
+
+    # rotation: the old file is renamed, new lines go to a fresh file
+    append(log, [log_record("2024-05-02T08:00:00", 3.0, alias="staging")])
+    os.rename(log, str(tmp_path / "prediction_logs.2024-05-02.0.jsonl"))
+    append(log, [log_record("2024-05-03T08:00:00", 4.0)])
+    with open(log, "a") as f:
+        f.write('{"timestamp": "2024-05-03T09:')  # torn line, picked up next run
+    assert Compactor(root).compact_logs(log) == 2
+    assert set(first) < set(parts(root))  # earlier parts untouched
+
+    with open(log, "a") as f:
+        f.write('00:00", "prediction": 5.0, "model_alias": "production"}\n')
+    assert Compactor(root).compact_logs(log) == 1
+
+    df = read_predictions(root)
+    assert sorted(df["prediction"]) == [1.0, 2.0, 3.0, 4.0, 5.0]
+    df = read_predictions(root, start="2024-05-02", end="2024-05-02")
+    assert sorted(df["prediction"]) == [2.0, 3.0]
+    df = read_predictions(root, model_alias="staging", columns=["prediction"])
+    assert df["prediction"].tolist() == [3.0]
+    schema = pq.read_schema(os.path.join(root, first[0]))
+    assert schema.field("passenger_count").type == "int16"
+    assert str(schema.field("timestamp").type) == "timestamp[us, tz=UTC]"
+
+
+# A new file that got a rotated file's inode (and is already longer than
+# its saved offset) is read from the start
+def test_reused_inode_is_read_from_the_start(tmp_path):
+    log = str(tmp_path / "prediction_logs.jsonl")
+    root = str(tmp_path / "compacted")
+    append(log, [log_record("2024-05-01T08:00:00", 1.0)])
+    assert Compactor(root).compact_logs(log) == 1
+
+    os.remove(log)
+    append(log, [log_record("2024-05-02T08:00:00", p) for p in (2.0, 3.0, 4.0)])
+    compactor = Compactor(root)
+    saved = next(iter(compactor.state["files"].values()))
+    compactor.state["files"] = {str(os.stat(log).st_ino): saved}  # as if the inode were reused
+    assert compactor.compact_logs(log) == 3
+    assert sorted(read_predictions(root)["prediction"]) == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_uncommitted_parts_are_discarded(tmp_path):
+    log = str(tmp_path / "prediction_logs.jsonl")
+    root = str(tmp_path / "parquet")
+    append(log, [log_record("2024-05-01T10:00:00", 1.0)])
+    Compactor(root).compact_logs(log)
+
+    # a run that crashed after writing a part but before saving its state
+    orphan = os.path.join(root, "date=2024-05-01", "part-000002.parquet")
+    os.link(os.path.join(root, "date=2024-05-01", "part-000001.parquet"), orphan)
+    append(log, [log_record("2024-05-01T11:00:00", 2.0)])
+    assert Compactor(root).compact_logs(log) == 1
+    assert sorted(read_predictions(root)["prediction"]) == [1.0, 2.0]
+
+
+# Evaluates the boto3 conditions compact_dynamo builds
+def matches(condition, item):
+    expr = condition.get_expression()
+    op, values = expr["operator"], expr["values"]
+    if op == "AND":
+        return all(matches(v, item) for v in values)
+    value = item.get(values[0].name)
+    if op == "BETWEEN":
+        return values[1] <= value <= values[2]
+    return {"=": value == values[1], ">": value > values[1], "<=": value <= values[1]}[op]
+
+
+class LogTable:
+    def __init__(self, items):
+        self.items = items
+        self.scans = []
+        self.queries = []
+
+    def _page(self, items, kwargs):
+        start = kwargs.get("ExclusiveStartKey", 0)
+        out = {"Items": items[start:start + kwargs["Limit"]]}
+        if start + kwargs["Limit"] < len(items):
+            out["LastEvaluatedKey"] = start + kwargs["Limit"]
+        return out
+
+    def scan(self, **kwargs):
+        self.scans.append(kwargs)
+        return self._page([i for i in self.items if matches(kwargs["FilterExpression"], i)], kwargs)
+
+    def query(self, **kwargs):
+        self.queries.append(kwargs)
+        assert kwargs["IndexName"] == "by_date"
+        return self._page([i for i in self.items if matches(kwargs["KeyConditionExpression"], i)], kwargs)
+
+
+def dynamo_item(ts, prediction):
+    return {"request_id": f"r{prediction}", "timestamp": ts, "log_date": ts[:10],
+            "input": {"pickup_lat": Decimal("40.7"), "passenger_count": Decimal("1")},
+            "prediction": Decimal(str(prediction)), "model_alias": "production"}
+
+
+def test_compact_dynamo_holds_back_recent_items(tmp_path):
+    table = LogTable([dynamo_item("2024-05-01T10:00:00", 1), dynamo_item("2024-05-01T11:00:00", 2),
+                      dynamo_item("2024-05-01T11:10:00", 3)])
+    root = str(tmp_path / "parquet")
+    lag = 15 * 60
+    assert Compactor(root).compact_dynamo(table, page_size=2, lag=lag, now=datetime(2024, 5, 1, 11, 20)) == 2
+
+    # written late by the write-behind queue, but within the lag
+    table.items.append(dynamo_item("2024-05-01T11:12:00.500000", 4))
+    assert Compactor(root).compact_dynamo(table, lag=lag, now=datetime(2024, 5, 1, 11, 40)) == 2
+    assert Compactor(root).compact_dynamo(table, lag=lag, now=datetime(2024, 5, 1, 11, 45)) == 0
+    assert sorted(read_predictions(root)["prediction"]) == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_compact_dynamo_queries_date_buckets(tmp_path):
+    table = LogTable([dynamo_item("2024-05-01T10:00:00", 1), dynamo_item("2024-05-01T23:50:00", 2)])
+    root = str(tmp_path / "parquet")
+    compactor = Compactor(root)
+    assert compactor.compact_dynamo(table, lag=0, index="by_date", now=datetime(2024, 5, 1, 23, 55)) == 2
+    assert len(table.scans) == 1  # the first run has no window to query
+
+    table.items += [dynamo_item("2024-05-01T23:58:00", 3), dynamo_item("2024-05-02T00:10:00", 4)]
+    assert compactor.compact_dynamo(table, lag=0, index="by_date", now=datetime(2024, 5, 2, 0, 30)) == 2
+    assert len(table.scans) == 1
+    assert [q["KeyConditionExpression"].get_expression()["values"][0].get_expression()["values"][1]
+            for q in table.queries] == ["2024-05-01", "2024-05-02"]
+    assert sorted(read_predictions(root)["prediction"]) == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_compact_logs_reads_in_bounded_chunks(tmp_path):
+    log = str(tmp_path / "prediction_logs.jsonl")
+    root = str(tmp_path / "parquet")
+    append(log, [log_record(f"2024-05-01T10:{m:02d}:00", float(m)) for m in range(40)])
+    with open(log, "a") as f:
+        f.write('{"timestamp": "2024-05-01T11:')  # torn line
+
+    assert Compactor(root, chunk_bytes=1000).compact_logs(log) == 40
+    part = os.path.join(root, "date=2024-05-01", "part-000001.parquet")
+    assert pq.ParquetFile(part).num_row_groups > 5  # written as it was read
+    assert read_predictions(root)["prediction"].tolist() == [float(m) for m in range(40)]
+
+    with open(log, "a") as f:
+        f.write('00:00", "prediction": 40.0, "model_alias": "production"}\n')
+    assert Compactor(root, chunk_bytes=1000).compact_logs(log) == 1
@@ -0,0 +1,99 @@
+import os
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+import dynamo
+from dynamo import DynamoWriteBehind, to_dynamo
+from dummy_dynamo import DummyDynamo, client_error
+
+
+def dummy_table(fail_times=0):
+    dummy = DummyDynamo()
+    table = dummy.Table("taxi-predictions")
+    table.fail_times = fail_times
+    return dummy, table
+
+
+def test_to_dynamo_converts_floats():
+    item = to_dynamo({"prediction": 6.5, "input": {"lat": 40.7, "n": 1}, "xs": [1.5]})
+    assert item == {
+        "prediction": Decimal("6.5"),
+        "input": {"lat": Decimal("40.7"), "n": 1},
+        "xs": [Decimal("1.5")],
+    }
+
+
+def test_get_dynamodb_is_reused(monkeypatch):
+    created = []
+    import boto3
+
+    monkeypatch.setattr(boto3, "resource", lambda *a, **kw: created.append(kw) or object())
+    monkeypatch.setattr(dynamo, "_DYNAMODB", None)
+    first = dynamo.get_dynamodb()
+    assert dynamo.get_dynamodb() is first
+    assert len(created) == 1
+    assert created[0]["config"].max_pool_connections >= 10
+
+
+def test_write_behind_drains_in_batches():
+    dummy, table = dummy_table()
+    writer = DynamoWriteBehind("taxi-predictions", lambda: dummy, batch_size=10)
+    accepted = writer.submit_many({"request_id": f"r{i}", "prediction": 1.0} for i in range(25))
+    assert accepted == 25
+    writer.close()
+
+    assert len(table.store) == 25
+    assert table.store["r0"]["prediction"] == Decimal("1.0")
+    stats = writer.stats()
+    assert stats["written"] == 25
+    assert stats["queue_depth"] == 0
+    assert stats["batches"] >= 3
+
+
+def test_write_behind_retries_with_backoff():
+    dummy, table = dummy_table(fail_times=2)
+    writer = DynamoWriteBehind(
+        "taxi-predictions", lambda: dummy, base_backoff=0.001
+    )
+    writer.submit({"request_id": "r1", "prediction": 2.0})
+    writer.close()
+
+    assert "r1" in table.store
+    assert writer.stats()["retries"] == 2
+    assert writer.stats()["failed"] == 0
+
+
+def test_write_behind_counts_drops_and_failures(monkeypatch):
+    dummy, table = dummy_table(fail_times=100)
+    writer = DynamoWriteBehind(
+        "taxi-predictions", lambda: dummy,
+        max_queue=2, max_retries=1, base_backoff=0.001,
+    )
+    monkeypatch.setattr(writer, "start", lambda: None)  # nothing drains until close()
+    assert writer.submit_many({"request_id": f"r{i}"} for i in range(5)) == 2
+    assert writer.stats()["dropped"] == 3
+    writer.close()
+    assert writer.stats()["failed"] == 2
+    assert table.store == {}
+
+
+def test_retries_only_transient_errors():
+    assert dynamo.is_retryable(client_error("ThrottlingException"))
+    assert dynamo.is_retryable(client_error("InternalServerError", 500))
+    assert not dynamo.is_retryable(client_error("ValidationException"))
+    assert not dynamo.is_retryable(TypeError("Infinity and NaN not supported"))
+
+
+def test_write_behind_drops_only_the_invalid_item():
+    dummy, table = dummy_table()
+    table.invalid = {"r3"}
+    writer = DynamoWriteBehind("taxi-predictions", lambda: dummy, base_backoff=0.001)
+    writer.submit_many({"request_id": f"r{i}", "prediction": 1.0} for i in range(10))
+    writer.close()
+
+    assert sorted(table.store) == sorted(f"r{i}" for i in range(10) if i != 3)
+    stats = writer.stats()
+    assert stats["written"] == 9 and stats["rejected"] == 1
+    assert stats["retries"] == 0 and stats["failed"] == 0
@@ -11,3 +11,39 @@ def test_schema_creation():
     )
     assert req.passenger_count == 1
     assert req.pickup_lat == 40.7
+
+
+def test_vectorized_featurizer_matches_scalar():
+    import numpy as np
+    from features import FEATURE_COLUMNS, featurize, featurize_columns
+
+    rng = np.random.default_rng(0)
+    n = 200
+    times = np.datetime64("2016-01-01T00:00:00") + rng.integers(0, 366 * 86400, n).astype("timedelta64[s]")
+    plat = rng.uniform(40.6, 40.9, n)
+    plon = rng.uniform(-74.05, -73.75, n)
+    dlat = rng.uniform(40.6, 40.9, n)
+    dlon = rng.uniform(-74.05, -73.75, n)
+    pc = rng.integers(1, 7, n)
+    dist = rng.uniform(0.1, 20, n)
+
+    X = featurize_columns(times, plat, plon, dlat, dlon, pc, dist, columns=FEATURE_COLUMNS)
+    assert X.dtype == np.float32
+    assert X.flags["C_CONTIGUOUS"]
+    assert X.shape == (n, len(FEATURE_COLUMNS))
+    for i in range(n):
+        row = featurize(
+            times[i].item(), plat[i], plon[i], dlat[i], dlon[i], int(pc[i]), dist[i],
+            columns=FEATURE_COLUMNS,
+        )
+        np.testing.assert_allclose(X[i], row, rtol=1e-6, atol=1e-4)
+
+
+def test_featurizer_calendar_fields():
+    from features import featurize, featurize_columns
+
+    cols = ["pickup_hour", "pickup_dayofweek"]
+    # 2016-03-14 was a Monday
+    X = featurize_columns(["2016-03-14 17:24:55", "2016-03-20 00:05:00"], [0, 0], [0, 0], [0, 0], [0, 0], [1, 1], columns=cols)
+    assert X.tolist() == [[17.0, 0.0], [0.0, 6.0]]
+    assert featurize("2016-03-20 00:05:00", 0, 0, 0, 0, 1, columns=cols).tolist() == [0.0, 6.0]
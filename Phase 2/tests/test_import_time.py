@@ -0,0 +1,32 @@
+import os
+import re
+import json
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# Cold `import main` budget; override with IMPORT_TIME_BUDGET_MS on slow runners
+BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+
+# Only needed on specific code paths (model download/load, DynamoDB, training)
+DEFERRED = ["wandb", "boto3", "botocore", "joblib", "sklearn", "pandas", "matplotlib", "pyarrow"]
+
+
+def cold_import():
+    code = f"import sys, json, main; print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    # "import time: self [us] | cumulative | imported package"
+    total = next(
+        int(m.group(1)) for m in re.finditer(r"\|\s*(\d+) \|\s*main$", proc.stderr, re.M)
+    )
+    return total / 1000, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_main_import_is_lazy_and_within_budget():
+    millis, loaded = cold_import()
+    assert loaded == [], f"imported at module load: {loaded}"
+    assert millis < BUDGET_MS, f"import main took {millis:.0f} ms (budget {BUDGET_MS:.0f} ms)"
@@ -0,0 +1,116 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "Phase 1", "Model"))
+
+import ingest
+from features import featurize_frame
+from ingest import DTYPES, ZONE_IDS, ingest_csv, load_trips
+
+
+def write_trips(path, n=50):
+    rng = np.random.default_rng(0)
+    when = pd.Timestamp("2016-06-01") + pd.to_timedelta(rng.integers(0, 7 * 86400, n), unit="s")
+    pd.DataFrame({
+        "id": [f"id{i}" for i in range(n)],
+        "vendor_id": rng.integers(1, 3, n),
+        "pickup_datetime": when.strftime("%Y-%m-%d %H:%M:%S"),
+        "passenger_count": rng.integers(1, 6, n),
+        "pickup_longitude": rng.uniform(-74.05, -73.75, n).round(6),
+        "pickup_latitude": rng.uniform(40.6, 40.9, n).round(6),
+        "store_and_fwd_flag": np.where(np.arange(n) == n - 1, "Y", "N"),  # "Y" only in the last chunk
+        "PULocationID": rng.integers(1, 266, n),
+        "DOLocationID": rng.integers(1, 266, n),
+        "trip_distance": rng.uniform(0.1, 20, n).round(2),
+        "fare_amount": rng.uniform(2.5, 80, n).round(2),
+    }).to_csv(path, index=False)
+
+
+def test_compact_dtypes(tmp_path):
+    write_trips(tmp_path / "trips.csv")
+    df = load_trips(str(tmp_path / "trips.csv"))
+    assert df["PULocationID"].dtype == ZONE_IDS and df["DOLocationID"].dtype == ZONE_IDS
+    assert df["store_and_fwd_flag"].dtype == "category"
+    for name in ("pickup_longitude", "pickup_latitude", "trip_distance", "fare_amount"):
+        assert df[name].dtype == np.float32
+    assert df["passenger_count"].dtype == "UInt8" and df["vendor_id"].dtype == "UInt8"
+    assert pd.api.types.is_datetime64_dtype(df["pickup_datetime"])
+
+
+def test_chunked_ingest_matches_a_plain_read(tmp_path):
+    csv = str(tmp_path / "trips.csv")
+    write_trips(csv)
+    ingest_csv(csv, chunk_rows=7)
+    chunked = load_trips(csv)  # the cache just built
+
+    plain = pd.read_csv(csv)
+    plain["pickup_datetime"] = pd.to_datetime(plain["pickup_datetime"])
+    plain = plain.astype({c: t for c, t in DTYPES.items() if c in plain})
+    pd.testing.assert_frame_equal(chunked, plain)
+
+
+def test_cache_is_rebuilt_when_the_csv_changes(tmp_path, monkeypatch):
+    csv = str(tmp_path / "trips.csv")
+    write_trips(csv)
+    builds = []
+    real_ingest = ingest.ingest_csv
+
+    def counting_ingest(*args, **kwargs):
+        builds.append(args)
+        return real_ingest(*args, **kwargs)
+
+    monkeypatch.setattr(ingest, "ingest_csv", counting_ingest)
+    assert len(load_trips(csv)) == 50
+    load_trips(csv)
+    assert len(builds) == 1
+
+    st = os.stat(csv)
+    os.utime(csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # touched
+    load_trips(csv)
+    assert len(builds) == 2
+
+    with open(csv, "a") as f:
+        f.write("id50,1,2016-06-02 10:00:00,1,-73.9,40.7,N,1,2,1.5,7.0\n")
+    os.utime(csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # same mtime, new size
+    assert len(load_trips(csv)) == 51
+    assert len(builds) == 3
+
+    load_trips(csv)
+    assert len(builds) == 3
+
+
+# TLC exports leave counts empty on some trips and write others as floats
+def test_nullable_and_float_formatted_counts(tmp_path):
+    csv = tmp_path / "trips.csv"
+    write_trips(csv, n=3)
+    df = pd.read_csv(csv)
+    df["passenger_count"] = df["passenger_count"].astype(object)
+    df.loc[0, "passenger_count"] = "2.0"
+    df.loc[1, "passenger_count"] = None
+    df.loc[2, "vendor_id"] = None
+    df.to_csv(csv, index=False)
+
+    trips = load_trips(str(csv))
+    assert trips["passenger_count"].tolist()[:2] == [2, pd.NA]
+    assert trips["vendor_id"].isna().tolist() == [False, False, True]
+    trips["dropoff_latitude"], trips["dropoff_longitude"] = trips["pickup_latitude"], trips["pickup_longitude"]
+    X = featurize_frame(trips, ["passenger_count", "pickup_latitude"])
+    assert X[0, 0] == 2.0 and np.isnan(X[1, 0]) and np.isfinite(X[:, 1]).all()
+
+
+@pytest.mark.parametrize("missing", ["csv", "both"])
+def test_cache_only_or_nothing(tmp_path, missing):
+    csv = str(tmp_path / "trips.csv")
+    write_trips(csv)
+    load_trips(csv)
+    os.remove(csv)
+    if missing == "both":
+        os.remove(tmp_path / "trips.parquet")
+        with pytest.raises(FileNotFoundError):
+            load_trips(csv)
+    else:
+        assert len(load_trips(csv)) == 50
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from loadtest import compare, summarize
+from dummy_dynamo import DummyDynamo
+
+
+def result(p95, p99, rps):
+    return {"scenarios": {"predict": {"p95_ms": p95, "p99_ms": p99, "rps": rps}}}
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = result(10.0, 20.0, 1000.0)
+    assert compare(result(11.0, 21.0, 900.0), baseline, 0.2) == []
+    failures = compare(result(13.0, 20.0, 700.0), baseline, 0.2)
+    assert [f.split(":")[1].split()[0] for f in failures] == ["p95_ms", "rps"]
+    assert compare({"scenarios": {}}, baseline, 0.2) == ["predict: missing from this run"]
+
+
+def test_summarize_percentiles():
+    r = summarize([0.001] * 99 + [0.1], errors=1, elapsed=2.0, rows_per_request=10, cpu={})
+    assert r["requests"] == 100 and r["rps"] == 50.0 and r["rows_per_s"] == 500.0
+    assert r["p50_ms"] == 1.0 and r["max_ms"] == 100.0
+
+
+def test_dummy_dynamo_round_trip():
+    dynamo = DummyDynamo()
+    table = dynamo.Table("fare_cache")
+    with table.batch_writer() as batch:
+        batch.put_item(Item={"request_hash": "k", "prediction": 1})
+    assert table.get_item(Key={"request_hash": "k"})["Item"]["prediction"] == 1
+    found = dynamo.batch_get_item(RequestItems={"fare_cache": {"Keys": [{"request_hash": "k"}, {"request_hash": "x"}]}})
+    assert found["Responses"]["fare_cache"] == [{"request_hash": "k", "prediction": 1}]
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+
+from logsink import PredictionLogWriter, migrate_json_array
+
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_writer_appends_json_lines(tmp_path):
+    path = str(tmp_path / "logs" / "predictions.jsonl")
+    writer = PredictionLogWriter(path, flush_size=2, flush_interval=60)
+    writer.write({"prediction": 1.0})
+    writer.write_many([{"prediction": 2.0}, {"prediction": 3.0}])
+    writer.close()
+
+    assert [r["prediction"] for r in read_lines(path)] == [1.0, 2.0, 3.0]
+    assert writer.stats()["written"] == 3
+    assert writer.stats()["queue_depth"] == 0
+
+
+def test_writer_drops_when_buffer_full(tmp_path):
+    path = str(tmp_path / "predictions.jsonl")
+    writer = PredictionLogWriter(path, max_buffer=2, flush_size=100, flush_interval=60)
+    accepted = writer.write_many([{"i": i} for i in range(5)])
+    assert accepted == 2
+    assert writer.stats()["dropped"] == 3
+    writer.close()
+    assert len(read_lines(path)) == 2
+
+
+def test_writer_rotates_by_size(tmp_path):
+    path = str(tmp_path / "predictions.jsonl")
+    writer = PredictionLogWriter(path, max_bytes=5, flush_size=1, flush_interval=60)
+    writer.write({"i": 0})
+    writer.flush()
+    writer.write({"i": 1})
+    writer.close()
+
+    rotated = [p for p in os.listdir(tmp_path) if p != "predictions.jsonl"]
+    assert len(rotated) == 1
+    assert read_lines(path) == [{"i": 1}]
+    assert writer.stats()["rotations"] == 1
+
+
+# Another worker takes the same segment name between our check and our
+# rotation: its segment is kept and ours moves to the next free name
+def test_rotation_race_keeps_both_segments(tmp_path, monkeypatch):
+    path = str(tmp_path / "predictions.jsonl")
+    writer = PredictionLogWriter(path, max_bytes=5, flush_size=1, flush_interval=60)
+    writer.write({"i": 1})
+    writer.flush()
+
+    real_link = os.link
+
+    def racing_link(src, dst):
+        if dst.endswith(".0.jsonl") and not os.path.exists(dst):
+            with open(dst, "w") as f:
+                f.write('{"i":0}\n')  # the other worker's segment
+        return real_link(src, dst)
+
+    monkeypatch.setattr(os, "link", racing_link)
+    writer._maybe_rotate()
+
+    segments = sorted(p for p in os.listdir(tmp_path) if p != "predictions.jsonl")
+    assert [p[-8:] for p in segments] == [".0.jsonl", ".1.jsonl"]
+    assert read_lines(tmp_path / segments[0]) == [{"i": 0}]
+    assert read_lines(tmp_path / segments[1]) == [{"i": 1}]
+    assert writer.stats()["rotations"] == 1
+
+
+def test_migrate_json_array(tmp_path):
+    src = tmp_path / "prediction_logs.json"
+    dst = tmp_path / "prediction_logs.jsonl"
+    src.write_text(json.dumps([{"prediction": 1.5}, {"prediction": 2.5}], indent=4))
+
+    assert migrate_json_array(str(src), str(dst)) == 2
+    assert read_lines(dst) == [{"prediction": 1.5}, {"prediction": 2.5}]
+    assert not src.exists()
+    # already migrated: nothing to do
+    assert migrate_json_array(str(src), str(dst)) == 0
+
+
+def test_migrate_salvages_truncated_array(tmp_path, caplog):
+    src = tmp_path / "prediction_logs.json"
+    dst = tmp_path / "prediction_logs.jsonl"
+    src.write_text('[\n {"prediction": 1.5},\n {"prediction": 2.5},\n {"predic')
+
+    with caplog.at_level(logging.WARNING, logger="logsink"):
+        assert migrate_json_array(str(src), str(dst)) == 2
+    assert read_lines(dst) == [{"prediction": 1.5}, {"prediction": 2.5}]
+    assert (tmp_path / "prediction_logs.json.corrupt").exists()
+    assert not (tmp_path / "prediction_logs.json.migrating").exists()
+    assert "salvaged 2 records" in caplog.text
+
+    # not an array at all: nothing salvaged, startup still goes on
+    src.write_text("garbage")
+    assert migrate_json_array(str(src), str(dst)) == 0
+
+
+def test_migrate_reports_interrupted_run(tmp_path, caplog):
+    (tmp_path / "prediction_logs.json.migrating").write_text("[]")
+    with caplog.at_level(logging.WARNING, logger="logsink"):
+        assert migrate_json_array(str(tmp_path / "prediction_logs.json"), str(tmp_path / "out.jsonl")) == 0
+    assert "interrupted migration" in caplog.text
@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "streamlit_app"))
+
+from logtail import QUANTILES, LogTail, sorted_quantile
+
+
+def append(path, records, tail=""):
+    with open(path, "a") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+        f.write(tail)
+
+
+def records(start, n, user="a"):
+    return [{"user_id": user, "prediction": float(i)} for i in range(start, start + n)]
+
+
+def test_tail_reads_only_new_lines_and_updates_stats(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    tail = LogTail(path)
+    assert tail.poll() == 0  # no file yet
+
+    append(path, records(0, 10), tail='{"user_id": "b", "predi')  # torn last line
+    assert tail.poll() == 10
+    assert tail.poll() == 0
+    with open(path, "a") as f:
+        f.write('ction": 100.0}\n')
+    append(path, records(10, 5, user="b"))
+    assert tail.poll() == 6
+
+    values = np.array(list(range(15)) + [100.0])
+    stats = tail.stats()
+    assert stats["count"] == 16
+    assert stats["mean"] == values.mean()
+    assert stats["p50"] == np.quantile(values, 0.5)
+    assert stats["max"] == 100.0
+    assert tail.top_users() == [("a", 10), ("b", 6)]
+
+
+def test_paging_and_user_filter(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    append(path, records(0, 7, user="a") + records(7, 3, user="b"))
+    tail = LogTail(path)
+    tail.poll()
+    append(path, records(10, 5, user="a"))
+    tail.poll()
+
+    assert tail.page(0, 4)["prediction"].tolist() == [14.0, 13.0, 12.0, 11.0]
+    assert tail.page(3, 4)["prediction"].tolist() == [2.0, 1.0, 0.0]
+    assert tail.page(4, 4).empty
+    assert tail.num_rows("a") == 12
+    assert tail.page(0, 6, user="a")["prediction"].tolist() == [14.0, 13.0, 12.0, 11.0, 10.0, 6.0]
+    assert tail.page(0, 10, user="b")["prediction"].tolist() == [9.0, 8.0, 7.0]
+
+
+def test_tail_follows_rotation(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    append(path, records(0, 3))
+    tail = LogTail(path)
+    tail.poll()
+
+    append(path, records(3, 2))  # written just before rotation
+    os.rename(path, str(tmp_path / "log.2024-01-01.1.jsonl"))
+    append(path, records(5, 4))
+    assert tail.poll() == 6
+    assert tail.rotations == 1
+    assert tail.stats()["count"] == 9
+    assert tail.page(0, 20)["prediction"].tolist() == [float(i) for i in range(8, -1, -1)]
+
+
+@pytest.mark.parametrize("n", [1, 2, 7, 1000])
+def test_sorted_quantile_matches_numpy(n):
+    values = np.sort(np.random.default_rng(n).lognormal(size=n))
+    for q in QUANTILES + (0.0, 1.0):
+        assert sorted_quantile(values, q) == pytest.approx(np.quantile(values, q), rel=1e-12)
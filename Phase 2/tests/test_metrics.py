@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+
+import main
+from cache import LRUTTLCache, PredictionCache
+from metrics import MetricsRegistry
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    latency = registry.histogram("stage_seconds", "Stage latency", ("stage",), buckets=(0.01, 0.1))
+    latency.labels("predict").observe(0.005)
+    latency.labels("predict").observe(0.05)
+    latency.labels("predict").observe(1.0)
+    registry.counter("requests_total", "Requests").inc(3)
+    registry.callback("queue_depth", "Depth", lambda: {("log",): 7, ("dynamo",): None}, labelnames=("queue",))
+
+    text = registry.render()
+    assert "# TYPE stage_seconds histogram" in text
+    assert 'stage_seconds_bucket{stage="predict",le="0.01"} 1' in text
+    assert 'stage_seconds_bucket{stage="predict",le="0.1"} 2' in text
+    assert 'stage_seconds_bucket{stage="predict",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="predict"} 3' in text
+    assert 'stage_seconds_sum{stage="predict"} 1.055' in text
+    assert "requests_total 3" in text
+    assert 'queue_depth{queue="log"} 7' in text
+    assert 'queue="dynamo"' not in text
+
+
+def test_metrics_endpoint_reports_stages(monkeypatch):
+    class FakeModel:
+        def predict(self, X):
+            return X[:, 0]
+
+    monkeypatch.setattr(main, "ACTIVE", None)
+    monkeypatch.setattr(main, "INVERSE_LOG_TARGET", False)
+    main.set_model(FakeModel())
+    monkeypatch.setattr(main, "CACHE", PredictionCache(LRUTTLCache()))
+    monkeypatch.setattr(main.DYNAMO_WRITER, "submit_many", lambda items: list(items))
+    monkeypatch.setattr(main.LOG_WRITER, "write_many", lambda records: list(records))
+
+    client = TestClient(main.app)
+    trip = {"pickup_lat": 40.7, "pickup_lon": -73.9, "dropoff_lat": 40.8,
+            "dropoff_lon": -73.95, "passenger_count": 1, "trip_distance": 2.5}
+    assert client.post("/predict_batch", json=[trip, dict(trip, passenger_count=2)]).status_code == 200
+    client.get("/no-such-page")
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    text = res.text
+    for stage in ("validate", "cache_lookup", "featurize", "predict", "cache_store", "dynamo_enqueue", "log_enqueue"):
+        assert f'predict_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'http_requests_total{method="POST",path="/predict_batch",status="200"}' in text
+    assert 'path="other",status="404"' in text
+    assert 'prediction_cache_misses_total{tier="local"}' in text
+    assert 'queue_depth{queue="prediction_log"}' in text
@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "Phase 1", "Model"))
+
+from model_selection import LocalRunSource, RunIndex, select_best, sync_runs
+
+
+def write_run(root, run_id, revision, rmse, artifacts):
+    os.makedirs(os.path.join(root, "runs"), exist_ok=True)
+    with open(os.path.join(root, "runs", f"{run_id}.json"), "w") as f:
+        json.dump({
+            "name": f"run-{run_id}",
+            "revision": revision,
+            "summary": {"root_mean_squared_error": rmse} if rmse is not None else {},
+            "artifacts": artifacts,
+        }, f)
+
+
+class CountingSource(LocalRunSource):
+    def __init__(self, root):
+        super().__init__(root)
+        self.fetched = []
+        self._lock = threading.Lock()
+
+    def fetch(self, ref):
+        with self._lock:
+            self.fetched.append(ref.run_id)
+        return super().fetch(ref)
+
+
+def test_sync_fetches_only_new_or_updated_runs(tmp_path):
+    root = str(tmp_path / "project")
+    write_run(root, "a", "1", 0.9, ["linear-regression-model:v0"])
+    write_run(root, "b", "1", 0.7, ["linear-regression-model:v1"])
+    index_path = str(tmp_path / "index.json")
+
+    source = CountingSource(root)
+    records, fetched = sync_runs(source, RunIndex(index_path), workers=4)
+    assert fetched == 2 and len(records) == 2
+    assert sorted(source.fetched) == ["a", "b"]
+
+    # nothing changed: everything comes from the on-disk index
+    source = CountingSource(root)
+    records, fetched = sync_runs(source, RunIndex(index_path), workers=4)
+    assert fetched == 0 and source.fetched == []
+    assert records[1].metrics["root_mean_squared_error"] == 0.7
+
+    write_run(root, "b", "2", 0.5, ["linear-regression-model:v2"])
+    write_run(root, "c", "1", 0.6, ["linear-regression-model:v3"])
+    os.remove(os.path.join(root, "runs", "a.json"))
+    source = CountingSource(root)
+    index = RunIndex(index_path)
+    records, fetched = sync_runs(source, index, workers=4)
+    assert sorted(source.fetched) == ["b", "c"]
+    assert [r.run_id for r in records] == ["b", "c"]
+    assert "a" not in index.runs
+
+
+def test_select_best_requires_metric_and_model_artifact(tmp_path):
+    root = str(tmp_path / "project")
+    write_run(root, "a", "1", 0.9, ["linear-regression-model:v0"])
+    write_run(root, "b", "1", 0.4, ["eval-table:v0"])  # best metric, no model
+    write_run(root, "c", "1", None, ["linear-regression-model:v1"])
+    write_run(root, "d", "1", 0.6, ["predictions:v0", "linear-regression-model:v2"])
+    records, _ = sync_runs(LocalRunSource(root), RunIndex(str(tmp_path / "index.json")))
+
+    record, artifact = select_best(records)
+    assert record.run_id == "d"
+    assert artifact == "linear-regression-model:v2"
+
+    record, artifact = select_best(records, direction="maximize")
+    assert record.run_id == "a"
+    assert select_best([]) is None
+
+
+def test_download_from_local_source(tmp_path):
+    root = str(tmp_path / "project")
+    artifact_dir = os.path.join(root, "artifacts", "linear-regression-model", "v2")
+    os.makedirs(artifact_dir)
+    with open(os.path.join(artifact_dir, "taxi_model.joblib"), "w") as f:
+        f.write("model")
+
+    dest = str(tmp_path / "best_current_model")
+    path = LocalRunSource(root).download("linear-regression-model:v2", dest)
+    assert os.listdir(path) == ["taxi_model.joblib"]
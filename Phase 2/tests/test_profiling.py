@@ -0,0 +1,96 @@
+import os
+import pstats
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import main
+from profiling import ProfileMiddleware, RequestProfiler
+
+
+def make_app(profiler):
+    app = FastAPI()
+
+    @app.post("/predict")
+    @profiler.wrap
+    def predict(payload: dict):
+        return {"total": sum(range(payload["n"]))}
+
+    app.add_middleware(ProfileMiddleware, profiler=profiler, paths=["/predict"])
+    return app
+
+
+def test_disabled_profiler_leaves_handlers_untouched():
+    profiler = RequestProfiler(enabled=False)
+
+    def fn():
+        return None
+
+    assert profiler.wrap(fn) is fn
+    assert not hasattr(main.predict, "__wrapped__")
+
+
+def test_profiles_requests_with_header(tmp_path):
+    profiler = RequestProfiler(str(tmp_path), enabled=True, max_files=2)
+    client = TestClient(make_app(profiler))
+
+    res = client.post("/predict", json={"n": 10})
+    assert res.json() == {"total": 45}
+    assert "x-profile-id" not in res.headers
+    assert profiler.recent() == []
+
+    ids = []
+    for _ in range(3):
+        res = client.post("/predict", json={"n": 1000}, headers={"X-Profile": "1"})
+        assert res.json() == {"total": 499500}
+        ids.append(res.headers["x-profile-id"])
+
+    recent = profiler.recent()
+    assert [p["id"] for p in recent] == ids[:0:-1]  # bounded to the newest two
+    assert recent[0]["endpoint"] == "/predict"
+    stats = pstats.Stats(profiler.path(ids[-1]))
+    assert any(func[2] == "predict" for func in stats.stats)
+    assert "predict" in profiler.summary(ids[-1])
+    assert profiler.path("../../etc/passwd") is None
+
+
+def test_sampling_rate(tmp_path):
+    profiler = RequestProfiler(str(tmp_path), enabled=True, sample_rate=1.0)
+    client = TestClient(make_app(profiler))
+    assert "x-profile-id" in client.post("/predict", json={"n": 3}).headers
+    # an explicit X-Profile: 0 opts out
+    assert "x-profile-id" not in client.post("/predict", json={"n": 3}, headers={"X-Profile": "0"}).headers
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_profiles_async_handlers(tmp_path):
+    profiler = RequestProfiler(str(tmp_path), enabled=True)
+    app = FastAPI()
+
+    @app.post("/predict")
+    @profiler.wrap
+    async def predict(payload: dict):
+        return {"total": sum(range(payload["n"]))}
+
+    app.add_middleware(ProfileMiddleware, profiler=profiler, paths=["/predict"])
+    res = TestClient(app).post("/predict", json={"n": 1000}, headers={"X-Profile": "1"})
+    assert res.json() == {"total": 499500}
+    stats = pstats.Stats(profiler.path(res.headers["x-profile-id"]))
+    assert any(func[2] == "predict" for func in stats.stats)
+
+
+# Admin endpoints fail closed: 404 until a token is configured, then 403
+# for a missing or wrong X-Admin-Token
+def test_admin_token_fails_closed(monkeypatch):
+    monkeypatch.setattr(main, "PROFILE_ADMIN_TOKEN", None)
+    with pytest.raises(HTTPException) as e:
+        main.check_admin_token(None)
+    assert e.value.status_code == 404
+
+    monkeypatch.setattr(main, "PROFILE_ADMIN_TOKEN", "s3cret")
+    for token in (None, "", "wrong"):
+        with pytest.raises(HTTPException) as e:
+            main.check_admin_token(token)
+        assert e.value.status_code == 403
+    main.check_admin_token("s3cret")
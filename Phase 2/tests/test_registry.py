@@ -0,0 +1,143 @@
+import os
+import sys
+import shutil
+from types import SimpleNamespace
+
+import joblib
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from registry import ArtifactCache, LocalDirRegistry, ModelRegistry, WandbRegistry, fetch_model
+
+BEST_CURRENT_MODEL = os.path.join(
+    os.path.dirname(__file__), "..", "..", "Phase 1", "Model", "best_current_model"
+)
+
+
+def save_model(directory, intercept, filename="model.joblib"):
+    os.makedirs(directory, exist_ok=True)
+    model = LinearRegression()
+    model.coef_ = [1.0, 2.0]
+    model.intercept_ = intercept
+    joblib.dump(model, os.path.join(directory, filename))
+
+
+class CountingRegistry(LocalDirRegistry):
+    downloads = 0
+    def download(self, info, dest):
+        CountingRegistry.downloads += 1
+        super().download(info, dest)
+
+
+class DownRegistry(ModelRegistry):
+    def resolve(self, name, alias):
+        raise ConnectionError("registry unreachable")
+    def download(self, info, dest):
+        raise ConnectionError("registry unreachable")
+
+
+@pytest.fixture
+def registry_dir(tmp_path):
+    root = tmp_path / "registry"
+    save_model(root / "taxi_model" / "v1", 1.0)
+    os.symlink(root / "taxi_model" / "v1", root / "taxi_model" / "production")
+    return root
+
+
+def test_fetch_downloads_once_per_digest(registry_dir, tmp_path):
+    registry = CountingRegistry(str(registry_dir))
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    CountingRegistry.downloads = 0
+
+    model, info = fetch_model(registry, cache, "taxi_model", "production")
+    assert model.intercept_ == 1.0
+    assert info.version == "v1"
+    model, _ = fetch_model(registry, cache, "taxi_model", "production")
+    assert CountingRegistry.downloads == 1
+
+    # a corrupted cache entry fails verification and is fetched again
+    path = cache.get(info.digest)
+    with open(os.path.join(path, "model.joblib"), "ab") as f:
+        f.write(b"garbage")
+    assert cache.get(info.digest) is None
+    fetch_model(registry, cache, "taxi_model", "production")
+    assert CountingRegistry.downloads == 2
+
+
+def test_new_version_gets_new_cache_entry(registry_dir, tmp_path):
+    registry = LocalDirRegistry(str(registry_dir))
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    _, v1 = fetch_model(registry, cache, "taxi_model", "production")
+
+    save_model(registry_dir / "taxi_model" / "v2", 2.0)
+    os.remove(registry_dir / "taxi_model" / "production")
+    os.symlink(registry_dir / "taxi_model" / "v2", registry_dir / "taxi_model" / "production")
+    model, v2 = fetch_model(registry, cache, "taxi_model", "production")
+    assert model.intercept_ == 2.0
+    assert v2.digest != v1.digest
+    assert cache.get(v1.digest) and cache.get(v2.digest)
+
+
+def test_registry_down_uses_last_known_good(registry_dir, tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    fetch_model(LocalDirRegistry(str(registry_dir)), cache, "taxi_model", "production")
+    shutil.rmtree(registry_dir)
+
+    model, info = fetch_model(DownRegistry(), cache, "taxi_model", "production")
+    assert model.intercept_ == 1.0
+    assert info.version == "v1"
+
+
+def test_registry_down_without_cache_uses_fallback_dir(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    with pytest.raises(ConnectionError):
+        fetch_model(DownRegistry(), cache, "taxi_model", "production")
+
+    model, info = fetch_model(
+        DownRegistry(), cache, "taxi_model", "production", fallback_dir=BEST_CURRENT_MODEL
+    )
+    assert model.n_features_in_ == 7
+    assert info.version == "best_current_model"
+
+
+def test_corrupt_artifact_falls_back_to_last_known_good(registry_dir, tmp_path):
+    registry = LocalDirRegistry(str(registry_dir))
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    _, v1 = fetch_model(registry, cache, "taxi_model", "production")
+
+    # v2 downloads and verifies (the registry copy itself is truncated) but does not load
+    save_model(registry_dir / "taxi_model" / "v2", 2.0)
+    path = registry_dir / "taxi_model" / "v2" / "model.joblib"
+    path.write_bytes(path.read_bytes()[:40])
+    os.remove(registry_dir / "taxi_model" / "production")
+    os.symlink(registry_dir / "taxi_model" / "v2", registry_dir / "taxi_model" / "production")
+
+    model, info = fetch_model(registry, cache, "taxi_model", "production")
+    assert model.intercept_ == 1.0
+    assert info.digest == v1.digest
+    assert registry.resolve("taxi_model", "production").digest != v1.digest
+    assert cache.get(registry.resolve("taxi_model", "production").digest) is None
+    assert cache.last_good("taxi_model", "production")[0].digest == v1.digest
+
+
+# A forked worker builds its own wandb.Api instead of reusing the parent's
+# pooled connections
+def test_wandb_api_is_rebuilt_after_fork(monkeypatch):
+    apis = []
+
+    class FakeApi:
+        def __init__(self):
+            apis.append(self)
+
+        def artifact(self, path):
+            return SimpleNamespace(version="v1", digest="d1")
+
+    monkeypatch.setitem(sys.modules, "wandb", SimpleNamespace(Api=FakeApi, login=lambda key: None))
+    registry = WandbRegistry("team", "taxi")
+    registry.resolve("model", "production")
+    registry.resolve("model", "production")
+    assert len(apis) == 1
+
+    monkeypatch.setattr(os, "getpid", lambda: -1)  # now in a child process
+    assert registry.resolve("model", "production").digest == "d1"
+    assert len(apis) == 2
@@ -0,0 +1,98 @@
+import os
+
+import joblib
+from fastapi.testclient import TestClient
+from sklearn.linear_model import LinearRegression
+
+import main
+from registry import ArtifactCache, LocalDirRegistry
+from features import MODEL_FEATURES
+from reloader import ModelWatcher, build_active
+
+
+def save_model(directory, intercept):
+    os.makedirs(directory, exist_ok=True)
+    model = LinearRegression()
+    model.coef_ = [0.0, 0.0]
+    model.intercept_ = intercept
+    joblib.dump(model, os.path.join(directory, "model.joblib"))
+
+
+def point_alias(root, version):
+    alias = os.path.join(root, "taxi_model", "production")
+    if os.path.lexists(alias):
+        os.remove(alias)
+    os.symlink(os.path.join(root, "taxi_model", version), alias)
+
+
+def make_watcher(tmp_path, slot):
+    root = str(tmp_path / "registry")
+    save_model(os.path.join(root, "taxi_model", "v1"), 1.0)
+    point_alias(root, "v1")
+    watcher = ModelWatcher(
+        LocalDirRegistry(root), ArtifactCache(str(tmp_path / "cache")),
+        "taxi_model", "production",
+        current=lambda: slot.get("active"),
+        install=lambda active: slot.update(active=active),
+    )
+    return root, watcher
+
+
+def test_watcher_swaps_only_on_new_digest(tmp_path):
+    slot = {}
+    root, watcher = make_watcher(tmp_path, slot)
+
+    assert watcher.check() is True
+    first = slot["active"]
+    assert first.version == "v1"
+    assert first.scorer.predict_one([0.0, 0.0]) == 1.0
+    assert watcher.check() is False
+
+    save_model(os.path.join(root, "taxi_model", "v2"), 2.0)
+    point_alias(root, "v2")
+    assert watcher.check() is True
+    assert slot["active"].version == "v2"
+    assert slot["active"].scorer.predict_one([0.0, 0.0]) == 2.0
+    # a request that grabbed the old model keeps scoring with it
+    assert first.scorer.predict_one([0.0, 0.0]) == 1.0
+    assert watcher.stats()["reloads"] == 2
+
+
+def test_failed_reload_keeps_current_model(tmp_path):
+    slot = {}
+    root, watcher = make_watcher(tmp_path, slot)
+    watcher.check()
+
+    os.makedirs(os.path.join(root, "taxi_model", "broken"))
+    with open(os.path.join(root, "taxi_model", "broken", "model.joblib"), "w") as f:
+        f.write("not a model")
+    point_alias(root, "broken")
+    assert watcher.check() is False
+    assert slot["active"].version == "v1"
+    assert watcher.stats()["failures"] == 1
+
+    # the bad digest is evicted and not fetched again until the alias moves
+    downloads = []
+    put = watcher.cache.put
+    watcher.cache.put = lambda registry, info: downloads.append(info.version) or put(registry, info)
+    assert watcher.check() is False
+    assert downloads == [] and watcher.stats()["failures"] == 1
+    assert watcher.cache.get(watcher.stats()["bad_digest"]) is None
+
+    save_model(os.path.join(root, "taxi_model", "v2"), 2.0)
+    point_alias(root, "v2")
+    assert watcher.check() is True
+    assert downloads == ["v2"] and slot["active"].version == "v2"
+
+
+def test_health_reports_active_model(monkeypatch):
+    model = LinearRegression()
+    model.coef_ = [0.0] * len(MODEL_FEATURES)
+    model.intercept_ = 3.0
+    monkeypatch.setattr(main, "ACTIVE", build_active(model, load_seconds=0.25))
+
+    body = TestClient(main.app).get("/health").json()
+    assert body["model_loaded"] is True
+    assert body["model_version"] == "unknown"
+    assert body["model_load_seconds"] == 0.25
+    assert body["model_loaded_at"]
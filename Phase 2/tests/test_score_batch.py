@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "Phase 1", "Model"))
+
+from features import MODEL_FEATURES, featurize_frame
+from ingest import DTYPES
+from scorer import LinearScorer
+from score_batch import csv_chunks, score_file
+
+SCORER = LinearScorer(np.linspace(-0.01, 0.01, len(MODEL_FEATURES)), 6.5, inverse_log=True)
+POISON_LAT = 40.654321
+
+
+def write_trips(path, n=300):
+    rng = np.random.default_rng(0)
+    when = pd.Timestamp("2016-06-01") + pd.to_timedelta(rng.integers(0, 7 * 86400, n), unit="s")
+    df = pd.DataFrame({
+        "id": [f"id{i}" for i in range(n)],
+        "vendor_id": rng.integers(1, 3, n),
+        "pickup_datetime": when.strftime("%Y-%m-%d %H:%M:%S"),
+        "passenger_count": rng.integers(1, 6, n),
+        "pickup_longitude": rng.uniform(-74.05, -73.75, n).round(6),
+        "pickup_latitude": rng.uniform(40.6, 40.9, n).round(6),
+        "dropoff_longitude": rng.uniform(-74.05, -73.75, n).round(6),
+        "dropoff_latitude": rng.uniform(40.6, 40.9, n).round(6),
+    })
+    df.loc[7, "pickup_latitude"] = np.nan
+    df.loc[200, "pickup_latitude"] = POISON_LAT
+    df.to_csv(path, index=False)
+    df["pickup_datetime"] = pd.to_datetime(df["pickup_datetime"])
+    return df
+
+
+# The trips as score_batch reads the CSV (ingest dtypes: float32 coordinates)
+def as_ingested(df):
+    return df.astype({c: t for c, t in DTYPES.items() if c in df and t != "string[pyarrow]"})
+
+
+def expected(df):
+    X = featurize_frame(df, MODEL_FEATURES)
+    ok = np.isfinite(X).all(axis=1)
+    out = np.full(len(df), np.nan)
+    out[ok] = SCORER.predict(X[ok])
+    return out
+
+
+def test_csv_chunks_end_on_line_breaks(tmp_path):
+    path = tmp_path / "trips.csv"
+    write_trips(path)
+    data = path.read_bytes()
+    ranges = list(csv_chunks(str(path), 10, 1000))
+    assert ranges[0][0] == 10 and ranges[-1][1] == len(data)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges)
+
+
+# Fails on the chunk holding the trip that starts at POISON_LAT
+class FailingScorer(LinearScorer):
+    def predict(self, X):
+        if np.isclose(X[:, MODEL_FEATURES.index("pickup_latitude")], POISON_LAT).any():
+            raise RuntimeError("worker crashed")
+        return super().predict(X)
+
+
+def test_scores_in_order_and_resumes(tmp_path):
+    df = write_trips(tmp_path / "trips.csv")
+    reference = str(tmp_path / "reference.csv")
+    args = (str(tmp_path / "trips.csv"), SCORER, MODEL_FEATURES, "model-1")
+    state = score_file(args[0], reference, *args[1:], fmt="csv", workers=2, chunk_mb=2000 / 2**20, max_in_flight=3)
+    assert state["complete"] and state["next_chunk"] > 5
+    result = pd.read_csv(reference)
+    assert result["id"].tolist() == df["id"].tolist()
+    np.testing.assert_allclose(result["trip_duration"], expected(as_ingested(df)), equal_nan=True)
+
+    output = str(tmp_path / "predictions.csv")
+    failing = FailingScorer(SCORER.coef, SCORER.intercept, inverse_log=True)
+    with pytest.raises(RuntimeError):
+        score_file(args[0], output, failing, *args[2:], fmt="csv", workers=2, chunk_mb=2000 / 2**20)
+    with open(output + ".checkpoint.json") as f:
+        state = json.load(f)
+    assert not state["complete"] and 0 < state["rows"] < 200
+    with open(output, "ab") as f:
+        f.write(b"id201,12")  # torn write after the checkpoint
+
+    state = score_file(args[0], output, *args[1:], fmt="csv", workers=2, chunk_mb=2000 / 2**20, resume=True)
+    assert state["complete"] and state["rows"] == len(df)
+    assert open(output, "rb").read() == open(reference, "rb").read()
+
+
+# pickup_datetime is optional like every other input column: without it
+# trips are scored as leaving now, as /predict does
+def test_scores_input_without_pickup_datetime(tmp_path):
+    df = write_trips(tmp_path / "trips.csv").drop(columns="pickup_datetime")
+    df.to_csv(tmp_path / "trips.csv", index=False)
+    output = str(tmp_path / "out.csv")
+    state = score_file(str(tmp_path / "trips.csv"), output, SCORER, MODEL_FEATURES, "model-1", fmt="csv", workers=1)
+    assert state["complete"] and state["rows"] == len(df)
+    result = pd.read_csv(output)
+    assert result["trip_duration"].isna().tolist() == df["pickup_latitude"].isna().tolist()
+
+
+def test_refuses_to_resume_with_another_model(tmp_path):
+    write_trips(tmp_path / "trips.csv")
+    output = str(tmp_path / "out")
+    score_file(str(tmp_path / "trips.csv"), output, SCORER, MODEL_FEATURES, "model-1", workers=1)
+    with pytest.raises(SystemExit, match="model"):
+        score_file(str(tmp_path / "trips.csv"), output, SCORER, MODEL_FEATURES, "model-2", workers=1, resume=True)
+
+
+def test_parquet_parts(tmp_path):
+    df = as_ingested(write_trips(tmp_path / "trips.csv")).iloc[:150]
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path / "trips.parquet", row_group_size=40)
+    output = str(tmp_path / "parts")
+    state = score_file(str(tmp_path / "trips.parquet"), output, SCORER, MODEL_FEATURES, "model-1", workers=2)
+    assert state["next_chunk"] == 4
+    assert sorted(os.listdir(output)) == ["_checkpoint.json"] + [f"part-{i:05d}.parquet" for i in range(4)]
+    result = pd.read_parquet(output)
+    assert result["id"].tolist() == df["id"].tolist()
+    np.testing.assert_allclose(result["trip_duration"], expected(df), equal_nan=True)
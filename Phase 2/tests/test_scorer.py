@@ -0,0 +1,90 @@
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.tree import DecisionTreeRegressor
+
+from scorer import GenericScorer, LinearScorer, compile_model
+
+FEATURES = [
+    "passenger_count",
+    "pickup_longitude",
+    "pickup_latitude",
+    "dropoff_longitude",
+    "dropoff_latitude",
+    "pickup_hour",
+    "pickup_dayofweek",
+]
+ARTIFACT = os.path.join(
+    os.path.dirname(__file__), "..", "..", "Phase 1", "Model", "taxi_model.joblib"
+)
+
+
+def make_data(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(1, 6, n),
+        rng.uniform(-74.05, -73.75, n),
+        rng.uniform(40.60, 40.90, n),
+        rng.uniform(-74.05, -73.75, n),
+        rng.uniform(40.60, 40.90, n),
+        rng.integers(0, 24, n),
+        rng.integers(0, 7, n),
+    ]).astype(np.float64)
+    y = X @ rng.normal(size=X.shape[1]) * 0.01 + 6.5 + rng.normal(scale=0.1, size=n)
+    return pd.DataFrame(X, columns=FEATURES), y
+
+
+def test_linear_scorer_matches_sklearn():
+    df, y = make_data()
+    model = LinearRegression().fit(df, y)
+    scorer = compile_model(model)
+    assert isinstance(scorer, LinearScorer)
+
+    X = df.to_numpy()
+    np.testing.assert_allclose(scorer.predict(X), model.predict(df), rtol=1e-12)
+    assert np.isclose(scorer.predict_one(X[3]), model.predict(df.iloc[[3]])[0], rtol=1e-12)
+
+
+def test_linear_scorer_inverse_log():
+    df, y = make_data()
+    model = Ridge(alpha=0.5).fit(df, y)
+    scorer = compile_model(model, inverse_log=True)
+    assert isinstance(scorer, LinearScorer)
+
+    X = df.to_numpy()
+    np.testing.assert_allclose(scorer.predict(X), np.expm1(model.predict(df)), rtol=1e-12)
+    assert np.isclose(scorer.predict_one(X[0]), np.expm1(model.predict(df.iloc[[0]])[0]), rtol=1e-12)
+    # batches larger than the preallocated buffer still work
+    big = np.repeat(X, 10, axis=0)
+    np.testing.assert_allclose(scorer.predict(big), np.expm1(model.predict(pd.DataFrame(big, columns=FEATURES))))
+
+
+def test_non_linear_model_falls_back():
+    df, y = make_data()
+    model = DecisionTreeRegressor(max_depth=3).fit(df.to_numpy(), y)
+    scorer = compile_model(model, inverse_log=True)
+    assert isinstance(scorer, GenericScorer)
+    X = df.to_numpy()[:20]
+    np.testing.assert_allclose(scorer.predict(X), np.expm1(model.predict(X)))
+
+
+def test_production_artifact_parity():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = joblib.load(ARTIFACT)
+    df, _ = make_data(n=100, seed=1)
+    scorer = compile_model(model)
+    np.testing.assert_allclose(scorer.predict(df.to_numpy()), model.predict(df), rtol=1e-12)
+
+
+def test_linear_scorer_pickles_without_buffers():
+    import pickle
+
+    scorer = LinearScorer(np.array([1.0, 2.0]), 0.5, inverse_log=True)
+    scorer.predict_one([1.0, 1.0])  # creates this thread's buffers
+    clone = pickle.loads(pickle.dumps(scorer))
+    np.testing.assert_allclose(clone.predict(np.ones((3, 2))), np.expm1(3.5))
@@ -0,0 +1,50 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from loadtest import free_port, start_server, worker_pids
+
+
+def get_health(port: int):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as res:
+        return json.load(res)
+
+
+# serve.py preloads the (stub) model in the parent, forks two workers on an
+# ephemeral port and answers /health from them
+def test_serve_forks_workers_that_answer_health(tmp_path):
+    port = free_port()
+    server = start_server(port, 2, {
+        "MODEL_POLL_INTERVAL": "0",
+        "MODEL_CACHE_DIR": str(tmp_path / "model_cache"),
+        "PREDICTION_LOG_FILE": str(tmp_path / "prediction_logs.jsonl"),
+        "CACHE_SHARED_SLOTS": "1024",
+    }, preload=True)
+    try:
+        deadline = time.monotonic() + 30
+        health = None
+        while time.monotonic() < deadline and server.poll() is None:
+            try:
+                health = get_health(port)
+                # children include the shared memory tracker as well as the workers
+                if health.get("model_loaded") and len(worker_pids(server.pid)) >= 2:
+                    break
+            except OSError:
+                pass
+            time.sleep(0.2)
+        assert server.poll() is None, "serve.py exited"
+        assert health and health["model_loaded"]
+        assert len(worker_pids(server.pid)) >= 2
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+    assert server.returncode == 0
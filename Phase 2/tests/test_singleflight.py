@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+
+from cache import LRUTTLCache, PredictionCache
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def run():
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(10)))
+        # finished keys are forgotten, so a later call runs again
+        results.append(await flights.do("k", work))
+        return results
+
+    assert asyncio.run(run()) == [42] * 11
+    assert len(calls) == 2
+    assert flights.stats() == {"in_flight": 0, "leaders": 2, "collapsed": 9, "collapse_ratio": 9 / 11}
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(run())] == [ValueError] * 3
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(flights.do("k", work))
+        follower = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+
+class SlowRemote:
+    def __init__(self):
+        self.lookups = 0
+        self.writes = 0
+
+    async def aget(self, key):
+        self.lookups += 1
+        await asyncio.sleep(0.05)
+        return None
+
+    def put(self, key, value):
+        self.writes += 1
+
+
+def test_identical_predict_requests_collapse(monkeypatch):
+    import main
+
+    class FakeModel:
+        def predict(self, X):
+            return X[:, 0] * 2.0  # passenger_count
+
+    remote = SlowRemote()
+    monkeypatch.setattr(main, "ACTIVE", None)
+    monkeypatch.setattr(main, "INVERSE_LOG_TARGET", False)
+    monkeypatch.setattr(main, "CACHE", PredictionCache(LRUTTLCache(), remote))
+    monkeypatch.setattr(main, "FLIGHTS", SingleFlight())
+    monkeypatch.setattr(main, "log_predictions", lambda reqs, predictions: None)
+    main.set_model(FakeModel())
+
+    payload = {
+        "pickup_lat": 40.7, "pickup_lon": -73.9, "dropoff_lat": 40.8, "dropoff_lon": -73.95,
+        "passenger_count": 3, "trip_distance": 2.5,
+    }
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/predict", json=payload) for _ in range(8)))
+
+    responses = asyncio.run(run())
+    assert [r.json()["prediction"] for r in responses] == [6.0] * 8
+    assert remote.lookups == 1 and remote.writes == 1
+    assert main.FLIGHTS.collapsed == 7
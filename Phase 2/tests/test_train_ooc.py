@@ -0,0 +1,64 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "Phase 1", "Model"))
+
+from train_ooc import OLSStats, prepare_chunk, train
+
+
+def write_trips(path, n, seed):
+    rng = np.random.default_rng(seed)
+    when = pd.Timestamp("2016-06-01") + pd.to_timedelta(rng.integers(0, 7 * 86400, n), unit="s")
+    pd.DataFrame({
+        "id": [f"id{seed}-{i}" for i in range(n)],
+        "pickup_datetime": when.strftime("%Y-%m-%d %H:%M:%S"),
+        "passenger_count": rng.integers(1, 6, n),
+        "pickup_longitude": rng.uniform(-74.05, -73.75, n).round(6),
+        "pickup_latitude": rng.uniform(40.6, 40.9, n).round(6),
+        "dropoff_longitude": rng.uniform(-74.05, -73.75, n).round(6),
+        "dropoff_latitude": rng.uniform(40.6, 40.9, n).round(6),
+        "trip_duration": rng.integers(60, 3600, n),
+    }).to_csv(path, index=False)
+
+
+# Uneven splits, including a single-row chunk, merge to the one-pass fit
+@pytest.mark.parametrize("sizes", [[500], [1, 499], [250, 1, 37, 212], [100, 100, 100, 100, 100]])
+def test_merged_stats_match_least_squares(sizes):
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(500, 4)) * [1, 10, 100, 1000] + [0, 40, -74, 5]
+    y = X @ [0.5, -0.2, 0.01, 0.003] + 3 + rng.normal(size=500)
+
+    stats = OLSStats(4)
+    for chunk in np.split(np.arange(500), np.cumsum(sizes)[:-1]):
+        stats = stats.merge(OLSStats.from_arrays(X[chunk], y[chunk]))
+    coef, intercept = stats.solve()
+
+    reference = LinearRegression().fit(X, y)
+    np.testing.assert_allclose(coef, reference.coef_, rtol=0, atol=1e-8)
+    assert intercept == pytest.approx(reference.intercept_, abs=1e-8)
+    residuals = y - reference.predict(X)
+    assert stats.sse(coef, intercept) == pytest.approx(residuals @ residuals, rel=1e-9)
+
+
+def test_train_on_csv_chunks_matches_in_memory_fit(tmp_path):
+    inputs = []
+    for seed, n in enumerate([400, 1, 73, 250]):
+        path = str(tmp_path / f"trips-{seed}.csv")
+        write_trips(path, n, seed)
+        inputs.append(path)
+
+    model, metrics = train(inputs, workers=2, val_fraction=0.0)
+
+    # in memory: the same rows (as ingested) concatenated into one frame
+    df = pd.concat([pd.read_parquet(path.replace(".csv", ".parquet")) for path in inputs], ignore_index=True)
+    X, y = prepare_chunk(df)
+    reference = LinearRegression().fit(X, y)
+
+    assert metrics["train_rows"] == len(y) == 724
+    np.testing.assert_allclose(model.coef_, reference.coef_, rtol=0, atol=1e-8)
+    assert model.intercept_ == pytest.approx(reference.intercept_, abs=1e-8)
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from cache import LRUTTLCache, PredictionCache
+from scorer import LinearScorer
+from zonetable import ZoneGrid, ZoneTable, build_index, save_table
+
+GRID = ZoneGrid()
+TRIP = {"pickup_lat": 40.75, "pickup_lon": -73.98, "dropoff_lat": 40.70, "dropoff_lon": -74.01}
+WHEN = datetime(2024, 5, 6, 8, 30)  # Monday 08:30
+
+
+def trip_key(trip=TRIP, when=WHEN):
+    return GRID.key(
+        GRID.cell(trip["pickup_lat"], trip["pickup_lon"]),
+        GRID.cell(trip["dropoff_lat"], trip["dropoff_lon"]),
+        when.hour, when.weekday(),
+    )
+
+
+def test_build_index_finds_every_key():
+    rng = np.random.default_rng(0)
+    keys = np.unique(rng.integers(1, 10**12, 5000).astype(np.uint64))
+    values = rng.random(len(keys)).astype(np.float32)
+    table_keys, table_values, max_probe = build_index(keys, values)
+    assert len(table_keys) >= 2 * len(keys)
+    stored = dict(zip(table_keys[table_keys != 0].tolist(), table_values[table_keys != 0].tolist()))
+    assert stored == dict(zip(keys.tolist(), values.tolist()))
+    assert max_probe >= 1
+
+
+def test_lookup_hits_stored_buckets_only(tmp_path):
+    save_table(str(tmp_path / "zt"), GRID, np.array([trip_key()], dtype=np.uint64),
+               np.array([6.5], dtype=np.float32), {})
+    table = ZoneTable(str(tmp_path / "zt"))
+    args = (TRIP["pickup_lat"], TRIP["pickup_lon"], TRIP["dropoff_lat"], TRIP["dropoff_lon"])
+    assert table.lookup(*args, WHEN.hour, WHEN.weekday()) == 6.5
+    assert table.lookup(*args, WHEN.hour + 1, WHEN.weekday()) is None
+    assert table.lookup(41.5, -73.98, 40.70, -74.01, WHEN.hour, WHEN.weekday()) is None  # off the grid
+
+    many = table.lookup_many(
+        [args[0], args[0]], [args[1], args[1]], [args[2], args[2]], [args[3], args[3]],
+        [WHEN.hour, 3], [WHEN.weekday(), 6],
+    )
+    assert many[0] == 6.5 and np.isnan(many[1])
+    assert table.stats()["hits"] == 2 and table.stats()["misses"] == 3
+
+
+def test_matches_only_the_model_it_was_built_from(tmp_path):
+    rows = np.random.default_rng(1).random((4, 3))
+    coef, intercept = np.array([1.0, 2.0, 3.0]), 0.5
+    save_table(str(tmp_path / "zt"), GRID, np.array([1], dtype=np.uint64), np.array([1.0], dtype=np.float32), {
+        "features": ["a", "b", "c"],
+        "probe": {"rows": rows.tolist(), "log_predictions": (rows @ coef + intercept).tolist()},
+    })
+    table = ZoneTable(str(tmp_path / "zt"))
+    assert table.matches(LinearScorer(coef, intercept), False, ("a", "b", "c"))
+    assert table.matches(LinearScorer(coef, intercept, inverse_log=True), True, ("a", "b", "c"))
+    assert not table.matches(LinearScorer(coef * 1.1, intercept), False, ("a", "b", "c"))
+    assert not table.matches(LinearScorer(coef, intercept), False, ("a", "b"))
+
+
+def test_predict_batch_answers_from_zone_table(tmp_path, monkeypatch):
+    import main
+
+    class FakeModel:
+        def predict(self, X):
+            return X[:, 0] * 2.0  # passenger_count
+
+    save_table(str(tmp_path / "zt"), GRID, np.array([trip_key()], dtype=np.uint64),
+               np.array([6.5], dtype=np.float32), {})
+    table = ZoneTable(str(tmp_path / "zt"))
+    monkeypatch.setattr(main, "ACTIVE", None)
+    monkeypatch.setattr(main, "INVERSE_LOG_TARGET", False)
+    monkeypatch.setattr(main, "ZONE_TABLE", table)
+    monkeypatch.setattr(main, "log_predictions", lambda reqs, predictions: None)
+    monkeypatch.setattr(main, "CACHE", PredictionCache(LRUTTLCache()))
+    main.set_model(FakeModel())
+    monkeypatch.setattr(main, "ZONE_MODEL", main.ACTIVE)
+
+    trip = dict(TRIP, passenger_count=2, trip_distance=3.0, pickup_datetime=WHEN.isoformat())
+    other = dict(trip, pickup_datetime=WHEN.replace(hour=23).isoformat())
+    res = TestClient(main.app).post("/predict_batch", json=[trip, other])
+    assert [r["prediction"] for r in res.json()["results"]] == [6.5, 4.0]
+    assert table.hits == 1 and table.misses == 1
@@ -6,3 +6,8 @@ ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 BACKEND = os.path.join(ROOT, "backend")
 if BACKEND not in sys.path:
     sys.path.insert(0, BACKEND)
+
+# Phase 2/benchmarks holds the shared in-memory DynamoDB (dummy_dynamo.py)
+PHASE2_BENCHMARKS = os.path.join(ROOT, "..", "Phase 2", "benchmarks")
+if PHASE2_BENCHMARKS not in sys.path:
+    sys.path.append(PHASE2_BENCHMARKS)
@@ -2,34 +2,12 @@
 import importlib
 import types
 
+# In-memory DynamoDB shared with the Phase 2 tests and load test
+from dummy_dynamo import DummyDynamo
+
 # import the db module to test
 db_mod = importlib.import_module("app.db")
 
-class DummyTable:
-    def __init__(self):
-        self.store = {}
-
-    def put_item(self, Item):
-        # simple store using a key field if present; otherwise generate
-        key = Item.get("request_hash") or Item.get("id") or str(len(self.store))
-        self.store[key] = Item
-        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
-
-    def get_item(self, Key):
-        k = Key.get("request_hash")
-        it = self.store.get(k)
-        if it is None:
-            return {}
-        return {"Item": it}
-
-class DummyDynamo:
-    def __init__(self):
-        self._tables = {}
-    def Table(self, name):
-        if name not in self._tables:
-            self._tables[name] = DummyTable()
-        return self._tables[name]
-
 def test_dynamodb_cache_lookup_and_write(monkeypatch):
     dummy = DummyDynamo()
     monkeypatch.setattr(db_mod, "dynamodb", dummy)